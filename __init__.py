@@ -1,2 +1,10 @@
+import os
+
+# Opt in to the in-memory Maya stand-in (see standIn), e.g. to run the
+# benchmarks without Maya
+if os.environ.get('AS5UTIL_STANDIN'):
+    from .standIn import install
+    install()
+
 from .pre import preBuild
 from .post import postBuild
@@ -1,6 +1,17 @@
+from functools import partial
+from timeit import default_timer
+import numpy as np
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
 import pymel.core as pm
-from .utils import getPoleVector, alignToWorldVector
-
+from . import matrix
+from .utils import (getPoleVector, getFrameRange,
+                    sampleMatrices, getRotateInfo,
+                    setKeys, getAttrs, setAttrs, worldToChannels,
+                    setWorldMatrices, snapTransforms)
+from .poseLibrary import applyRestPose
+
+# Copy/paste clipboard: 'transforms' and 'attrs' to dicts of values
 CLIPBOARD = dict()
 
 
@@ -9,56 +20,74 @@ def setupHik():
     _createHikPoleControls()
 
 
-def setTPose():
-
-    limb_ctrls = {
-        'Arm': ('Shoulder', 'Elbow', 'Wrist'),
-        'Leg': ('Hip', 'Knee', 'Ankle')
-    }
+TPOSE_CTRLS = {
+    'Arm': ('Shoulder', 'Elbow', 'Wrist'),
+    'Leg': ('Hip', 'Knee', 'Ankle')
+}
+TPOSE_POLES = {
+    'Arm': ('Elbow', (0, 0, -50)),
+    'Leg': ('Knee', (0, 0, 50))
+}
 
-    for side in '_L', '_R':
 
+def setTPose(sides=('_L', '_R')):
+    """
+    Poses the arms and legs of both sides straight out (T-pose): FK
+    controls are aimed along fixed world vectors, IK controls matched to the
+    result and pole vectors placed in front of/behind the elbows and knees.
+    Target rotations are solved in memory and written in batches.
+    """
+
+    limb_sides = [(limb, side) for side in sides for limb in TPOSE_CTRLS
+                  if cmds.objExists('FKIK'+limb+side)]
+    setAttrs({'FKIK{0}{1}.FKIKBlend'.format(limb, side): 0
+              for limb, side in limb_sides})
+
+    # IKScapula controls first, as the arms may follow them: level with
+    # the scapula, at the same distance
+    scap_ctrls = ['IKScapula'+side for side in sides]
+    scap_locs = matrix.translationPart(sampleMatrices(scap_ctrls))
+    prnt_locs = matrix.translationPart(
+        sampleMatrices(['Scapula'+side for side in sides]))
+    offsets = np.zeros_like(prnt_locs)
+    offsets[:, 0] = np.linalg.norm(scap_locs - prnt_locs, axis=-1)
+    offsets[:, 0] *= [-1 if side == '_R' else 1 for side in sides]
+    scap_mats = matrix.composeMatrix(translate=prnt_locs + offsets)
+    setWorldMatrices(scap_ctrls, scap_mats, rotate=False)
+
+    # FK controls: world rotations from each limb's aim/up vectors
+    fk_ctrls, aim_vecs, up_vecs = list(), list(), list()
+    for limb, side in limb_sides:
         sign = -1 if side == '_L' else 1
         limb_vecs = {
             'Arm': ((-1, 0, 0), (0, 0, sign)),
             'Leg': ((0, -sign, 0), (0, 0, sign))
         }
+        for ctrl in TPOSE_CTRLS[limb]:
+            fk_ctrls.append('FK'+ctrl+side)
+            aim_vecs.append(limb_vecs[limb][0])
+            up_vecs.append(limb_vecs[limb][1])
 
-        # Move IKScapula controls
-        ctrl, prnt = pm.ls('IKScapula'+side, 'Scapula'+side)
-        ctrl_loc, prnt_loc = (xf.getTranslation(ws=True)
-                              for xf in (ctrl, prnt))
-
-        vec_len = (ctrl_loc - prnt_loc).length()
-        vec_len = -vec_len if side == '_R' else vec_len
-        offset_loc = pm.dt.Vector((vec_len, 0, 0)) + prnt_loc
-
-        ctrl.setTranslation(offset_loc, ws=True)
+    fk_mats = matrix.composeMatrix(rotate=matrix.aimMatrices(aim_vecs, up_vecs))
+    setWorldMatrices(fk_ctrls, fk_mats, translate=False)
 
-        # Arms and Legs
-        for limb in 'Arm', 'Leg':
-            # Set to FK
-            pm.setAttr('FKIK'+limb+side+'.FKIKBlend', 0)
+    # IK controls follow the FK pose; poles are placed separately
+    _matchIk2Fk(limb_sides, [cmds.currentTime(query=True)], _setValues, poles=False)
 
-            for ctrl in limb_ctrls[limb]:
-                x_vec, y_vec = limb_vecs[limb]
-                alignToWorldVector('FK'+ctrl+side, aim_x=x_vec, aim_y=y_vec)
+    poles = ['Pole'+limb+side for limb, side in limb_sides]
+    pole_locs = matrix.translationPart(sampleMatrices(
+        [TPOSE_POLES[limb][0]+side for limb, side in limb_sides]))
+    pole_locs += [TPOSE_POLES[limb][1] for limb, side in limb_sides]
+    pole_mats = matrix.composeMatrix(translate=pole_locs)
+    setWorldMatrices(poles, pole_mats, rotate=False)
 
-            # Align IK
-            alignIk2Fk('FK'+limb_ctrls[limb][0]+side)
+    setAttrs({'FKIK{0}{1}.FKIKBlend'.format(limb, side): 10
+              for limb, side in limb_sides})
 
-            # Move pole vector controls
-            if limb == 'Arm':
-                pole_offset = (0, 0, -50)
-                origin = 'Elbow'
-            else:
-                pole_offset = (0, 0, 50)
-                origin = 'Knee'
 
-            pm.move('Pole'+limb+side,
-                    pm.ls(origin+side)[0].getTranslation(ws=True)+pole_offset)
-
-            pm.setAttr('FKIK{0}{1}.FKIKBlend'.format(limb, side), 10)
+def _setValues(plug_values):
+    # Sets single-frame channel values from worldToChannels and friends
+    setAttrs({plug: values[0] for plug, values in plug_values.items()})
 
 
 def _createHikPoleControls():
@@ -70,12 +99,22 @@ def _createHikPoleControls():
                 'Arm': 'Elbow',
                 'Leg': 'Knee'
             }
-            pm.delete(pm.parentConstraint(jnt_map[limb]+side, hikloc))
+            snapTransforms([hikloc], [jnt_map[limb]+side])
             pm.parentConstraint(hikloc, 'PoleExtra'+limb+side, mo=True)
 
 
-def zeroControls():
-    ctrl_list = pm.ls(sl=True) or pm.ls('ControlSet')[0].members()
+def zeroControls(ctrls=None):
+    """
+    Resets `ctrls` (the selection, else every control) to the rest pose
+    captured by postBuild.  Rigs without a rest pose get rotations zeroed,
+    and translations of IK controls.
+    """
+
+    ctrls = cmds.ls(sl=True) if ctrls is None else ctrls
+    if applyRestPose(ctrls or None) is not None:
+        return
+
+    ctrl_list = pm.ls(ctrls) or pm.ls('ControlSet')[0].members()
     for ctrl in ctrl_list:
         ctrl.rotate.set((0, 0, 0))
         if 'IK' in ctrl.name():
@@ -146,57 +185,269 @@ def alignIk2Fk(fk_ctrl):
         pm.setAttr('FKIK'+grp_name+side+'.FKIKBlend', 0)
 
 
-def mirrorControls(center_xform=None):
+def bakeFk2Ik(limbs=('Arm', 'Leg'), sides=('_L', '_R'), frames=None, set_blend=True):
+    """
+    Matches FK controls to the current joint pose over a frame range, for
+    every limb and side at once, and keys the result.  Batch version of
+    alignFk2Ik.
+
+    Parameters
+    ----------
+    limbs : tuple, optional
+        Keys of JNT_GRPS.
+    sides : tuple, optional
+        Side suffixes.
+    frames : list, optional
+        Frames to bake.  Defaults to the playback range.
+    set_blend : bool, optional
+        Also key FKIKBlend to FK (0) over the range.
+
+    Returns
+    -------
+    list
+        Baked FK control names.
+
+    """
+
+    frames = frames or getFrameRange()
+    chains = [['FK'+jname+side for jname in JNT_GRPS[limb]]
+              for limb in limbs for side in sides
+              if cmds.objExists('FKIK'+limb+side)]
+    ctrls = [ctrl for chain in chains for ctrl in chain]
+    jnts = [ctrl[2:] for ctrl in ctrls]
+
+    jnt_rots = matrix.rotationPart(sampleMatrices(jnts, 'worldMatrix', frames))
+    ctrl_rots = matrix.rotationPart(sampleMatrices(ctrls, 'worldMatrix', frames))
+    parent_rots = matrix.rotationPart(sampleMatrices(ctrls, 'parentMatrix', frames))
+
+    plug_values = dict()
+    i = 0
+    for chain in chains:
+        for ci, ctrl in enumerate(chain):
+            parent_rot = parent_rots[i]
+            if ci and _isAncestor(chain[ci - 1], ctrl):
+                # Parent follows the already matched control above it
+                offset = np.matmul(parent_rot, np.swapaxes(ctrl_rots[i - 1], -1, -2))
+                parent_rot = np.matmul(offset, jnt_rots[i - 1])
+            plug_values.update(_rotationKeys(ctrl, jnt_rots[i], parent_rot))
+            i += 1
+
+    if set_blend:
+        plug_values.update(_blendKeys(limbs, sides, 0, len(frames)))
+
+    setKeys(plug_values, frames)
+
+    return ctrls
+
+
+def bakeIk2Fk(limbs=('Arm', 'Leg'), sides=('_L', '_R'), frames=None, set_blend=True, pole_distance=20.0):
+    """
+    Matches IK controls, pole vectors and (for legs) IKToes to the current
+    joint pose over a frame range, for every limb and side at once, and keys
+    the result.  Batch version of alignIk2Fk.
+
+    Parameters
+    ----------
+    limbs : tuple, optional
+        Keys of JNT_GRPS.
+    sides : tuple, optional
+        Side suffixes.
+    frames : list, optional
+        Frames to bake.  Defaults to the playback range.
+    set_blend : bool, optional
+        Also key FKIKBlend to IK (10) over the range.
+    pole_distance : float, optional
+        Pole vector distance from the mid joint, as in alignIk2Fk.
+
+    Returns
+    -------
+    list
+        Baked IK control names.
+
+    """
+
+    frames = frames or getFrameRange()
+    limb_sides = [(limb, side) for limb in limbs for side in sides
+                  if cmds.objExists('FKIK'+limb+side)]
+
+    _matchIk2Fk(limb_sides, frames, partial(setKeys, frames=frames), pole_distance)
+    if set_blend:
+        setKeys(_blendKeys(limbs, sides, 10, len(frames)), frames)
+
+    return ['IK'+limb+side for limb, side in limb_sides]
+
+
+def _matchIk2Fk(limb_sides, frames, write, pole_distance=20.0, poles=True):
+    # Computes IK control, pole and IKToes channels matching the joints
+    # over `frames` and passes them to `write` in two steps: pole and toe
+    # parents can follow the IK controls, so they are sampled after the IK
+    # controls are written.
+    jnts = [jname+side for limb, side in limb_sides for jname in JNT_GRPS[limb][:3]]
+    ik_ctrls = ['IK'+limb+side for limb, side in limb_sides]
+    poles = ['Pole'+limb+side for limb, side in limb_sides] if poles else list()
+    toes = [side for limb, side in limb_sides if limb == 'Leg']
+
+    jnt_mats = sampleMatrices(jnts, 'worldMatrix', frames)
+    jnt_mats = jnt_mats.reshape((len(limb_sides), 3) + jnt_mats.shape[1:])
+    jnt_locs = matrix.translationPart(jnt_mats)
+    toe_rots = matrix.rotationPart(
+        sampleMatrices(['Toes'+side for side in toes], 'worldMatrix', frames))
+    ik_parents = sampleMatrices(ik_ctrls, 'parentMatrix', frames)
+
+    plug_values = dict()
+    for i, ik_ctrl in enumerate(ik_ctrls):
+        plug_values.update(_rotationKeys(
+            ik_ctrl, matrix.rotationPart(jnt_mats[i, 2]),
+            matrix.rotationPart(ik_parents[i])))
+        plug_values.update(_translationKeys(
+            ik_ctrl, jnt_locs[i, 2], ik_parents[i]))
+    write(plug_values)
+
+    pole_locs = jnt_locs[:, 1] + matrix.poleVectors(
+        jnt_locs[:, 0], jnt_locs[:, 1], jnt_locs[:, 2]) * pole_distance
+    pole_parents = sampleMatrices(poles, 'parentMatrix', frames)
+    toe_ctrls = ['IKToes'+side for side in toes]
+    toe_parents = matrix.rotationPart(
+        sampleMatrices(toe_ctrls, 'parentMatrix', frames))
+
+    plug_values = dict()
+    for i, pole in enumerate(poles):
+        plug_values.update(_translationKeys(pole, pole_locs[i], pole_parents[i]))
+    for i, toe_ctrl in enumerate(toe_ctrls):
+        plug_values.update(_rotationKeys(toe_ctrl, toe_rots[i], toe_parents[i]))
+    write(plug_values)
+
+
+def _rotationKeys(ctrl, world_rots, parent_rots):
+    rotate_order, joint_orient, rotate_axis = getRotateInfo(ctrl)
+    local_rots = matrix.localRotation(world_rots, parent_rots,
+                                      joint_orient, rotate_axis)
+    eulers = matrix.filterEuler(matrix.matrixToEuler(local_rots, rotate_order))
 
-    if not center_xform:
-        center_xform = pm.ls('RootX_M', type='transform')
-        center_xform = center_xform[0] if center_xform else None
+    return {ctrl+'.rotate'+axis: eulers[:, i] for i, axis in enumerate('XYZ')}
 
-    side_suffixes = ['_L', '_R']
 
-    if not pm.ls(sl=True):
+def _translationKeys(ctrl, world_locs, parent_mats):
+    local_locs = matrix.transformPoints(world_locs, np.linalg.inv(parent_mats))
+    local_locs *= om.MDistance.internalToUI(1.0)
+
+    return {ctrl+'.translate'+axis: local_locs[:, i] for i, axis in enumerate('XYZ')}
+
+
+def _blendKeys(limbs, sides, value, count):
+    return {'FKIK{0}{1}.FKIKBlend'.format(limb, side): [value]*count
+            for limb in limbs for side in sides
+            if cmds.objExists('FKIK'+limb+side)}
+
+
+def _isAncestor(parent, child):
+    parent = cmds.ls(parent, long=True)[0]
+
+    return cmds.ls(child, long=True)[0].startswith(parent + '|')
+
+
+def mirrorControls(center_xform=None):
+    """
+    Mirrors the selected _L/_R controls onto their opposite-side controls
+    across the YZ plane of `center_xform` (RootX_M by default, else the
+    world origin).  Both sides are read before anything is written, so
+    selecting a pair swaps its pose.
+    """
+
+    sel = cmds.ls(sl=True)
+    if not sel:
         return
 
-    ctrls = [ctrl for ctrl in pm.ls(
-        sl=True) if ctrl.name()[-2:] in side_suffixes]
-    if not ctrls:
+    pairs = _getMirrorTargets(sel)
+    if not pairs:
         pm.error('Invalid controls selected')
 
-    ctr_node = pm.createNode('transform')
-    if center_xform:
-        pm.delete(pm.parentConstraint(center_xform, ctr_node))
+    _setValues(_mirrorChannels(pairs, center_xform))
+
+
+def mirrorAnimation(ctrls=None, frames=None, center_xform=None, swap=False):
+    """
+    Mirrors the animation of _L/_R controls onto their opposite-side
+    controls over a frame range, for every control and frame at once, and
+    keys the result.  Batch version of mirrorControls.  Only free channels
+    are keyed: locked channels and channels driven by constraints or other
+    non-curve connections are left alone.
+
+    Parameters
+    ----------
+    ctrls : list, optional
+        Source controls.  Defaults to the selection.
+    frames : list, optional
+        Frames to mirror.  Defaults to the keyed frames of the controls, or
+        the playback range if they have no keys.
+    center_xform : str, optional
+        Mirror center.  Defaults to RootX_M, else the world origin.
+    swap : bool, optional
+        Also mirror the opposite side back onto `ctrls`, exchanging the
+        animation of the two sides.
+
+    Returns
+    -------
+    list
+        Keyed control names.
+
+    """
+
+    pairs = _getMirrorTargets(ctrls or cmds.ls(sl=True))
+    if not pairs:
+        pm.error('Invalid controls selected')
+    if swap:
+        sources = set(ctrl for ctrl, _ in pairs)
+        pairs += [(tgt, ctrl) for ctrl, tgt in pairs if tgt not in sources]
 
-    mir_xforms = _buildMirrorXforms(ctrls, ctr_node)
+    if not frames:
+        keyed = cmds.keyframe([ctrl for pair in pairs for ctrl in pair],
+                              query=True, timeChange=True)
+        frames = sorted(set(keyed)) if keyed else getFrameRange()
 
-    tgt_ctrls = pm.ls([ctrl.name()[:-2] + side_suffixes[1 -
-                                                        side_suffixes.index(ctrl.name()[-2:])] for ctrl in ctrls])
+    plug_values = _mirrorChannels(pairs, center_xform, frames)
+    setKeys(plug_values, frames)
 
-    constraint_list = list()
+    keyed = set(plug.split('.')[0] for plug in plug_values)
+    return [tgt for _, tgt in pairs if tgt in keyed]
 
-    for ctrl, xform in zip(tgt_ctrls, mir_xforms):
-        if all(ctrl.getAttr(attr_name, lock=False, keyable=True) for attr_name in ['translateX', 'translateY', 'translateZ']):
-            constraint_list.append(pm.pointConstraint(xform, ctrl))
-        if all(ctrl.getAttr(attr_name, lock=False, keyable=True) for attr_name in ['rotateX', 'rotateY', 'rotateZ']):
-            constraint_list.append(pm.orientConstraint(xform, ctrl))
 
-    pm.delete(constraint_list)
-    pm.delete(mir_xforms)
-    pm.delete(ctr_node)
+MIRROR_SIDES = {'_L': '_R', '_R': '_L'}
+MIRROR_PAIRS = dict()
 
 
-def _buildMirrorXforms(xform_list, center_xform=None):
-    if not center_xform:
-        center_xform = pm.createNode('transform')
+def getMirrorPairs(ctrls):
+    """
+    Returns the opposite-side name of each control in `ctrls` (None for
+    controls without an _L/_R suffix), from a table cached by name.
+    """
+
+    for ctrl in ctrls:
+        if ctrl not in MIRROR_PAIRS:
+            side = MIRROR_SIDES.get(ctrl[-2:])
+            MIRROR_PAIRS[ctrl] = ctrl[:-2] + side if side else None
+
+    return [MIRROR_PAIRS[ctrl] for ctrl in ctrls]
 
-    mir_xforms = [pm.createNode('transform') for _ in xform_list]
 
-    for mir_xform, xform in zip(mir_xforms, xform_list):
-        pm.delete(pm.parentConstraint(xform, mir_xform))
-        mir_xform.setParent(center_xform)
+def _getMirrorTargets(ctrls):
+    return [(ctrl, tgt) for ctrl, tgt in zip(ctrls, getMirrorPairs(ctrls))
+            if tgt and cmds.objExists(tgt)]
 
-    center_xform.scaleX.set(-1)
 
-    return mir_xforms
+def _mirrorChannels(pairs, center_xform=None, frames=None):
+    # Returns translate/rotate values of each target over `frames` (the
+    # current time if None) as (frames,) arrays, keyed by plug.
+    if not center_xform:
+        center_xform = cmds.ls('RootX_M', type='transform')
+        center_xform = center_xform[0] if center_xform else None
+
+    ctrls, tgts = zip(*pairs)
+    frames = frames or [cmds.currentTime(query=True)]
+    center = sampleMatrices([center_xform], frames=frames)[0] if center_xform else None
+    world_mats = matrix.mirrorMatrices(sampleMatrices(ctrls, frames=frames), center)
+
+    return worldToChannels(tgts, world_mats, frames)
 
 
 def copyTransforms(ctrl):
@@ -205,10 +456,14 @@ def copyTransforms(ctrl):
         return
 
     ctrl = pm.ls(sl=True)[0]
-    global CLIPBOARD
+    translate = ctrl.getTranslation(ws=True)
+    rotate = ctrl.getRotation(ws=True)
 
-    CLIPBOARD['translate'] = ctrl.getTranslation(ws=True)
-    CLIPBOARD['rotate'] = ctrl.getRotation(ws=True)
+    values = dict()
+    for i, axis in enumerate('XYZ'):
+        values['translate'+axis] = translate[i]
+        values['rotate'+axis] = rotate[i]
+    CLIPBOARD['transforms'] = values
 
 
 def pasteTransforms(ctrl):
@@ -217,24 +472,85 @@ def pasteTransforms(ctrl):
         return
 
     ctrl = pm.ls(sl=True)[0]
-    global CLIPBOARD
+    values = CLIPBOARD.get('transforms')
+    if not values:
+        return
+
+    if ctrl.translateX.get(lock=False, keyable=True) and 'translateX' in values:
+        ctrl.setTranslation([values['translate'+axis] for axis in 'XYZ'], ws=True)
+
+    if ctrl.rotateX.get(lock=False, keyable=True) and 'rotateX' in values:
+        ctrl.setRotation([values['rotate'+axis] for axis in 'XYZ'], ws=True)
+
+
+def copyAttrs(ctrls=None):
+    """
+    Copies the keyable, unlocked attribute values of `ctrls` (the selection
+    by default) to the clipboard.
+
+    Returns
+    -------
+    dict
+        Report with keys 'controls', 'plugsRead' (plugs read and copied)
+        and 'elapsed' (seconds).
+
+    """
+
+    start = default_timer()
+    ctrls = _asNames(ctrls)
+    plug_values = getAttrs(ctrls)
+    CLIPBOARD['attrs'] = plug_values
+
+    return {'controls': len(ctrls),
+            'plugsRead': len(plug_values),
+            'elapsed': default_timer() - start}
+
+
+def pasteAttrs(ctrls=None):
+    """
+    Pastes clipboard attribute values onto `ctrls` (the selection by
+    default).  Controls that were copied get their own values back; if a
+    single control was copied, its values are pasted onto every control by
+    attribute name.  Only plugs whose value differs are written.
+
+    Returns
+    -------
+    dict
+        Report with keys 'controls', 'plugsConsidered' (clipboard plugs
+        matched to `ctrls`), 'plugsWritten' (those whose value differed)
+        and 'elapsed' (seconds).
+
+    """
+
+    start = default_timer()
+    ctrls = _asNames(ctrls)
+    copied = CLIPBOARD.get('attrs', dict())
+
+    by_node = dict()
+    for plug, value in copied.items():
+        node, attr_name = plug.split('.', 1)
+        by_node.setdefault(node, dict())[attr_name] = value
 
-    if ctrl.translateX.get(lock=False, keyable=True) and CLIPBOARD.get('translate', None):
-        ctrl.setTranslation(CLIPBOARD['translate'], ws=True)
+    plug_values = dict()
+    for ctrl in ctrls:
+        values = by_node.get(ctrl)
+        if values is None and len(by_node) == 1:
+            values = list(by_node.values())[0]
+        for attr_name, value in (values or dict()).items():
+            plug_values[ctrl+'.'+attr_name] = value
 
-    if ctrl.rotateX.get(lock=False, keyable=True) and CLIPBOARD.get('rotate', None):
-        ctrl.setRotation(CLIPBOARD['rotate'], ws=True)
+    written = setAttrs(plug_values)
 
+    return {'controls': len(ctrls),
+            'plugsConsidered': len(plug_values),
+            'plugsWritten': len(written),
+            'elapsed': default_timer() - start}
 
-def copyAttrs(ctrl):
-    global CLIPBOARD
-    CLIPBOARD = dict()
-    for attr in ctrl.listAttr(locked=False, keyable=True):
-        CLIPBOARD[attr.shortName()] = attr.get()
 
+def _asNames(nodes):
+    if nodes is None:
+        return cmds.ls(sl=True)
+    if isinstance(nodes, (list, tuple, set)):
+        return [str(node) for node in nodes]
 
-def pasteAttrs(ctrl):
-    global CLIPBOARD
-    for attr_name in CLIPBOARD:
-        if ctrl.hasAttr(attr_name):
-            ctrl.setAttr(attr_name, CLIPBOARD[attr_name])
+    return [str(nodes)]
@@ -0,0 +1,520 @@
+"""
+Benchmarks for build and anim tools.  Run inside Maya or mayapy; each
+benchmark works in a new scene.
+
+    from as5util import bench
+    print(bench.formatResults(bench.benchSpacePlanner()))
+
+Without Maya, set AS5UTIL_STANDIN=1 before importing as5util to run on
+its in-memory stand-in (see standIn); benchStandInBuild then times the
+whole pipeline on generated characters.
+"""
+from collections import OrderedDict
+from timeit import default_timer
+import numpy as np
+import maya.cmds as cmds
+import pymel.core as pm
+
+from . import anim, matrix, spaceSwitch, standIn
+from .poseLibrary import getControls
+from .pre import preBuild
+from .post import postBuild
+from .profiler import BuildProfiler
+from .standIn import characters
+from .utils import (getFrameRange, sampleMatrices, getAttrs, setAttrs,
+                    worldToChannels, orientJointHierarchy)
+
+
+def formatResults(results):
+    """Formats a list of benchmark result dicts as a text table."""
+
+    if not results:
+        return ''
+
+    keys = list(results[0].keys())
+    rows = [keys] + [[_formatValue(result[key]) for key in keys]
+                     for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(keys))]
+
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths))
+                     for row in rows)
+
+
+def benchSpacePlanner(space_counts=(5, 20, 50)):
+    """
+    Times building `n` spaces on one controller with one spaceSwitch call per
+    driver (re-querying the enum and constraint every time) against a single
+    planned spaceSwitch call, and checks both give the same network.
+
+    Returns
+    -------
+    list
+        One dict per count with keys 'spaces', 'incremental', 'planned'
+        (seconds) and 'match' (bool).
+
+    """
+
+    results = list()
+    for count in space_counts:
+        times = list()
+        networks = list()
+        for incremental in True, False:
+            driver_spaces = _newSpaceScene(count)
+            start = default_timer()
+            if incremental:
+                for space_dict in driver_spaces:
+                    spaceSwitch.spaceSwitch('ctrl_grp', 'ctrl', 'parent',
+                                            [space_dict], 'spaces_grp', 'Spaces')
+            else:
+                spaceSwitch.spaceSwitch('ctrl_grp', 'ctrl', 'parent',
+                                        driver_spaces, 'spaces_grp', 'Spaces')
+            times.append(default_timer() - start)
+            networks.append(_getSpaceNetwork('ctrl', 'Spaces'))
+
+        results.append(OrderedDict([('spaces', count),
+                                    ('incremental', times[0]),
+                                    ('planned', times[1]),
+                                    ('match', networks[0] == networks[1])]))
+
+    return results
+
+
+def benchSpaceSwitchScaling(controller_counts=(10, 50, 200), space_counts=(2, 5, 10)):
+    """
+    Times the space switch operations over a sweep of controller counts and
+    spaces per controller, in a new scene per pair: building every switch
+    (buildSpaceSwitches), reversing the space order of each (reorderSpaces),
+    renaming the first space of each (renameSpace) and deleting each switch
+    (deleteSpaceSwitch).  All controllers share the same drivers.
+
+    Returns
+    -------
+    list
+        One dict per pair and operation with keys 'controllers', 'spaces',
+        'operation', 'elapsed', 'perSwitch' (seconds), 'commands' and
+        'nodesCreated'.
+
+    """
+
+    results = list()
+    for ctrl_count in controller_counts:
+        for space_count in space_counts:
+            args_list = _newSwitchScene(ctrl_count, space_count)
+            ctrls = [arg_dict['controller'] for arg_dict in args_list]
+            profiler = BuildProfiler('spaceSwitch')
+            with profiler.stage('build'):
+                report = spaceSwitch.buildSpaceSwitches(args_list)
+            if report['failed']:
+                raise ValueError('Space switch failed: {}'.format(report['failed'][0]))
+            with profiler.stage('reorder'):
+                for ctrl in ctrls:
+                    spaceSwitch.reorderSpaces(
+                        ctrl, spaceSwitch.getConstraintGroups(ctrl)[::-1])
+            with profiler.stage('rename'):
+                for ctrl in ctrls:
+                    spaceSwitch.renameSpace(ctrl, 0, 'Renamed')
+            with profiler.stage('delete'):
+                for ctrl in ctrls:
+                    spaceSwitch.deleteSpaceSwitch(ctrl)
+
+            for record in profiler.stages:
+                results.append(OrderedDict([('controllers', ctrl_count),
+                                            ('spaces', space_count),
+                                            ('operation', record['name']),
+                                            ('elapsed', record['elapsed']),
+                                            ('perSwitch', record['elapsed'] / ctrl_count),
+                                            ('commands', record['commands']),
+                                            ('nodesCreated', record['nodesCreated'])]))
+
+    return results
+
+
+def benchFkIkMatch(limbs=('Arm', 'Leg'), sides=('_L', '_R'), frames=None):
+    """
+    Times matching FK to IK and IK to FK over a frame range on the open rig
+    scene, with a per-frame alignFk2Ik/alignIk2Fk loop against bakeFk2Ik and
+    bakeIk2Fk.  Keys are written on the scene's controls.
+
+    Returns
+    -------
+    list
+        One dict per direction with keys 'match', 'frames', 'loop',
+        'batch' (seconds) and 'maxError' (largest world rotation matrix
+        difference of the FK/IK controls between the two methods).
+
+    """
+
+    frames = frames or getFrameRange()
+    limbs = [limb for limb in limbs
+             if any(cmds.objExists('FKIK'+limb+side) for side in sides)]
+    fk_ctrls = ['FK'+jname+side for limb in limbs for side in sides
+                for jname in anim.JNT_GRPS[limb]]
+    ik_ctrls = ['IK'+limb+side for limb in limbs for side in sides]
+
+    results = list()
+    for name, loop_func, batch_func, ctrls in [
+            ('fk2ik', _loopFk2Ik, anim.bakeFk2Ik, fk_ctrls),
+            ('ik2fk', _loopIk2Fk, anim.bakeIk2Fk, ik_ctrls)]:
+        start = default_timer()
+        loop_func(limbs, sides, frames)
+        loop_time = default_timer() - start
+        loop_rots = _sampleRotations(ctrls, frames)
+
+        start = default_timer()
+        batch_func(limbs, sides, frames)
+        batch_time = default_timer() - start
+        batch_rots = _sampleRotations(ctrls, frames)
+
+        results.append(OrderedDict([('match', name),
+                                    ('frames', len(frames)),
+                                    ('loop', loop_time),
+                                    ('batch', batch_time),
+                                    ('maxError', float(np.abs(loop_rots - batch_rots).max()))]))
+
+    return results
+
+
+def benchMirrorAnimation(ctrls, frames=None, tolerance=1e-4):
+    """
+    Times mirroring the animation of `ctrls` onto the opposite side on the
+    open rig scene, with a per-frame mirrorControls loop against
+    mirrorAnimation, and checks that both write the same result.  Keys are
+    written on the free (not locked or driven) channels of the
+    opposite-side controls only, so constrained channels of a built rig
+    are left as they are.
+
+    Returns
+    -------
+    list
+        One dict with keys 'controls', 'frames', 'loop', 'batch' (seconds),
+        'maxError' (largest world matrix difference of the opposite-side
+        controls between the two methods) and 'agree' (maxError is within
+        `tolerance`).
+
+    """
+
+    frames = frames or getFrameRange()
+    tgts = [tgt for tgt in anim.getMirrorPairs(ctrls) if tgt]
+    plugs = list(worldToChannels(tgts, sampleMatrices(tgts)))
+
+    start = default_timer()
+    for frame in frames:
+        cmds.currentTime(frame)
+        cmds.select(ctrls)
+        anim.mirrorControls()
+        cmds.setKeyframe(plugs)
+    loop_time = default_timer() - start
+    loop_mats = sampleMatrices(tgts, 'worldMatrix', frames)
+
+    start = default_timer()
+    anim.mirrorAnimation(ctrls, frames)
+    batch_time = default_timer() - start
+    batch_mats = sampleMatrices(tgts, 'worldMatrix', frames)
+
+    max_error = float(np.abs(loop_mats - batch_mats).max())
+    return [OrderedDict([('controls', len(tgts)),
+                         ('frames', len(frames)),
+                         ('loop', loop_time),
+                         ('batch', batch_time),
+                         ('maxError', max_error),
+                         ('agree', max_error <= tolerance)])]
+
+
+def benchTPose():
+    """
+    Times setTPose on the open rig scene against the previous
+    implementation (an aimConstraint per FK control through the old
+    alignToWorldVector, then alignIk2Fk per limb), starting both from the
+    current pose.
+
+    Returns
+    -------
+    list
+        One dict with keys 'legacy', 'analytic' (seconds) and 'maxError'
+        (largest world matrix difference of the FK, IK and pole controls).
+
+    """
+
+    ctrls = ['FK'+name+side for side in ('_L', '_R')
+             for names in anim.TPOSE_CTRLS.values() for name in names]
+    ctrls += [prefix+limb+side for side in ('_L', '_R')
+              for limb in anim.TPOSE_CTRLS for prefix in ('IK', 'Pole')]
+    ctrls = [ctrl for ctrl in ctrls if cmds.objExists(ctrl)]
+    start_pose = getAttrs(getControls())
+
+    times, mats = list(), list()
+    for func in _legacyTPose, anim.setTPose:
+        setAttrs(start_pose)
+        start = default_timer()
+        func()
+        times.append(default_timer() - start)
+        mats.append(sampleMatrices(ctrls))
+    setAttrs(start_pose)
+
+    return [OrderedDict([('legacy', times[0]),
+                         ('analytic', times[1]),
+                         ('maxError', float(np.abs(mats[0] - mats[1]).max()))])]
+
+
+def _legacyTPose():
+    # setTPose as it was before the analytic solver
+    for side in '_L', '_R':
+        sign = -1 if side == '_L' else 1
+        limb_vecs = {
+            'Arm': ((-1, 0, 0), (0, 0, sign)),
+            'Leg': ((0, -sign, 0), (0, 0, sign))
+        }
+
+        ctrl, prnt = pm.ls('IKScapula'+side, 'Scapula'+side)
+        ctrl_loc, prnt_loc = (xf.getTranslation(ws=True)
+                              for xf in (ctrl, prnt))
+        vec_len = (ctrl_loc - prnt_loc).length()
+        vec_len = -vec_len if side == '_R' else vec_len
+        ctrl.setTranslation(pm.dt.Vector((vec_len, 0, 0)) + prnt_loc, ws=True)
+
+        for limb in 'Arm', 'Leg':
+            pm.setAttr('FKIK'+limb+side+'.FKIKBlend', 0)
+            for ctrl in anim.TPOSE_CTRLS[limb]:
+                x_vec, y_vec = limb_vecs[limb]
+                _legacyAlignToWorldVector('FK'+ctrl+side, aim_x=x_vec, aim_y=y_vec)
+
+            anim.alignIk2Fk('FK'+anim.TPOSE_CTRLS[limb][0]+side)
+            origin, pole_offset = anim.TPOSE_POLES[limb]
+            pm.move('Pole'+limb+side,
+                    pm.ls(origin+side)[0].getTranslation(ws=True)+pole_offset)
+            pm.setAttr('FKIK{0}{1}.FKIKBlend'.format(limb, side), 10)
+
+
+def _legacyAlignToWorldVector(xform, aim_x=(1, 0, 0), aim_y=(0, 1, 0)):
+    # alignToWorldVector as it was before the node-free version, through a
+    # temporary aimConstraint
+    xform = pm.ls(xform)[0]
+
+    xf_node = pm.createNode('transform')
+    pm.move(xf_node, xform.getTranslation(ws=True))
+
+    aim_node = pm.createNode('transform')
+    pm.move(aim_node, xform.getTranslation(space='world') + aim_x)
+
+    pm.delete(pm.aimConstraint(aim_node, xf_node,
+                               worldUpVector=aim_y), aim_node)
+
+    xform.setRotation(xf_node.getRotation(ws=True), ws=True)
+    pm.delete(xf_node)
+
+
+def benchOrientJoints(chains=10, length=15):
+    """
+    Times orienting a generated skeleton of `chains` joint chains of
+    `length` joints (150 joints by default, the size of a DAZ skeleton),
+    with the previous per-joint orient (unparent the child, aimConstraint,
+    makeIdentity, reparent) against orientJointHierarchy.
+
+    Returns
+    -------
+    list
+        One dict with keys 'joints', 'loop', 'batch' (seconds) and
+        'maxError' (largest world matrix difference between the two).
+
+    """
+
+    times, mats = list(), list()
+    for batch in False, True:
+        root, joints = _newJointScene(chains, length)
+        start = default_timer()
+        if batch:
+            orientJointHierarchy(root, up_vector=(0, 0, 1))
+        else:
+            for joint in [root] + joints:
+                _legacyOrientJoint(joint, up_vector=(0, 0, 1))
+        times.append(default_timer() - start)
+        mats.append(sampleMatrices([root] + joints))
+
+    return [OrderedDict([('joints', len(joints) + 1),
+                         ('loop', times[0]),
+                         ('batch', times[1]),
+                         ('maxError', float(np.abs(mats[0] - mats[1]).max()))])]
+
+
+def benchStandInBuild(maps=('g8f', 'g8m', 'ue4'), frames=None):
+    """
+    Times each pipeline entry point on stand-in scenes, per skeleton map:
+    preBuild on a generated character, postBuild on a generated rig, then
+    setTPose, bakeFk2Ik, bakeIk2Fk, mirrorAnimation, copyAttrs, pasteAttrs
+    and zeroControls on the built rig.  Requires the stand-in (see
+    standIn); a failing entry point is reported and the next one runs.
+
+    Returns
+    -------
+    list
+        One dict per map and entry point with keys 'map', 'entryPoint',
+        'elapsed' (seconds), 'commands', 'nodesCreated' and 'error' (None,
+        or the exception message).
+
+    """
+
+    if not standIn.isInstalled():
+        raise ValueError('benchStandInBuild requires the stand-in '
+                         '(set AS5UTIL_STANDIN).')
+
+    frames = frames or list(range(1, 25))
+    results = list()
+    for map_name in maps:
+        characters.newCharacter(map_name)
+        results.append(_runEntryPoint(
+            map_name, 'preBuild', lambda profiler: preBuild(
+                map_name, load=False, use_cache=False, profiler=profiler)))
+
+        characters.newRig(map_name)
+        results.append(_runEntryPoint(
+            map_name, 'postBuild', lambda profiler: postBuild(map_name, profiler=profiler)))
+
+        ctrls = getControls()
+        entry_points = [
+            ('setTPose', anim.setTPose),
+            ('bakeFk2Ik', lambda: anim.bakeFk2Ik(frames=frames)),
+            ('bakeIk2Fk', lambda: anim.bakeIk2Fk(frames=frames)),
+            ('mirrorAnimation', lambda: anim.mirrorAnimation(
+                [ctrl for ctrl in ctrls if ctrl.endswith('_L')], frames)),
+            ('copyAttrs', lambda: anim.copyAttrs(ctrls)),
+            ('pasteAttrs', lambda: anim.pasteAttrs(ctrls)),
+            ('zeroControls', lambda: anim.zeroControls(ctrls))]
+        for entry_name, func in entry_points:
+            results.append(_runEntryPoint(map_name, entry_name, _asStage(entry_name, func)))
+
+    return results
+
+
+def _runEntryPoint(map_name, entry_name, func):
+    # Runs func(profiler) and returns its result row
+    profiler = BuildProfiler(entry_name)
+    error = None
+    try:
+        func(profiler)
+    except Exception as exc:
+        error = '{0}: {1}'.format(type(exc).__name__, exc)
+    report = profiler.report()
+
+    return OrderedDict([('map', map_name),
+                        ('entryPoint', entry_name),
+                        ('elapsed', report['elapsed']),
+                        ('commands', report['commands']),
+                        ('nodesCreated', report['nodesCreated']),
+                        ('error', error)])
+
+
+def _asStage(stage_name, func):
+    # Wraps func() to run as a single profiler stage
+    def run(profiler):
+        with profiler.stage(stage_name):
+            func()
+
+    return run
+
+
+def _legacyOrientJoint(joint, up_vector=(0, 1, 0), world_up=(0, 1, 0)):
+    # orientJoint as it was before the matrix API, aimed at the first child
+    # with every child unparented
+    children = cmds.listRelatives(joint, children=True, type='joint', fullPath=True)
+    if not children:
+        cmds.setAttr(joint + '.jointOrient', 0, 0, 0)
+        return
+
+    children = cmds.parent(children, world=True)
+    cmds.delete(cmds.aimConstraint(children[0], joint, upVector=up_vector,
+                                   worldUpVector=world_up))
+    cmds.makeIdentity(joint, apply=True)
+    cmds.parent(children, joint)
+
+
+def _newJointScene(chains, length):
+    cmds.file(new=True, force=True)
+    cmds.select(clear=True)
+    root = cmds.joint(name='root', position=(0, 100, 0))
+
+    joints = list()
+    for ci in range(chains):
+        cmds.select(root)
+        angle = np.radians(360.0 * ci / chains)
+        for ji in range(1, length + 1):
+            joints.append(cmds.joint(name='chain{}_{}'.format(ci, ji), position=(
+                np.cos(angle) * ji * 3, 100 + np.sin(ji) * 2, np.sin(angle) * ji * 3)))
+
+    return root, [cmds.ls(joint, long=True)[0] for joint in joints]
+
+
+def _loopFk2Ik(limbs, sides, frames):
+    for frame in frames:
+        cmds.currentTime(frame)
+        for limb in limbs:
+            for side in sides:
+                cmds.setAttr('FKIK{0}{1}.FKIKBlend'.format(limb, side), 10)
+                anim.alignFk2Ik('IK'+limb+side)
+                cmds.setKeyframe(['FK'+jname+side for jname in anim.JNT_GRPS[limb]],
+                                 attribute='rotate')
+
+
+def _loopIk2Fk(limbs, sides, frames):
+    for frame in frames:
+        cmds.currentTime(frame)
+        for limb in limbs:
+            for side in sides:
+                cmds.setAttr('FKIK{0}{1}.FKIKBlend'.format(limb, side), 0)
+                anim.alignIk2Fk('FK'+anim.JNT_GRPS[limb][0]+side)
+                cmds.setKeyframe(['IK'+limb+side, 'Pole'+limb+side],
+                                 attribute=('translate', 'rotate'))
+
+
+def _sampleRotations(nodes, frames):
+    return matrix.rotationPart(sampleMatrices(nodes, 'worldMatrix', frames))
+
+
+def _newSpaceScene(count):
+    cmds.file(new=True, force=True)
+    cmds.group(empty=True, name='spaces_grp')
+    cmds.group(cmds.group(empty=True, name='ctrl'), name='ctrl_grp')
+
+    driver_spaces = list()
+    for i in range(count):
+        driver = cmds.group(empty=True, name='driver{}'.format(i))
+        cmds.xform(driver, translation=(i, i % 3, -i), rotation=(0, i * 7, 0))
+        driver_spaces.append({driver: 'Space{}'.format(i)})
+
+    return driver_spaces
+
+
+def _newSwitchScene(ctrl_count, space_count):
+    # Returns space switch argument dicts for `ctrl_count` controllers with
+    # `space_count` shared drivers each
+    driver_spaces = _newSpaceScene(space_count)
+    cmds.delete('ctrl_grp')
+
+    args_list = list()
+    for i in range(ctrl_count):
+        ctrl = cmds.group(empty=True, name='ctrl{}'.format(i))
+        driven_node = cmds.group(ctrl, name='ctrl{}_grp'.format(i))
+        cmds.xform(driven_node, translation=(i % 10, i // 10, 0))
+        args_list.append({'controller': ctrl,
+                          'drivenNode': driven_node,
+                          'constraintType': 'parent',
+                          'spacesGrp': 'spaces_grp',
+                          'attrName': 'Spaces',
+                          'driverSpaces': driver_spaces})
+
+    return args_list
+
+
+def _getSpaceNetwork(controller, attr_name):
+    grps = spaceSwitch.getConstraintGroups(controller) or list()
+    return {'enum': cmds.addAttr('{}.{}'.format(controller, attr_name),
+                                 query=True, enumName=True),
+            'targets': grps,
+            'switchNo': [cmds.getAttr(grp + '.PP_switchNo') for grp in grps],
+            'drivers': [spaceSwitch.getDriverFromGrp(grp) for grp in grps],
+            'cond': [cmds.listConnections(grp + '.PP_condNode') for grp in grps]}
+
+
+def _formatValue(value):
+    if isinstance(value, float):
+        return '{:.4f}'.format(value)
+    return str(value)
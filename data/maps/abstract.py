@@ -1,32 +1,99 @@
 from abc import ABCMeta, abstractproperty
 import pymel.core as pm
 
+OPPOSITE_SIDES = {'_R': '_L', '_L': '_R', '_M': '_M'}
+
+
+class FrozenDict(dict):
+    """Read-only dict, for tables shared between all users of a map."""
+
+    def _readOnly(self, *args, **kwargs):
+        raise TypeError("'{}' object is read-only".format(type(self).__name__))
+
+    __setitem__ = __delitem__ = _readOnly
+    clear = pop = popitem = setdefault = update = _readOnly
+
+
+class SkeletonTables(object):
+    """
+    Lookup tables compiled once from a joint map.
+
+    Attributes
+    ----------
+    order : tuple
+        AS5 joint names in declaration order, which lists parents before
+        their children.
+    index : FrozenDict
+        AS5 joint name to position in `order`.
+    as5_to_source : FrozenDict
+        AS5 joint name to source joint name ('' if unmapped).
+    sources : frozenset
+        Source joint names.
+    mapped, unmapped : frozenset
+        AS5 joint names with and without a source joint.
+    mapped_order, unmapped_order : tuple
+        The same names, in `order`.
+    by_side : FrozenDict
+        '_R', '_L' and '_M' to the tuple of AS5 joint names on that side.
+    custom_locs : FrozenDict
+        AS5 joint name to custom local translation.
+    control_names : tuple
+
+    """
+
+    def __init__(self, joint_map, custom_locs=None, control_names=()):
+        self.order = tuple(jname for jname, _ in joint_map)
+        self.index = FrozenDict((jname, i) for i, jname in enumerate(self.order))
+        self.as5_to_source = FrozenDict(joint_map)
+        self.sources = frozenset(src for _, src in joint_map if src)
+        self.mapped = frozenset(jname for jname, src in joint_map if src)
+        self.unmapped = frozenset(self.order) - self.mapped
+        self.mapped_order = tuple(jname for jname in self.order if jname in self.mapped)
+        self.unmapped_order = tuple(jname for jname in self.order if jname in self.unmapped)
+        self.by_side = FrozenDict(
+            (side, tuple(jname for jname in self.order if jname[-2:] == side))
+            for side in OPPOSITE_SIDES)
+        self.custom_locs = FrozenDict(custom_locs or dict())
+        self.control_names = tuple(control_names)
+
 
 class AbstractJointMap(object):
+    """
+    Maps AS5 FitSkeleton joints to a source skeleton.  Subclasses provide
+    `tables`, a SkeletonTables compiled once and shared.
+    """
     __metaclass__ = ABCMeta
 
     def __init__(self):
         pass
 
     @abstractproperty
-    def joint_map(self):
+    def tables(self):
         pass
 
-    @abstractproperty
+    @property
+    def joint_map(self):
+        return self.tables.as5_to_source
+
+    @property
     def custom_locs(self):
-        pass
+        return self.tables.custom_locs
+
+    @property
+    def control_names(self):
+        return self.tables.control_names
 
     @property
     def jnames(self):
-        return list(self.joint_map.keys())
+        return self.tables.order
 
     @property
     def jnames_mapped(self):
-        return [jname for jname in self.jnames if self.joint_map[jname]]
+        return self.tables.mapped_order
 
     @property
     def jnames_unmapped(self):
-        return [jname for jname in self.jnames if not self.joint_map[jname]]
+        return self.tables.unmapped_order
 
     def getJoints(self):
         if self.joint_map:
@@ -0,0 +1,111 @@
+"""
+Skeleton maps defined in JSON files:
+
+    {
+        "joint_map": [["Root_M", "hip"], ["Spine1_M", "abdomenLower"], ...],
+        "custom_locs": {"HeadEnd_M": [0.0, 19.7225, 0.0], ...},
+        "control_names": ["FKRoot_M", ...]
+    }
+
+joint_map lists (AS5 joint, source joint) pairs, parents first, with ""
+for AS5 joints that have no source joint.  control_names is optional.
+Files are read when a map is first used, validated, and compiled into
+SkeletonTables cached by file content hash.
+"""
+import hashlib
+import json
+import os
+
+from .abstract import AbstractJointMap, SkeletonTables, OPPOSITE_SIDES
+
+MAP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Content hash: SkeletonTables
+_TABLES = dict()
+
+
+class FileJointMap(AbstractJointMap):
+    """
+    Joint map read from a JSON file.
+
+    Parameters
+    ----------
+    map_file : str, optional
+        Path of the map file; relative paths are looked up in MAP_DIR.
+        Defaults to the class's MAP_FILE.
+
+    """
+
+    MAP_FILE = None
+
+    def __init__(self, map_file=None):
+        super(FileJointMap, self).__init__()
+        self.map_file = os.path.join(MAP_DIR, map_file or self.MAP_FILE)
+        self._tables = None
+
+    @property
+    def tables(self):
+        if self._tables is None:
+            self._tables = loadMapFile(self.map_file)
+
+        return self._tables
+
+
+def loadMapFile(map_file):
+    """
+    Returns the SkeletonTables of `map_file`, parsing and validating it
+    only if no file with the same content was loaded before.
+    """
+
+    with open(map_file, 'rb') as json_file:
+        content = json_file.read()
+
+    key = hashlib.sha1(content).hexdigest()
+    if key not in _TABLES:
+        try:
+            map_data = json.loads(content.decode('utf-8'))
+            validateMapData(map_data)
+        except ValueError as err:
+            raise ValueError("Invalid skeleton map '{0}': {1}".format(map_file, err))
+        _TABLES[key] = SkeletonTables(
+            [tuple(pair) for pair in map_data['joint_map']],
+            {jname: tuple(loc) for jname, loc in map_data['custom_locs'].items()},
+            map_data.get('control_names', ()))
+
+    return _TABLES[key]
+
+
+def validateMapData(map_data):
+    """Raises ValueError if `map_data` is not a valid skeleton map."""
+
+    if not isinstance(map_data, dict):
+        raise ValueError('expected an object')
+    for key in 'joint_map', 'custom_locs':
+        if key not in map_data:
+            raise ValueError("missing '{}'".format(key))
+
+    jnames = set()
+    for pair in map_data['joint_map']:
+        if not (isinstance(pair, list) and len(pair) == 2 and
+                all(_isString(name) for name in pair)):
+            raise ValueError('joint_map entries must be [AS5 name, source name] '
+                             'pairs, got {!r}'.format(pair))
+        if pair[0][-2:] not in OPPOSITE_SIDES:
+            raise ValueError("AS5 joint '{}' has no _R/_L/_M suffix".format(pair[0]))
+        if pair[0] in jnames:
+            raise ValueError("AS5 joint '{}' is listed twice".format(pair[0]))
+        jnames.add(pair[0])
+
+    for jname, loc in map_data['custom_locs'].items():
+        if jname not in jnames:
+            raise ValueError("custom_locs joint '{}' is not in joint_map".format(jname))
+        if not (isinstance(loc, list) and len(loc) == 3 and
+                all(isinstance(value, (int, float)) for value in loc)):
+            raise ValueError("custom_locs '{}' must be three numbers".format(jname))
+
+    if not all(_isString(name) for name in map_data.get('control_names', ())):
+        raise ValueError('control_names must be strings')
+
+
+def _isString(value):
+    return hasattr(value, 'lower')
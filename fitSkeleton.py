@@ -0,0 +1,388 @@
+"""
+Reader for AdvancedSkeleton FitSkeleton Maya ASCII files, without Maya.
+
+The file is read one statement at a time.  createNode, addAttr and setAttr
+statements of joints and transforms are parsed; everything else, such as
+mesh data, is skipped line by line.  Transforms that have no joints below
+them (cameras and the like) are dropped.
+
+    from as5util.fitSkeleton import loadFitSkeleton
+    fit_skel = loadFitSkeleton('daz_g8f.ma')
+    fit_skel.translate[fit_skel.index['Knee']]
+
+Results are cached in memory and on disk (<content hash>.npz in CACHE_DIR)
+by file content, so each file version is parsed once.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.as5util', 'fitSkeletons')
+# Bump when the cached arrays change
+CACHE_VERSION = 1
+
+NODE_TYPES = ('joint', 'transform')
+# setAttr name: (long name, component or None)
+CHANNELS = {'t': ('translate', None), 'r': ('rotate', None), 'jo': ('jointOrient', None),
+            'ro': ('rotateOrder', None), 'translate': ('translate', None),
+            'rotate': ('rotate', None), 'jointOrient': ('jointOrient', None),
+            'rotateOrder': ('rotateOrder', None)}
+for _short, _long in ('t', 'translate'), ('r', 'rotate'), ('jo', 'jointOrient'):
+    for _i, _axis in enumerate('xyz'):
+        CHANNELS[_short + _axis] = (_long, _i)
+        CHANNELS[_long + _axis.upper()] = (_long, _i)
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|;|[^\s;"]+')
+_UNESCAPE = re.compile(r'\\(.)')
+# setAttr flags that take a value
+_SETATTR_ARGS = frozenset(['-k', '-keyable', '-l', '-lock', '-cb', '-channelBox',
+                           '-s', '-size', '-type', '-typ'])
+_BOOLS = {'true': True, 'on': True, 'yes': True,
+          'false': False, 'off': False, 'no': False}
+_FIT_SKELETONS = dict()
+
+
+class FitSkeleton(object):
+    """
+    Joints and transforms of a FitSkeleton file, parents first.
+
+    Attributes
+    ----------
+    names, types : tuple
+        Node names and types ('joint' or 'transform').
+    parents : np.ndarray
+        Index of each node's parent, or -1, shape (n,).
+    index : dict
+        Node name to index.
+    translate, rotate, joint_orient : np.ndarray
+        Channel values in the file's units, shape (n, 3).
+    rotate_order : np.ndarray
+        Shape (n,).
+    attr_defs : tuple
+        Per node, the list of addAttr flag dicts (short flag: value) of its
+        custom attributes, in creation order.
+    attr_values : tuple
+        Per node, a dict of custom attribute long name to value.
+
+    """
+
+    def __init__(self, names, types, parents, translate, rotate, joint_orient,
+                 rotate_order, attr_defs, attr_values):
+        self.names = tuple(names)
+        self.types = tuple(types)
+        self.parents = np.asarray(parents, dtype=int)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.translate = np.asarray(translate, dtype=float).reshape(-1, 3)
+        self.rotate = np.asarray(rotate, dtype=float).reshape(-1, 3)
+        self.joint_orient = np.asarray(joint_orient, dtype=float).reshape(-1, 3)
+        self.rotate_order = np.asarray(rotate_order, dtype=int)
+        self.attr_defs = tuple(attr_defs)
+        self.attr_values = tuple(attr_values)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def parent(self, name):
+        """Returns the parent name of `name`, or None for a root."""
+
+        i = self.parents[self.index[name]]
+        return self.names[i] if i >= 0 else None
+
+    def children(self, name):
+        i = self.index[name]
+        return [self.names[j] for j in np.flatnonzero(self.parents == i)]
+
+    def joints(self):
+        return [name for name, node_type in zip(self.names, self.types)
+                if node_type == 'joint']
+
+    def save(self, path):
+        """Writes the skeleton as compressed arrays."""
+
+        with open(path, 'wb') as cache_file:
+            np.savez_compressed(
+                cache_file,
+                version=np.array(CACHE_VERSION),
+                names=np.array(self.names, dtype=str).reshape(-1),
+                types=np.array(self.types, dtype=str).reshape(-1),
+                parents=self.parents,
+                translate=self.translate,
+                rotate=self.rotate,
+                joint_orient=self.joint_orient,
+                rotate_order=self.rotate_order,
+                attrs=np.array(json.dumps([self.attr_defs, self.attr_values])))
+
+    @classmethod
+    def load(cls, path):
+        """Reads a skeleton written by save, or returns None if it is outdated."""
+
+        with np.load(path) as data:
+            if int(data['version']) != CACHE_VERSION:
+                return
+            attr_defs, attr_values = json.loads(str(data['attrs']))
+
+            return cls([str(name) for name in data['names']],
+                       [str(node_type) for node_type in data['types']],
+                       data['parents'], data['translate'], data['rotate'],
+                       data['joint_orient'], data['rotate_order'],
+                       attr_defs, attr_values)
+
+
+def loadFitSkeleton(ma_path, cache_dir=None):
+    """
+    Returns the FitSkeleton of `ma_path`, from the cache if the file's
+    content was parsed before.
+
+    Parameters
+    ----------
+    ma_path : str
+    cache_dir : str, optional
+        Directory of the on-disk cache.  Defaults to CACHE_DIR; pass '' to
+        cache in memory only.
+
+    """
+
+    key = fileHash(ma_path)
+    if key in _FIT_SKELETONS:
+        return _FIT_SKELETONS[key]
+
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    cache_file = os.path.join(cache_dir, key + '.npz') if cache_dir else None
+    fit_skel = None
+    if cache_file and os.path.isfile(cache_file):
+        fit_skel = FitSkeleton.load(cache_file)
+    if fit_skel is None:
+        fit_skel = readMaFile(ma_path)
+        if cache_file:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fit_skel.save(cache_file)
+
+    _FIT_SKELETONS[key] = fit_skel
+
+    return fit_skel
+
+
+def fileHash(path, chunk_size=1 << 20):
+    """Returns the SHA-1 hex digest of a file's content, read in chunks."""
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as in_file:
+        for chunk in iter(lambda: in_file.read(chunk_size), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def readMaFile(ma_path):
+    """Parses the joints and transforms of a Maya ASCII file into a FitSkeleton."""
+
+    nodes = list()
+    by_name = dict()
+    current = None
+
+    with io.open(ma_path, 'r', encoding='utf-8', errors='replace') as ma_file:
+        for command, tokens in _statements(ma_file, lambda: current is not None):
+            if command == 'createNode':
+                current = _createNode(tokens, nodes, by_name)
+            elif command == 'select':
+                current = None
+            elif current is None:
+                continue
+            elif command == 'addAttr':
+                _addAttr(current, tokens)
+            elif command == 'setAttr':
+                _setAttr(current, tokens)
+
+    # Keep joints and the transforms above them
+    keep = set()
+    for node in nodes:
+        if node['type'] == 'joint':
+            while node is not None and node['name'] not in keep:
+                keep.add(node['name'])
+                node = by_name.get(node['parent'])
+    nodes = [node for node in nodes if node['name'] in keep]
+    index = {node['name']: i for i, node in enumerate(nodes)}
+
+    return FitSkeleton([node['name'] for node in nodes],
+                       [node['type'] for node in nodes],
+                       [index.get(node['parent'], -1) for node in nodes],
+                       [node['translate'] for node in nodes],
+                       [node['rotate'] for node in nodes],
+                       [node['jointOrient'] for node in nodes],
+                       [node['rotateOrder'] for node in nodes],
+                       [node['attr_defs'] for node in nodes],
+                       [node['attr_values'] for node in nodes])
+
+
+def compareSkelMap(fit_skel, sk_map):
+    """
+    Checks a skeleton map against a FitSkeleton.
+
+    Returns
+    -------
+    dict
+        'missing': AS5 joint names of `sk_map` with no FitSkeleton joint;
+        'unused': FitSkeleton joints that no AS5 joint name refers to.
+
+    """
+
+    fit_names = {jname.split('_')[0]: jname for jname in sk_map.tables.order}
+
+    return {'missing': sorted(jname for name, jname in fit_names.items()
+                              if name not in fit_skel),
+            'unused': sorted(name for name in fit_skel.joints()
+                             if name not in fit_names)}
+
+
+def _statements(ma_file, want_attrs):
+    # Yields (command, tokens) per statement.  setAttr and addAttr
+    # statements are only tokenized if want_attrs() is true.
+    tokens, skip = None, False
+    for line in ma_file:
+        if tokens is None:
+            command = line.split(None, 1)[0] if line.strip() else ''
+            if not command or command.startswith('//'):
+                continue
+            skip = command in ('setAttr', 'addAttr') and not want_attrs() or \
+                command not in ('createNode', 'select', 'setAttr', 'addAttr')
+            tokens = list()
+        if skip:
+            if line.rstrip().endswith(';'):
+                tokens = None
+            continue
+
+        tokens.extend(_TOKEN.findall(line))
+        if tokens and tokens[-1] == ';':
+            yield tokens[0], _joinStrings(tokens[1:-1])
+            tokens = None
+
+
+def _joinStrings(tokens):
+    # Unquotes strings and joins "a" + "b" continuations
+    joined = list()
+    for token in tokens:
+        if token.startswith('"'):
+            token = _UNESCAPE.sub(
+                lambda match: {'n': '\n', 't': '\t'}.get(match.group(1), match.group(1)),
+                token[1:-1])
+            if len(joined) > 1 and joined[-1] == '+' and isinstance(joined[-2], _Str):
+                joined.pop()
+                token = joined.pop() + token
+            token = _Str(token)
+        joined.append(token)
+
+    return joined
+
+
+class _Str(str):
+    # Marks tokens that were quoted strings
+    pass
+
+
+def _flags(tokens, arg_flags=None):
+    # Splits tokens into ({flag: value}, [positional]).  With arg_flags,
+    # only those flags take a value; otherwise every flag does unless the
+    # next token is a flag too.
+    flags, args = dict(), list()
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.startswith('-') and not isinstance(token, _Str) and \
+                not _isNumber(token):
+            takes_arg = token in arg_flags if arg_flags is not None else \
+                i + 1 < len(tokens) and not (tokens[i + 1].startswith('-') and
+                                             not isinstance(tokens[i + 1], _Str) and
+                                             not _isNumber(tokens[i + 1]))
+            if takes_arg:
+                flags[token[1:]] = _value(tokens[i + 1])
+                i += 1
+            else:
+                flags[token[1:]] = True
+        else:
+            args.append(token)
+        i += 1
+
+    return flags, args
+
+
+def _createNode(tokens, nodes, by_name):
+    flags, args = _flags(tokens, frozenset(['-n', '-name', '-p', '-parent']))
+    node_type = args[0] if args else None
+    if node_type not in NODE_TYPES:
+        return
+
+    name = flags.get('n', flags.get('name', ''))
+    parent = flags.get('p', flags.get('parent', ''))
+    node = {'name': name, 'type': node_type,
+            'parent': parent.rsplit('|', 1)[-1] if parent else None,
+            'translate': [0.0] * 3, 'rotate': [0.0] * 3, 'jointOrient': [0.0] * 3,
+            'rotateOrder': 0, 'attr_defs': list(), 'attr_values': dict(),
+            'attr_names': dict()}
+    nodes.append(node)
+    by_name[name] = node
+
+    return node
+
+
+def _addAttr(node, tokens):
+    flags = _flags(tokens)[0]
+    node['attr_defs'].append(flags)
+    long_name = flags.get('ln', flags.get('longName'))
+    if long_name:
+        node['attr_names'][long_name] = long_name
+        node['attr_names'][flags.get('sn', flags.get('shortName', long_name))] = long_name
+
+
+def _setAttr(node, tokens):
+    flags, args = _flags(tokens, _SETATTR_ARGS)
+    if not args or not args[0].startswith('.'):
+        return
+
+    attr_name = args[0][1:]
+    values = [_value(arg) for arg in args[1:]]
+    if not values:
+        return
+
+    if attr_name in CHANNELS:
+        long_name, component = CHANNELS[attr_name]
+        if long_name == 'rotateOrder':
+            node[long_name] = int(values[0])
+        elif component is None:
+            node[long_name] = [float(value) for value in values[:3]]
+        else:
+            node[long_name][component] = float(values[0])
+        return
+
+    if attr_name in node['attr_names']:
+        node['attr_values'][node['attr_names'][attr_name]] = \
+            values[0] if len(values) == 1 else values
+
+
+def _value(token):
+    if isinstance(token, _Str):
+        return str(token)
+    if token in _BOOLS:
+        return _BOOLS[token]
+    try:
+        return int(token)
+    except ValueError:
+        try:
+            return float(token)
+        except ValueError:
+            return token
+
+
+def _isNumber(token):
+    try:
+        float(token)
+    except ValueError:
+        return False
+
+    return True
@@ -0,0 +1,350 @@
+"""
+Batched transform math on NumPy arrays, using Maya's conventions: row
+vectors, 4x4 matrices with translation in the last row, world = local *
+parent, and rotate orders named as in the rotateOrder attribute.
+
+Functions take arrays with any number of leading (batch) dimensions.
+"""
+import numpy as np
+
+ROTATE_ORDERS = ('xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx')
+_AXES = {'x': 0, 'y': 1, 'z': 2}
+
+
+def axisMatrix(axis, angles):
+    """
+    Returns rotation matrices about a single axis.
+
+    Parameters
+    ----------
+    axis : int
+        0, 1 or 2 for x, y or z.
+    angles : np.ndarray
+        Angles in radians, shape (...).
+
+    Returns
+    -------
+    np.ndarray
+        Shape (..., 3, 3).
+
+    """
+
+    angles = np.asarray(angles, dtype=float)
+    cos, sin = np.cos(angles), np.sin(angles)
+    mats = np.zeros(angles.shape + (3, 3))
+    i, j = (axis + 1) % 3, (axis + 2) % 3
+    mats[..., axis, axis] = 1.0
+    mats[..., i, i] = cos
+    mats[..., i, j] = sin
+    mats[..., j, i] = -sin
+    mats[..., j, j] = cos
+
+    return mats
+
+
+def eulerToMatrix(rotations, order='xyz'):
+    """
+    Converts Euler rotations to rotation matrices.
+
+    Parameters
+    ----------
+    rotations : np.ndarray
+        Rotations in degrees, shape (..., 3).
+    order : str or int, optional
+        Rotate order, as a name or as the rotateOrder attribute value.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (..., 3, 3).
+
+    """
+
+    order = _orderName(order)
+    rad = np.radians(np.asarray(rotations, dtype=float))
+    first, second, third = (_AXES[axis] for axis in order)
+
+    return np.matmul(np.matmul(axisMatrix(first, rad[..., first]),
+                               axisMatrix(second, rad[..., second])),
+                     axisMatrix(third, rad[..., third]))
+
+
+def matrixToEuler(mats, order='xyz'):
+    """
+    Converts rotation matrices to Euler rotations.
+
+    Parameters
+    ----------
+    mats : np.ndarray
+        Orthonormal rotation matrices, shape (..., 3, 3) or (..., 4, 4).
+    order : str or int, optional
+        Rotate order, as a name or as the rotateOrder attribute value.
+
+    Returns
+    -------
+    np.ndarray
+        Rotations in degrees, shape (..., 3).
+
+    """
+
+    order = _orderName(order)
+    mats = np.asarray(mats, dtype=float)[..., :3, :3]
+    i, j, k = (_AXES[axis] for axis in order)
+    sign = 1.0 if (j - i) % 3 == 1 else -1.0
+
+    rotations = np.zeros(mats.shape[:-2] + (3,))
+    rotations[..., j] = np.arcsin(np.clip(-sign * mats[..., i, k], -1.0, 1.0))
+    rotations[..., i] = np.arctan2(sign * mats[..., j, k], mats[..., k, k])
+    rotations[..., k] = np.arctan2(sign * mats[..., i, j], mats[..., i, i])
+
+    return np.degrees(rotations)
+
+
+def filterEuler(rotations, axis=-2):
+    """
+    Removes 360 degree jumps between consecutive rotations along `axis`
+    (the frame axis of a (..., frames, 3) array by default).
+    """
+
+    return np.degrees(np.unwrap(np.radians(rotations), axis=axis))
+
+
+def composeMatrix(translate=None, rotate=None, scale=None):
+    """
+    Builds 4x4 matrices from translations, 3x3 rotation matrices and scales.
+
+    Parameters
+    ----------
+    translate : np.ndarray, optional
+        Shape (..., 3).
+    rotate : np.ndarray, optional
+        Rotation matrices, shape (..., 3, 3).
+    scale : np.ndarray, optional
+        Shape (..., 3).
+
+    Returns
+    -------
+    np.ndarray
+        Shape (..., 4, 4).
+
+    """
+
+    shapes = [np.shape(translate)[:-1] if translate is not None else (),
+              np.shape(rotate)[:-2] if rotate is not None else (),
+              np.shape(scale)[:-1] if scale is not None else ()]
+    shape = max(shapes, key=len)
+
+    mats = np.zeros(shape + (4, 4))
+    mats[..., :3, :3] = np.identity(3) if rotate is None else rotate
+    if scale is not None:
+        mats[..., :3, :3] *= np.asarray(scale, dtype=float)[..., :, np.newaxis]
+    if translate is not None:
+        mats[..., 3, :3] = translate
+    mats[..., 3, 3] = 1.0
+
+    return mats
+
+
+def aimMatrices(aim, up, aim_axis=(1, 0, 0), up_axis=(0, 1, 0)):
+    """
+    Returns rotation matrices that point the local `aim_axis` along `aim`
+    and bring the local `up_axis` as close as possible to `up`, as an
+    aimConstraint with the same aim, up and world up vectors gives.
+
+    Parameters
+    ----------
+    aim, up : np.ndarray
+        World vectors, shape (..., 3); broadcast against each other.
+    aim_axis, up_axis : tuple, optional
+        Orthogonal local axes.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (..., 3, 3).
+
+    """
+
+    world_frame = _frame(np.asarray(aim, dtype=float), np.asarray(up, dtype=float))
+    local_frame = _frame(np.asarray(aim_axis, dtype=float),
+                         np.asarray(up_axis, dtype=float))
+
+    return np.matmul(np.swapaxes(local_frame, -1, -2), world_frame)
+
+
+def _frame(aim, up):
+    # Orthonormal rows (aim, up', aim x up') from an aim and an up vector
+    aim, up = np.broadcast_arrays(aim, up)
+    x_axis = aim / np.linalg.norm(aim, axis=-1)[..., np.newaxis]
+    z_axis = np.cross(x_axis, up)
+    z_axis /= np.linalg.norm(z_axis, axis=-1)[..., np.newaxis]
+    y_axis = np.cross(z_axis, x_axis)
+
+    return np.stack([x_axis, y_axis, z_axis], axis=-2)
+
+
+def rotationPart(mats):
+    """Returns the orthonormalized 3x3 rotation of (..., 4, 4) matrices."""
+
+    rot = np.array(mats, dtype=float)[..., :3, :3]
+    rot /= np.linalg.norm(rot, axis=-1)[..., np.newaxis]
+
+    return rot
+
+
+def translationPart(mats):
+    """Returns the translation of (..., 4, 4) matrices as (..., 3)."""
+
+    return np.array(mats, dtype=float)[..., 3, :3]
+
+
+def transformPoints(points, mats):
+    """Transforms (..., 3) points by (..., 4, 4) matrices."""
+
+    points = np.asarray(points, dtype=float)
+    mats = np.asarray(mats, dtype=float)
+
+    return np.einsum('...i,...ij->...j', points, mats[..., :3, :3]) + mats[..., 3, :3]
+
+
+def transformVectors(vectors, mats):
+    """Transforms (..., 3) direction vectors by (..., 3, 3) or (..., 4, 4) matrices."""
+
+    mats = np.asarray(mats, dtype=float)
+
+    return np.einsum('...i,...ij->...j', np.asarray(vectors, dtype=float),
+                     mats[..., :3, :3])
+
+
+def localRotation(world_rot, parent_rot, joint_orient=None, rotate_axis=None):
+    """
+    Returns the rotation matrix that gives a node the world rotation
+    `world_rot` under a parent with world rotation `parent_rot`, with the
+    node's jointOrient and rotateAxis factored out.
+
+    Parameters
+    ----------
+    world_rot, parent_rot : np.ndarray
+        Rotation matrices, shape (..., 3, 3).
+    joint_orient, rotate_axis : np.ndarray, optional
+        Rotation matrices of the node's jointOrient and rotateAxis.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (..., 3, 3).
+
+    """
+
+    local_rot = np.matmul(world_rot, np.swapaxes(parent_rot, -1, -2))
+    if joint_orient is not None:
+        local_rot = np.matmul(local_rot, np.swapaxes(joint_orient, -1, -2))
+    if rotate_axis is not None:
+        local_rot = np.matmul(np.swapaxes(rotate_axis, -1, -2), local_rot)
+
+    return local_rot
+
+
+def poleVectors(start, mid, end):
+    """
+    Returns the component of (mid - start) orthogonal to (end - start), for
+    (..., 3) arrays of positions.  See utils.getPoleVector.
+    """
+
+    start = np.asarray(start, dtype=float)
+    base = np.asarray(end, dtype=float) - start
+    base /= np.linalg.norm(base, axis=-1)[..., np.newaxis]
+    vec_mid = np.asarray(mid, dtype=float) - start
+
+    return vec_mid - np.sum(vec_mid * base, axis=-1)[..., np.newaxis] * base
+
+
+def chainVectors(start, mid, end, target_dirs=None, flatten_axis=None):
+    """
+    Computes pole vectors, plane normals and mid-joint corrections of
+    three-joint chains (hip/knee/ankle, shoulder/elbow/wrist) in one call.
+
+    Parameters
+    ----------
+    start, mid, end : np.ndarray
+        Joint positions, shape (..., 3), e.g. (chains, frames, 3).
+    target_dirs : np.ndarray, optional
+        Directions the pole vectors should point in, shape (..., 3).
+    flatten_axis : int, optional
+        World axis (0, 1 or 2) removed from the pole vectors and target
+        directions before computing offsets, to correct in a plane only.
+
+    Returns
+    -------
+    tuple
+        (poles, normals, offsets): pole vectors as from poleVectors, unit
+        normals of the chain planes (mid - start) x (end - start), and the
+        translations of `mid` that turn the (flattened) pole vectors onto
+        `target_dirs` at the same length, or None without `target_dirs`.
+
+    """
+
+    poles = poleVectors(start, mid, end)
+    start = np.asarray(start, dtype=float)
+    normals = np.cross(np.asarray(mid, dtype=float) - start,
+                       np.asarray(end, dtype=float) - start)
+    normals /= np.linalg.norm(normals, axis=-1)[..., np.newaxis]
+
+    offsets = None
+    if target_dirs is not None:
+        curr_vecs = poles.copy()
+        target_dirs = np.array(target_dirs, dtype=float)
+        if flatten_axis is not None:
+            curr_vecs[..., flatten_axis] = 0.0
+            target_dirs[..., flatten_axis] = 0.0
+        target_dirs /= np.linalg.norm(target_dirs, axis=-1)[..., np.newaxis]
+        offsets = target_dirs * np.linalg.norm(curr_vecs, axis=-1)[..., np.newaxis] \
+            - curr_vecs
+
+    return poles, normals, offsets
+
+
+def mirrorMatrices(mats, center=None, axis=0):
+    """
+    Mirrors (..., 4, 4) world matrices across the plane through `center`
+    normal to its `axis` (the YZ plane of the center by default).
+
+    Rotations are mirrored with behavior, as for joints mirrored with
+    mirrorJoint -mirrorBehavior: the reflected axes are all negated, so the
+    result is a proper rotation.  Scale is discarded.
+
+    Parameters
+    ----------
+    mats : np.ndarray
+        Shape (..., 4, 4).
+    center : np.ndarray, optional
+        World matrix of the mirror center, shape (4, 4) or broadcastable
+        against `mats` (e.g. one per frame); the world origin if omitted.
+    axis : int, optional
+        0, 1 or 2 for x, y or z.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (..., 4, 4).
+
+    """
+
+    center = np.identity(4) if center is None else \
+        composeMatrix(translationPart(center), rotationPart(center))
+    reflect = np.identity(4)
+    reflect[axis, axis] = -1.0
+
+    local = np.matmul(composeMatrix(translationPart(mats), rotationPart(mats)),
+                      np.linalg.inv(center))
+    local = np.matmul(local, reflect)
+    local[..., :3, :3] *= -1.0
+
+    return np.matmul(local, center)
+
+
+def _orderName(order):
+    if hasattr(order, 'lower'):
+        return order.lower()
+
+    return ROTATE_ORDERS[int(order)]
@@ -0,0 +1,270 @@
+"""
+Named pose slots per character, stored as arrays on disk.
+
+A library holds one file per character (<character>.npz in the pose
+directory) with the slot names, the plug names shared by every slot and a
+(slots, plugs) value array, NaN where a slot has no value for a plug.
+The file is read on first use and rewritten whenever a slot changes.
+
+    from as5util.poseLibrary import getPoseLibrary
+    lib = getPoseLibrary('g8f')
+    lib.capture('idle')
+    lib.apply('idle')
+
+The rig's rest pose is kept separately, in PP_restPlugs/PP_restValues
+array attributes on ControlSet, so it travels with the scene.
+
+"""
+import os
+import numpy as np
+import maya.cmds as cmds
+
+from .utils import getAttrs, setAttrs
+
+_LIBRARIES = dict()
+_REST_POSES = dict()
+
+
+def getPoseDir():
+    """Returns the directory holding pose library files."""
+
+    return os.path.join(cmds.internalVar(userAppDir=True), 'as5util', 'poses')
+
+
+def getPoseLibrary(character):
+    """Returns the shared PoseLibrary for `character`, creating it on first use."""
+
+    if character not in _LIBRARIES:
+        _LIBRARIES[character] = PoseLibrary(character)
+
+    return _LIBRARIES[character]
+
+
+def getControls():
+    """Returns the members of ControlSet, or the selection if there is none."""
+
+    if cmds.objExists('ControlSet'):
+        return cmds.sets('ControlSet', query=True) or list()
+
+    return cmds.ls(sl=True)
+
+
+def captureRestPose(nodes=None, obj_set='ControlSet'):
+    """
+    Stores the current keyable attribute values of `nodes` (the members of
+    `obj_set` by default) as the rest pose on `obj_set`.  Run on a freshly
+    built rig, at the end of postBuild.
+
+    Returns
+    -------
+    int
+        Number of plugs stored.
+
+    """
+
+    plug_values = getAttrs(nodes or cmds.sets(obj_set, query=True) or list())
+    for attr_name, data_type in [('PP_restPlugs', 'stringArray'),
+                                 ('PP_restValues', 'doubleArray')]:
+        if not cmds.attributeQuery(attr_name, node=obj_set, exists=True):
+            cmds.addAttr(obj_set, longName=attr_name, dataType=data_type)
+
+    cmds.setAttr(obj_set + '.PP_restPlugs', len(plug_values),
+                 *plug_values.keys(), type='stringArray')
+    cmds.setAttr(obj_set + '.PP_restValues',
+                 [float(value) for value in plug_values.values()], type='doubleArray')
+    _REST_POSES.pop(_restKey(obj_set), None)
+
+    return len(plug_values)
+
+
+def getRestPose(obj_set='ControlSet'):
+    """
+    Returns the rest pose stored on `obj_set` as (plugs, values), a list of
+    plug names and an array of values, or None if none was captured.  The
+    result is cached per set node.
+    """
+
+    key = _restKey(obj_set)
+    if key not in _REST_POSES:
+        if not key or not cmds.attributeQuery('PP_restPlugs', node=obj_set, exists=True):
+            return
+        _REST_POSES[key] = (cmds.getAttr(obj_set + '.PP_restPlugs') or list(),
+                            np.array(cmds.getAttr(obj_set + '.PP_restValues') or list()))
+
+    return _REST_POSES[key]
+
+
+def applyRestPose(nodes=None, obj_set='ControlSet'):
+    """
+    Resets `nodes` (every control in the rest pose by default) to the rest
+    pose stored on `obj_set`, writing only plugs that differ.
+
+    Returns
+    -------
+    list
+        Plugs written, or None if no rest pose was captured.
+
+    """
+
+    rest_pose = getRestPose(obj_set)
+    if rest_pose is None:
+        return
+
+    plugs, values = rest_pose
+    if nodes is not None:
+        nodes = set(nodes)
+        keep = [i for i, plug in enumerate(plugs) if plug.split('.')[0] in nodes]
+        plugs, values = [plugs[i] for i in keep], values[keep]
+
+    return setAttrs(dict(zip(plugs, values)))
+
+
+def _restKey(obj_set):
+    uuids = cmds.ls(obj_set, uuid=True)
+    return uuids[0] if uuids else None
+
+
+class PoseLibrary(object):
+    """
+    Pose slots of one character.
+
+    Parameters
+    ----------
+    character : str
+        Library name; also the file name.
+    path : str, optional
+        File path.  Defaults to <character>.npz in getPoseDir().
+
+    """
+
+    def __init__(self, character, path=None):
+        self.character = character
+        self.path = path or os.path.join(getPoseDir(), character + '.npz')
+        self._names = None
+        self._plugs = None
+        self._plug_index = None
+        self._values = None
+
+    def slots(self):
+        """Returns the slot names, in the order they were first stored."""
+
+        self._load()
+        return list(self._names)
+
+    def hasSlot(self, slot):
+        self._load()
+        return slot in self._names
+
+    def get(self, slot):
+        """Returns the stored values of `slot` as a dict of plug to value."""
+
+        self._load()
+        row = self._values[self._names.index(slot)]
+
+        return {plug: float(row[i]) for i, plug in enumerate(self._plugs)
+                if not np.isnan(row[i])}
+
+    def store(self, slot, plug_values, save=True):
+        """
+        Stores `plug_values` (a dict of plug to value) in `slot`, replacing
+        its previous contents.
+        """
+
+        self._load()
+        new_plugs = [plug for plug in plug_values if plug not in self._plug_index]
+        if new_plugs:
+            for plug in new_plugs:
+                self._plug_index[plug] = len(self._plugs)
+                self._plugs.append(plug)
+            self._values = np.pad(self._values, ((0, 0), (0, len(new_plugs))),
+                                  'constant', constant_values=np.nan)
+
+        row = np.full(len(self._plugs), np.nan)
+        row[[self._plug_index[plug] for plug in plug_values]] = \
+            [float(value) for value in plug_values.values()]
+
+        if slot in self._names:
+            self._values[self._names.index(slot)] = row
+        else:
+            self._names.append(slot)
+            self._values = np.vstack([self._values, row[np.newaxis]])
+
+        if save:
+            self.save()
+
+    def capture(self, slot, nodes=None, save=True):
+        """
+        Stores the keyable, unlocked attribute values of `nodes` (the
+        character's controls by default) in `slot`.
+        """
+
+        plug_values = getAttrs(nodes or getControls())
+        self.store(slot, plug_values, save)
+
+        return plug_values
+
+    def apply(self, slot, nodes=None):
+        """
+        Sets the values stored in `slot` on the scene, limited to `nodes` if
+        given.  Plugs that no longer exist are skipped.
+        """
+
+        plug_values = self.get(slot)
+        if nodes is not None:
+            nodes = set(nodes)
+            plug_values = {plug: value for plug, value in plug_values.items()
+                           if plug.split('.')[0] in nodes}
+        existing = set(cmds.ls(list(plug_values)) or list())
+        plug_values = {plug: value for plug, value in plug_values.items()
+                       if plug in existing}
+        setAttrs(plug_values)
+
+        return plug_values
+
+    def remove(self, slot, save=True):
+        """Deletes `slot`."""
+
+        self._load()
+        index = self._names.index(slot)
+        del self._names[index]
+        self._values = np.delete(self._values, index, axis=0)
+
+        if save:
+            self.save()
+
+    def save(self):
+        """Writes the library file, dropping plugs no slot uses."""
+
+        self._load()
+        used = ~np.all(np.isnan(self._values), axis=0)
+        self._plugs = [plug for plug, keep in zip(self._plugs, used) if keep]
+        self._plug_index = {plug: i for i, plug in enumerate(self._plugs)}
+        self._values = self._values[:, used]
+
+        pose_dir = os.path.dirname(self.path)
+        if pose_dir and not os.path.isdir(pose_dir):
+            os.makedirs(pose_dir)
+        with open(self.path, 'wb') as pose_file:
+            np.savez_compressed(pose_file,
+                                names=np.array(self._names, dtype=str),
+                                plugs=np.array(self._plugs, dtype=str),
+                                values=self._values)
+
+    def reload(self):
+        """Discards the in-memory library; it is read again on next use."""
+
+        self._names = None
+
+    def _load(self):
+        if self._names is not None:
+            return
+
+        self._names, self._plugs = list(), list()
+        self._values = np.zeros((0, 0))
+        if os.path.isfile(self.path):
+            with np.load(self.path) as data:
+                self._names = [str(name) for name in data['names']]
+                self._plugs = [str(plug) for plug in data['plugs']]
+                self._values = data['values'].astype(float)
+                self._values = self._values.reshape(len(self._names), len(self._plugs))
+        self._plug_index = {plug: i for i, plug in enumerate(self._plugs)}
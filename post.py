@@ -1,7 +1,11 @@
 import pymel.core as pm
-from spaceSwitchTool import spaceSwitchSetup as switchSetup
 from .data import getSpaceSwitchArgs, SPACE_LIST
-from .utils import createControlCurve, lockAndHideAttrs
+from .poseLibrary import captureRestPose
+from .profiler import BuildProfiler
+from .spaceSwitch import buildSpaceSwitches
+from . import matrix
+from .utils import (createControlCurve, lockAndHideAttrs, getWorldMatrices,
+                    snapTransforms, setJointOrients)
 
 
 SIDE_COLOR = {
@@ -16,66 +20,97 @@ CTRL_SHAPE_FILES = {
 }
 
 
-def postBuild(skel_map_name):
+def postBuild(skel_map_name, profiler=None):
+    """
+    Finishes an AS5 rig built from the FitSkeleton.
+
+    Returns
+    -------
+    dict
+        Report of `profiler` (see profiler.BuildProfiler), with the time,
+        commands and node creations of each stage.
+
+    """
+
+    profiler = profiler or BuildProfiler('postBuild')
+    stage = profiler.stage
 
     obj_sets = {set_name: pm.ls(set_name)[0] for set_name in [
         'AllSet', 'ControlSet', 'DeformSet']}
 
     # Add twist joints
-    twist_joints = _postAddTwistJoints()
-    for set_name in ['AllSet', 'DeformSet']:
-        obj_sets[set_name].addMembers(twist_joints)
+    with stage('twistJoints'):
+        twist_joints = _postAddTwistJoints()
+        for set_name in ['AllSet', 'DeformSet']:
+            obj_sets[set_name].addMembers(twist_joints)
 
     # Add IK Scapula
-    ik_clav = _postAddScapulaIK()
-    for set_name in ['AllSet', 'ControlSet']:
-        obj_sets[set_name].addMembers(ik_clav)
+    with stage('scapulaIk'):
+        ik_clav = _postAddScapulaIK()
+        for set_name in ['AllSet', 'ControlSet']:
+            obj_sets[set_name].addMembers(ik_clav)
 
     # ADD TOE SWIVEL
     # Reorient Arm/Leg IK
-    for ctrljnts in [('IKArm_R', 'Wrist_R'),
-                     ('IKArm_L', 'Wrist_L'),
-                     ('IKLeg_R', 'Ankle_R'),
-                     ('IKLeg_L', 'Ankle_L')]:
-        _postOrientIkControl(*pm.ls(ctrljnts))
+    with stage('orientIkControls'):
+        for ctrljnts in [('IKArm_R', 'Wrist_R'),
+                         ('IKArm_L', 'Wrist_L'),
+                         ('IKLeg_R', 'Ankle_R'),
+                         ('IKLeg_L', 'Ankle_L')]:
+            _postOrientIkControl(*pm.ls(ctrljnts))
 
     # Center pivots for FK/IK controls and set to IK
-    fkik_nodes = [ctrl for ctrl in pm.ls(
-        'FKIK*', et='transform') if pm.hasAttr(ctrl, 'FKIKBlend')]
-    for ctrl in fkik_nodes:
-        pm.xform(ctrl, cp=True)
-        ctrl.FKIKBlend.set(10)
+    with stage('fkikPivots'):
+        fkik_nodes = [ctrl for ctrl in pm.ls(
+            'FKIK*', et='transform') if pm.hasAttr(ctrl, 'FKIKBlend')]
+        for ctrl in fkik_nodes:
+            pm.xform(ctrl, cp=True)
+            ctrl.FKIKBlend.set(10)
 
     # Set default properties
-    pm.ls('IKSpine3_M')[0].stretchy.set(0)
-    pm.ls('IKSpine3_M')[0].volume.set(0)
-    pm.ls('IKSpline3_M')[0].volume.set(0)
+    with stage('defaults'):
+        pm.ls('IKSpine3_M')[0].stretchy.set(0)
+        pm.ls('IKSpine3_M')[0].volume.set(0)
+        pm.ls('IKSpline3_M')[0].volume.set(0)
 
     # Add UE4 IK joints
-    _postAddUe4Joints()
+    with stage('ue4Joints'):
+        _postAddUe4Joints()
 
     # Update sets
-    _postUpdateSets(obj_sets)
+    with stage('updateSets'):
+        _postUpdateSets(obj_sets)
 
-    # Lock/hide scale for all controls
-    lockAndHideAttrs([ctrl for ctrl in obj_sets['ControlSet']],
-                     attr_list=('scaleX', 'scaleY', 'scaleZ'))
-    # Lock translate for FK controls
-    lockAndHideAttrs([ctrl for ctrl in obj_sets['ControlSet']
-                      if ctrl.name()[:2] == 'FK'], attr_list=('translateX', 'translateY', 'translateZ'))
+    with stage('lockHide'):
+        # Lock/hide scale for all controls
+        lockAndHideAttrs([ctrl for ctrl in obj_sets['ControlSet']],
+                         attr_list=('scaleX', 'scaleY', 'scaleZ'))
+        # Lock translate for FK controls
+        lockAndHideAttrs([ctrl for ctrl in obj_sets['ControlSet']
+                          if ctrl.name()[:2] == 'FK'], attr_list=('translateX', 'translateY', 'translateZ'))
 
     # Update control colors/shapes
-    _setControlShapes(skel_map_name)
+    with stage('controlShapes'):
+        _setControlShapes(skel_map_name)
 
     # Hide joints, add to display layer
-    _postCreateJointLayer()
+    with stage('jointLayer'):
+        _postCreateJointLayer()
 
     # Breasts
-    for xform in ('FKOffsetBreastBase'+side for side in ('_L', '_R')):
-        pm.orientConstraint(('Chest_M', 'Spine3_M'), xform, mo=True).interpType.set(2)
+    with stage('breastConstraints'):
+        for xform in ('FKOffsetBreastBase'+side for side in ('_L', '_R')):
+            pm.orientConstraint(('Chest_M', 'Spine3_M'), xform, mo=True).interpType.set(2)
 
     # Add spaces
-    _postAddSpaceSwitches(getSpaceSwitchArgs(SPACE_LIST))
+    with stage('spaceSwitches'):
+        _postAddSpaceSwitches(getSpaceSwitchArgs(SPACE_LIST))
+
+    # Store rest pose for zeroControls
+    with stage('restPose'):
+        captureRestPose(obj_set='ControlSet')
+
+    return profiler.report()
 
 
 def _postAddSpaceSwitches(args_list):
@@ -84,7 +119,6 @@ def _postAddSpaceSwitches(args_list):
 
     pm.createNode('transform', n='SpaceSystem').setParent('Main')
 
-    ss_win = switchSetup.SpaceSwitchWindow()
     for arg_dict in args_list:
         ctrl_node = pm.ls(arg_dict['controller'])
         if not ctrl_node:
@@ -93,35 +127,12 @@ def _postAddSpaceSwitches(args_list):
 
         pm.delete(ctrl_node[0].getParent().listRelatives(type='constraint'))
 
-        _setSpaceSwitchProperties(ss_win, arg_dict)
-
-        ss_win.generateSpaces()
-
-
-def _setSpaceSwitchProperties(space_switch_window, arg_dict):
-    # SpaceSwitch properties:
-    # self.drivenNode, self.switchController, self.constraintType, spaces, self.spacesGroup, self.switchAttribute
-    space_switch_window.clearSpacesFrame()
-
-    cons_dict = {
-        'parent': 0,
-        'point': 1,
-        'orient': 2
-    }
-
-    space_switch_window.drivenNodeEdit.setText(arg_dict['drivenNode'])
-    space_switch_window.switchControllerEdit.setText(arg_dict['controller'])
-    space_switch_window.constraintComboBox.setCurrentIndex(
-        cons_dict.get(arg_dict['constraintType'], 0))
-    space_switch_window.spacesEdit.setText(arg_dict['spacesGrp'])
-    space_switch_window.attributeNameEdit.setText(arg_dict['attrName'])
-
-    for space in arg_dict['driverSpaces']:
-        new_space = space_switch_window.addSpaceLayout(False)
-        new_space.driverNodeEdit.setText(space.keys()[0])
-        new_space.displayNameEdit.setText(space.values()[0])
+    report = buildSpaceSwitches(args_list)
+    if report['failed']:
+        raise ValueError("Space switch failed for '{0}': {1}".format(
+            *report['failed'][0]))
 
-    return space_switch_window
+    return report
 
 
 def _postUpdateSets(obj_set_dict):
@@ -142,15 +153,16 @@ def _postAddUe4Joints():
     # Add UE4 IK joints
     jnt_list = list()
 
-    for ctrl in ['AimEye_M', 'RootX_M'] + [cname+side
-                                           for cname in ['IKArm', 'PoleArm', 'IKLeg', 'PoleLeg']
-                                           for side in ['_R', '_L']]:
+    ctrls = ['AimEye_M', 'RootX_M'] + [cname+side
+                                       for cname in ['IKArm', 'PoleArm', 'IKLeg', 'PoleLeg']
+                                       for side in ['_R', '_L']]
 
-        jnt = pm.createNode('joint', n='CTRL'+ctrl)
-        jnt.setParent('DeformationSystem')
-        pm.delete(pm.parentConstraint(pm.ls(ctrl)[0], jnt))
-        pm.makeIdentity(jnt, apply=True)
+    jnts = [pm.createNode('joint', n='CTRL'+ctrl) for ctrl in ctrls]
+    pm.parent(jnts, 'DeformationSystem')
+    snapTransforms(jnts, ctrls, rotate=False)
+    setJointOrients(jnts, matrix.rotationPart(getWorldMatrices(ctrls)))
 
+    for ctrl, jnt in zip(ctrls, jnts):
         if 'IKArm' in ctrl:
             tgt = pm.ls('Wrist'+ctrl[-2:])[0]
         elif 'IKLeg' in ctrl:
@@ -175,8 +187,7 @@ def _postAddTwistJoints():
             end_joint = start_joint.listRelatives()[0]
             joint = pm.createNode('joint', n="{0}Twist{1}".format(jname, side))
 
-            joint.setParent(start_joint)
-            pm.delete(pm.parentConstraint(start_joint, joint))
+            joint.setParent(start_joint, relative=True)
             pm.makeIdentity(joint)
             joint.jointOrient.set((0, 0, 0))
 
@@ -197,8 +208,8 @@ def _postAddScapulaIK():
 
         ctrl = createControlCurve(
             'IKScapula'+side, ctrl_type='ik', size=10.0, color=SIDE_COLOR[side])
-        pm.delete(pm.parentConstraint('Shoulder'+side, ctrl))
-        pm.delete(pm.orientConstraint('Scapula'+side, ctrl))
+        snapTransforms([ctrl], ['Shoulder'+side], rotate=False)
+        snapTransforms([ctrl], ['Scapula'+side], translate=False)
 
         aimdir = 1
         if side == '_L':
@@ -250,14 +261,14 @@ def _postOrientIkControl(ik_ctrl, joint):
     offset_parent = ik_ctrl.getParent().getParent()
     offset_childs = offset_parent.listRelatives(type='transform')
 
-    pm.delete(pm.parentConstraint(ik_ctrl, child_xf))
+    snapTransforms([child_xf], [ik_ctrl])
     for child in ctrl_childs:
         child.setParent(child_xf)
 
     for child in offset_childs:
         child.setParent(None)
 
-    pm.delete(pm.parentConstraint(joint, offset_xf))
+    snapTransforms([offset_xf], [joint])
     offset_xf.setParent(offset_parent)
 
     for child in offset_childs:
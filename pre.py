@@ -1,7 +1,20 @@
+from collections import OrderedDict
+from functools import partial
+import hashlib
+import json
+import os
+import numpy as np
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
 import pymel.core as pm
 
+from . import matrix
 from .data import G8fMap, G8mMap, Ue4Map
-from .utils import getPoleVector, orientJoint, getAverageLoc
+from .data.maps.mapfile import FileJointMap
+from .fitSkeleton import loadFitSkeleton, fileHash
+from .profiler import BuildProfiler
+from .utils import (sampleMatrices, orientJoints, getAverageLoc, getWorldMatrices,
+                    setWorldMatrices, setAttrs)
 
 FITSKEL_FILES = {
     'g8f': 'C:/Users/Darrick/Documents/Maya/scripts/AdvancedSkeleton5Files/fitSkeletons/daz_g8f.ma',
@@ -13,99 +26,410 @@ MAPS = {
     'g8m': G8mMap,
     'ue4': Ue4Map
 }
+_SKEL_MAPS = dict()
+# Smallest share of a map's source joints that must be in the scene for
+# detectSkelMap to accept it
+MIN_COVERAGE = 0.9
+# Vertex sets whose centroids place FitSkeleton joints
+VTX_SETS = ('VtxBreastMid_R', 'VtxBreastEnd_R')
+# FitSkeleton joint channels stored in the preBuild cache
+FIT_CHANNELS = ('translate', 'rotate', 'jointOrient')
+# Salt of the preBuild cache key; bump it when the fitting code or the
+# cache format changes so that older entries are not reused
+FIT_CACHE_VERSION = 1
 
 
-def preBuild(skel_map_name, load=True, fitskel_file=None):
-    fitskel_file = fitskel_file or FITSKEL_FILES[skel_map_name]
+def preBuild(skel_map_name=None, load=True, fitskel_file=None, use_cache=True,
+             from_data=False, profiler=None):
+    """
+    Imports the FitSkeleton and fits it to the scene's source skeleton.
+    With `from_data`, the FitSkeleton joints are created from the parsed
+    file (see createFitSkeleton) instead of importing it.
 
-    sk_map = getSkelMap(skel_map_name)
-    custom_locs = sk_map.custom_locs
+    The fitted joint channels are cached on disk under a hash of the
+    inputs (source joint positions, vertex set points, skeleton map and
+    FitSkeleton file, or without `load` the channels of the FitSkeleton in
+    the scene), so re-running on an unchanged character applies the cached
+    result in one bulk write.
+
+    Returns
+    -------
+    dict
+        'map': skeleton map name; 'cacheKey': input hash, or None without
+        `use_cache`; 'cacheHit': whether the cached result was applied;
+        'profile': the report of `profiler` (see profiler.BuildProfiler).
+
+    """
+
+    profiler = profiler or BuildProfiler('preBuild')
+    stage = profiler.stage
+
+    with stage('detectMap'):
+        if not skel_map_name:
+            skel_map_name = detectSkelMap()['name']
+            if not skel_map_name:
+                raise ValueError('No skeleton map matches the joints in the scene.')
+
+        fitskel_file = fitskel_file or FITSKEL_FILES[skel_map_name]
+
+        sk_map = getSkelMap(skel_map_name)
+        custom_locs = sk_map.custom_locs
 
     # Load FitSkeleton
-    if load:
-        pm.importFile(fitskel_file)
+    with stage('loadFitSkeleton'):
+        if load and from_data:
+            createFitSkeleton(loadFitSkeleton(fitskel_file))
+        elif load:
+            pm.importFile(fitskel_file)
+
+    report = {'map': skel_map_name, 'cacheKey': None, 'cacheHit': False}
+    if use_cache:
+        with stage('applyCache'):
+            report['cacheKey'] = _fitCacheKey(sk_map, fitskel_file, load)
+            fit_values = _loadFitCache(report['cacheKey'])
+            if fit_values is not None:
+                setAttrs(fit_values)
+                report['cacheHit'] = True
+        if report['cacheHit']:
+            report['profile'] = profiler.report()
+            return report
 
     # Save custom translations
-    custom_dict = dict()
-    for joint in custom_locs:
-        jnt_node = pm.ls(joint.split('_')[0], type='transform')
-        if jnt_node:
-            custom_dict[jnt_node[0]] = jnt_node[0].getTranslation()
+    with stage('saveCustomTranslations'):
+        custom_dict = dict()
+        for joint in custom_locs:
+            jnt_node = pm.ls(joint.split('_')[0], type='transform')
+            if jnt_node:
+                custom_dict[jnt_node[0]] = jnt_node[0].getTranslation()
 
     # Align FitSkeleton joints
-    alignFitSkeleton(sk_map)
+    with stage('alignFitSkeleton'):
+        unmatched = alignFitSkeleton(sk_map)['unmatched']
+        if unmatched:
+            pm.warning('Unmatched FitSkeleton joints: ' + ', '.join(unmatched))
 
     # Custom Spine1_M and Knee translations
-    jnt_node = pm.ls('Spine1')
-    if jnt_node:
-        pm.move(jnt_node[0],
-                jnt_node[0].getParent().getTranslation(space='world'), pcp=True)
-        pm.move(jnt_node[0], (0, 1, 0), r=True, ws=True, pcp=True)
+    with stage('alignSpineKnee'):
+        jnt_node = pm.ls('Spine1')
+        if jnt_node:
+            pm.move(jnt_node[0],
+                    jnt_node[0].getParent().getTranslation(space='world'), pcp=True)
+            pm.move(jnt_node[0], (0, 1, 0), r=True, ws=True, pcp=True)
 
-    _alignKnee()
+        _alignKnee()
 
     # Re-apply custom translations
-    for jnt_node in custom_dict:
-        jnt_node.setTranslation(custom_dict[jnt_node])
+    with stage('restoreCustomTranslations'):
+        for jnt_node in custom_dict:
+            jnt_node.setTranslation(custom_dict[jnt_node])
 
     # Custom locations for breast
-    for jnt_name in 'BreastMid', 'BreastEnd':
-        jnt_loc = getAverageLoc(vtx
-                                for vtx_list in pm.ls('Vtx'+jnt_name+'_R', r=True)[0].members()
-                                for vtx in vtx_list)
-        pm.move(jnt_name, jnt_loc)
+    with stage('breastCentroids'):
+        for jnt_name in 'BreastMid', 'BreastEnd':
+            jnt_loc = getAverageLoc(pm.ls('Vtx'+jnt_name+'_R', r=True)[0].members())
+            pm.move(jnt_name, jnt_loc)
 
     # Center mid joints
-    for joint in [j for j in sk_map.joint_map if j[-2:] == '_M']:
-        jnt_node = pm.ls(joint.split('_')[0], type='transform')
-        if jnt_node:
-            pm.move(jnt_node[0], 0, x=True, pcp=True)
+    with stage('centerMidJoints'):
+        for joint in sk_map.tables.by_side['_M']:
+            jnt_node = pm.ls(joint.split('_')[0], type='transform')
+            if jnt_node:
+                pm.move(jnt_node[0], 0, x=True, pcp=True)
 
     # Custom orientations
-    _applyCustomOrients(('BreastBase', 'BreastMid'))
+    with stage('customOrients'):
+        _applyCustomOrients(('BreastBase', 'BreastMid'))
 
     # Zero out end joint orientations
-    end_joints = [jnt for jnt in pm.ls(
-        sk_map.joint_map.keys()) if not jnt.listRelatives()]
-    for jnt_node in end_joints:
-        jnt_node.jointOrient.set((0, 0, 0))
+    with stage('zeroEndOrients'):
+        end_joints = [jnt for jnt in pm.ls(
+            sk_map.joint_map.keys()) if not jnt.listRelatives()]
+        for jnt_node in end_joints:
+            jnt_node.jointOrient.set((0, 0, 0))
+
+    if use_cache:
+        with stage('saveCache'):
+            _saveFitCache(report['cacheKey'], _getFitValues(sk_map))
+
+    report['profile'] = profiler.report()
+
+    return report
+
+
+def createFitSkeleton(fit_skel):
+    """
+    Creates the joints and transforms of a fitSkeleton.FitSkeleton with
+    their custom attributes, and sets all channel and attribute values in
+    one bulk write.  Values are taken to be in the current UI units.
+
+    Returns
+    -------
+    list
+        The created nodes, in the order of `fit_skel.names`.
+
+    """
+
+    nodes, plug_values = list(), dict()
+    for i, name in enumerate(fit_skel.names):
+        kwargs = {'name': name, 'skipSelect': True}
+        if fit_skel.parents[i] >= 0:
+            kwargs['parent'] = nodes[fit_skel.parents[i]]
+        node = cmds.ls(cmds.createNode(fit_skel.types[i], **kwargs), long=True)[0]
+        nodes.append(node)
+
+        channels = [('translate', fit_skel.translate), ('rotate', fit_skel.rotate)]
+        if fit_skel.types[i] == 'joint':
+            channels.append(('jointOrient', fit_skel.joint_orient))
+        for attr_name, values in channels:
+            plug_values.update(('{0}.{1}{2}'.format(node, attr_name, axis), value)
+                               for axis, value in zip('XYZ', values[i]))
+        plug_values[node + '.rotateOrder'] = fit_skel.rotate_order[i]
+
+        for flags in fit_skel.attr_defs[i]:
+            cmds.addAttr(node, **flags)
+        for attr_name, value in fit_skel.attr_values[i].items():
+            plug = '{0}.{1}'.format(node, attr_name)
+            if hasattr(value, 'lower'):
+                cmds.setAttr(plug, value, type='string')
+            elif isinstance(value, list):
+                cmds.setAttr(plug, *value)
+            else:
+                plug_values[plug] = value
+
+    setAttrs(plug_values)
+
+    return nodes
+
+
+def getFitCacheDir():
+    """Returns the directory holding cached preBuild results."""
+
+    return os.path.join(cmds.internalVar(userAppDir=True), 'as5util', 'fitCache')
+
+
+def clearFitCache():
+    """Deletes every cached preBuild result."""
+
+    cache_dir = getFitCacheDir()
+    if os.path.isdir(cache_dir):
+        for file_name in os.listdir(cache_dir):
+            if file_name.endswith('.npz'):
+                os.remove(os.path.join(cache_dir, file_name))
+
+
+def _fitCacheKey(sk_map, fitskel_file, load=True):
+    # Hash of everything the fitted FitSkeleton depends on.  Without `load`
+    # the input is the FitSkeleton in the scene, including hand-placed
+    # custom_locs joints, so its channels are hashed instead of the file.
+    tables = sk_map.tables
+    key = hashlib.sha1()
+    key.update(json.dumps([FIT_CACHE_VERSION, sorted(tables.as5_to_source.items()),
+                           sorted(tables.custom_locs.items())]).encode('utf-8'))
+
+    if not load:
+        fit_values = _getFitValues(sk_map)
+        plugs = sorted(fit_values)
+        key.update(json.dumps(plugs).encode('utf-8'))
+        key.update(np.round([fit_values[plug] for plug in plugs], 6).tobytes())
+    elif os.path.isfile(fitskel_file):
+        key.update(fileHash(fitskel_file).encode('utf-8'))
+    else:
+        key.update(fitskel_file.encode('utf-8'))
+
+    found = _findTransforms(tables.sources)
+    src_names = sorted(found)
+    key.update(json.dumps(src_names).encode('utf-8'))
+    if src_names:
+        key.update(np.round(getWorldMatrices([found[name] for name in src_names])
+                            [:, 3, :3], 6).tobytes())
+
+    for set_name in VTX_SETS:
+        for vtx_set in cmds.ls(set_name, recursive=True) or list():
+            members = cmds.sets(vtx_set, query=True) or list()
+            key.update(np.round(cmds.xform(members, query=True, worldSpace=True,
+                                           translation=True) if members else [],
+                                6).tobytes())
+
+    return key.hexdigest()
+
+
+def _getFitValues(sk_map):
+    # FIT_CHANNELS of the FitSkeleton joints, as a dict of plug to value
+    fit_names = set(jname.split('_')[0] for jname in sk_map.tables.order)
+    joints = list(_findTransforms(fit_names).values())
+    joints += [joint for joint in cmds.listRelatives(
+        joints, allDescendents=True, fullPath=True, type='joint') or list()
+        if joint not in joints]
+
+    fit_values = dict()
+    for joint in cmds.ls(joints, type='joint'):
+        for attr_name in FIT_CHANNELS:
+            values = cmds.getAttr(joint + '.' + attr_name)[0]
+            fit_values.update(('{0}.{1}{2}'.format(joint, attr_name, axis), value)
+                              for axis, value in zip('XYZ', values))
+
+    return fit_values
+
+
+def _loadFitCache(key):
+    cache_file = os.path.join(getFitCacheDir(), key + '.npz')
+    if not os.path.isfile(cache_file):
+        return
+
+    with np.load(cache_file) as data:
+        return dict(zip([str(plug) for plug in data['plugs']],
+                        data['values'].tolist()))
+
+
+def _saveFitCache(key, fit_values):
+    cache_dir = getFitCacheDir()
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with open(os.path.join(cache_dir, key + '.npz'), 'wb') as cache_file:
+        np.savez_compressed(cache_file,
+                            plugs=np.array(list(fit_values), dtype=str),
+                            values=np.array(list(fit_values.values())))
+
+
+def registerSkelMap(skel_map_name, map_file, fitskel_file=None):
+    """
+    Adds a skeleton map defined in a JSON map file (see data.maps.mapfile)
+    to MAPS.  The file is only read when the map is first used.
+    """
+
+    skel_map_name = skel_map_name.lower()
+    MAPS[skel_map_name] = partial(FileJointMap, map_file)
+    _SKEL_MAPS.pop(skel_map_name, None)
+    if fitskel_file:
+        FITSKEL_FILES[skel_map_name] = fitskel_file
 
 
 def getSkelMap(skel_map_name):
-    return MAPS[skel_map_name.lower()]()
+    skel_map_name = skel_map_name.lower()
+    if skel_map_name not in _SKEL_MAPS:
+        _SKEL_MAPS[skel_map_name] = MAPS[skel_map_name]()
+
+    return _SKEL_MAPS[skel_map_name]
+
+
+def detectSkelMap(joint_names=None, min_coverage=MIN_COVERAGE):
+    """
+    Finds the skeleton map in MAPS that best matches the scene's joints.
+    Each map is scored by the share of its source joints present in the
+    scene (namespaces and paths are ignored), with ties going to the map
+    that matches more joints.
+
+    Parameters
+    ----------
+    joint_names : iterable, optional
+        Joint names to match.  Defaults to every joint in the scene.
+    min_coverage : float, optional
+        Smallest coverage accepted for the best match.
+
+    Returns
+    -------
+    dict
+        'name': best map name, or None if below `min_coverage`;
+        'coverage', 'matched', 'total' and 'missing' (sorted source names
+        not found) for the best map; and 'scores', mapping every map name
+        to its (coverage, matched, total).
+
+    """
+
+    if joint_names is None:
+        joint_names = cmds.ls(type='joint') or list()
+    scene_names = set(name.rsplit('|', 1)[-1].rsplit(':', 1)[-1]
+                      for name in joint_names)
+
+    scores = dict()
+    for map_name in MAPS:
+        sources = getSkelMap(map_name).tables.sources
+        matched = len(sources & scene_names)
+        scores[map_name] = (float(matched) / len(sources) if sources else 0.0,
+                            matched, len(sources))
+
+    best = max(sorted(scores), key=lambda map_name: scores[map_name][:2])
+    coverage, matched, total = scores[best]
+    missing = getSkelMap(best).tables.sources - scene_names
+
+    return {'name': best if coverage >= min_coverage else None,
+            'coverage': coverage,
+            'matched': matched,
+            'total': total,
+            'missing': sorted(missing),
+            'scores': scores}
 
 
 def alignFitSkeleton(sk_map):
-    joint_map = sk_map.joint_map
+    """
+    Moves each mapped FitSkeleton joint to the world position of its source
+    joint, as `move -preserveChildPosition` would: every other joint keeps
+    its world position.  Names are resolved in one query and all joints are
+    moved, parents first, in one bulk write.
 
-    for joint in joint_map:
-        tgt = pm.ls(joint_map[joint], type='transform')
-        jnt = pm.ls(joint.split('_')[0], type='transform')
-        # print('Aligning {0} to {1}'.format(jnt, tgt))
-        if jnt and tgt:
-            pm.move(jnt[0], tgt[0].getTranslation(ws=True), pcp=True)
+    Returns
+    -------
+    dict
+        'aligned' and 'unmatched': mapped AS5 joint names that were moved,
+        and those whose FitSkeleton or source joint is missing;
+        'plugsWritten': number of translate plugs written.
 
+    """
 
-def _alignKnee():
-    joint = pm.ls('Knee')
-    if joint:
-        curr_vec = getPoleVector(*pm.ls(['Hip', 'Knee', 'Ankle']))
-        curr_vec[1] = 0
-        curr_len = curr_vec.length()
+    tables = sk_map.tables
+    fit_names = {jname: jname.split('_')[0] for jname in tables.mapped_order}
+    found = _findTransforms(list(fit_names.values()) + list(tables.sources))
 
-        tgt_vec = getPoleVector(*pm.ls(['Hip', 'Ankle', 'Toes']))
-        tgt_vec[1] = 0
-        tgt_vec = -tgt_vec.normal()
+    aligned, unmatched = list(), list()
+    fit_sources = OrderedDict()
+    for jname in tables.mapped_order:
+        fit_name, src_name = fit_names[jname], tables.as5_to_source[jname]
+        if fit_name in found and src_name in found:
+            aligned.append(jname)
+            fit_sources[found[fit_name]] = found[src_name]
+        else:
+            unmatched.append(jname)
 
-        diff_vec = tgt_vec*curr_len - curr_vec
+    report = {'aligned': aligned, 'unmatched': unmatched, 'plugsWritten': 0}
+    if not fit_sources:
+        return report
 
-        pm.move(joint[0], diff_vec, r=True, ws=True, pcp=True)
+    joints = list(fit_sources)
+    nodes = joints + [node for node in cmds.listRelatives(
+        joints, allDescendents=True, fullPath=True, type='transform') or list()
+        if node not in fit_sources]
+    world_mats = getWorldMatrices(nodes)
+    world_mats[:len(joints), 3, :3] = \
+        getWorldMatrices(list(fit_sources.values()))[:, 3, :3]
+    report['plugsWritten'] = len(setWorldMatrices(nodes, world_mats, rotate=False))
 
+    return report
 
-def _applyCustomOrients(joints):
-    joints = pm.ls(joints)
 
-    for jnt_node in joints:
-        orientJoint(jnt_node,
-                    jnt_node.listRelatives()[0],
-                    up_vector=(0, 0, 1))
+def _findTransforms(names):
+    # Short name: long name of the first transform with that name
+    found = dict()
+    for node in cmds.ls([name for name in names if name],
+                        type='transform', long=True) or list():
+        found.setdefault(node.rsplit('|', 1)[-1], node)
+
+    return found
+
+
+def _alignKnee():
+    # Turn the knee's pole vector, in the ground plane, opposite the
+    # ankle-to-toes pole vector
+    if not pm.ls('Knee'):
+        return
+
+    hip, knee, ankle, toes = matrix.translationPart(
+        sampleMatrices(['Hip', 'Knee', 'Ankle', 'Toes']))
+    target_dir = -matrix.poleVectors(hip, ankle, toes)
+    offset = matrix.chainVectors(hip, knee, ankle, target_dir, flatten_axis=1)[2]
+    offset *= om.MDistance.internalToUI(1.0)
+
+    pm.move('Knee', *offset, r=True, ws=True, pcp=True)
+
+
+def _applyCustomOrients(joints):
+    orientJoints(pm.ls(joints), up_vector=(0, 0, 1))
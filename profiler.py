@@ -0,0 +1,134 @@
+"""
+Per-stage profiling of rig builds.
+
+    from as5util.profiler import BuildProfiler
+    profiler = BuildProfiler('postBuild', cprofile=True)
+    postBuild('g8f', profiler=profiler)
+    profiler.save('postBuild.json')
+
+Each stage records its wall time, the commands run during it (MEL and
+maya.cmds commands, as reported by MCommandMessage, so pymel calls are
+counted by the commands they issue) and the nodes created, by type.
+With `cprofile`, each stage is also run under cProfile and its most
+expensive functions are added to the report.
+"""
+from contextlib import contextmanager
+from timeit import default_timer
+import cProfile
+import json
+import pstats
+import maya.api.OpenMaya as om
+
+# Functions per stage kept from cProfile, by cumulative time
+CPROFILE_ROWS = 25
+
+
+class BuildProfiler(object):
+    """
+    Collects stage records of one build.
+
+    Parameters
+    ----------
+    name : str
+        Build name, e.g. 'preBuild'.
+    cprofile : bool, optional
+        Run each stage under cProfile.
+
+    """
+
+    def __init__(self, name, cprofile=False):
+        self.name = name
+        self.cprofile = cprofile
+        self.stages = list()
+        self._current = None
+        self._callbacks = list()
+
+    @contextmanager
+    def stage(self, stage_name):
+        """
+        Profiles the code in the with block as stage `stage_name`.  Stages
+        cannot be nested.
+        """
+
+        if self._current is not None:
+            raise ValueError("Stage '{0}' started inside stage '{1}'.".format(
+                stage_name, self._current['name']))
+
+        record = {'name': stage_name, 'elapsed': 0.0, 'commands': 0,
+                  'commandCounts': dict(), 'nodesCreated': 0, 'nodeTypes': dict()}
+        self._current = record
+        self._addCallbacks()
+        profile = cProfile.Profile() if self.cprofile else None
+
+        start = default_timer()
+        if profile:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile:
+                profile.disable()
+            record['elapsed'] = default_timer() - start
+            self._removeCallbacks()
+            self._current = None
+            if profile:
+                record['cprofile'] = _profileRows(profile)
+            self.stages.append(record)
+
+    def report(self):
+        """
+        Returns the build report, a JSON-serializable dict with keys 'name',
+        'elapsed', 'commands', 'nodesCreated' (totals) and 'stages' (stage
+        records in run order, with keys 'name', 'elapsed', 'commands',
+        'commandCounts', 'nodesCreated', 'nodeTypes' and, with cprofile,
+        'cprofile').
+        """
+
+        return {'name': self.name,
+                'elapsed': sum(record['elapsed'] for record in self.stages),
+                'commands': sum(record['commands'] for record in self.stages),
+                'nodesCreated': sum(record['nodesCreated'] for record in self.stages),
+                'stages': self.stages}
+
+    def save(self, path):
+        """Writes the report as JSON."""
+
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2, sort_keys=True)
+
+    def _addCallbacks(self):
+        self._callbacks = [
+            om.MCommandMessage.addCommandCallback(self._commandRun),
+            om.MDGMessage.addNodeAddedCallback(self._nodeAdded, 'dependNode')]
+
+    def _removeCallbacks(self):
+        if self._callbacks:
+            om.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = list()
+
+    def _commandRun(self, command, *args):
+        record = self._current
+        if record is not None:
+            command_name = command.split(None, 1)[0] if command.strip() else command
+            record['commands'] += 1
+            record['commandCounts'][command_name] = \
+                record['commandCounts'].get(command_name, 0) + 1
+
+    def _nodeAdded(self, node, *args):
+        record = self._current
+        if record is not None:
+            type_name = om.MFnDependencyNode(node).typeName
+            record['nodesCreated'] += 1
+            record['nodeTypes'][type_name] = record['nodeTypes'].get(type_name, 0) + 1
+
+
+def _profileRows(profile):
+    # Most expensive functions of a cProfile run, as dicts
+    rows = list()
+    for (file_name, line, func), (_, calls, tottime, cumtime, _) in \
+            pstats.Stats(profile).stats.items():
+        rows.append({'function': '{0}:{1}({2})'.format(file_name, line, func),
+                     'calls': calls, 'tottime': tottime, 'cumtime': cumtime})
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+
+    return rows[:CPROFILE_ROWS]
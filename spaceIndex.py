@@ -0,0 +1,386 @@
+"""
+Scene-wide index of PP_* space switch setups.
+
+The index is built in one sweep over all space switch controllers and
+answers driver, display name and constraint lookups from dicts, keyed by
+long DAG names.  Short names and partial paths of the indexed nodes are
+resolved to long names once, when the index is built, so lookups make no
+scene queries.  Scene callbacks mark it dirty when the network changes; it
+is rebuilt on the next query.  Call closeSpaceIndex (or
+SpaceSwitchIndex.close) to remove the callbacks.
+"""
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+
+_SPACE_INDEX = None
+
+
+def getSpaceIndex():
+    """Returns the shared SpaceSwitchIndex, creating it on first use."""
+
+    global _SPACE_INDEX
+    if _SPACE_INDEX is None:
+        _SPACE_INDEX = SpaceSwitchIndex()
+        _SPACE_INDEX.addCallbacks()
+
+    return _SPACE_INDEX
+
+
+def invalidateSpaceIndex():
+    """Marks the shared SpaceSwitchIndex, if any, for rebuilding."""
+
+    if _SPACE_INDEX is not None:
+        _SPACE_INDEX.invalidate()
+
+
+def closeSpaceIndex():
+    """Closes and forgets the shared SpaceSwitchIndex, if any."""
+
+    global _SPACE_INDEX
+    if _SPACE_INDEX is not None:
+        _SPACE_INDEX.close()
+        _SPACE_INDEX = None
+
+
+class SpaceSwitchIndex(object):
+    """
+    In-memory model of every space switch in the scene.  Every node name
+    it stores is a long name; lookups accept any unique name or partial
+    path of an indexed node.
+
+    `switches` maps controller to a dict with keys 'controller',
+    'drivenNode', 'constraint', 'constraintType', 'attrName', 'spacesGrp',
+    'enumNames' and 'groups' (constraint targets, in target order).
+    'enumNames' is re-read from the switch attribute by getSwitch and
+    getDisplayName, so enum edits need no rebuild.
+    `groups` maps each constraint group to a dict with keys 'controller',
+    'driver', 'switchNo', 'condNode' and 'offsetGrp'.
+
+    """
+
+    def __init__(self):
+        self.switches = dict()
+        self.groups = dict()
+        self._drivers = dict()
+        self._nodes = set()
+        self._names = dict()
+        self._short_names = set()
+        self._dirty = True
+        self._callbacks = list()
+        self._node_callbacks = list()
+
+    def build(self):
+        """Rebuilds the index from the scene."""
+
+        self.switches = dict()
+        self.groups = dict()
+        self._drivers = dict()
+
+        controllers = cmds.ls('*.PP_spaceDriver', objectsOnly=True,
+                              recursive=True, long=True) or list()
+        switch_plugs = _connectionMap(controllers, 'PP_spaceDriver', plugs=True)
+        driven_nodes = _connectionMap(controllers, 'PP_drivenNode')
+        spaces_grps = _connectionMap(controllers, 'PP_spacesGroup')
+        cons_nodes = _connectionMap(list(driven_nodes.values()),
+                                    'PP_spaceConstraint')
+        cons_types = dict(_pairs(cmds.ls(list(cons_nodes.values()), long=True,
+                                         showType=True) or list()))
+
+        targets = dict()
+        for ctrl in controllers:
+            cons = cons_nodes.get(driven_nodes.get(ctrl))
+            if cons and switch_plugs.get(ctrl):
+                targets[ctrl] = getattr(cmds, cons_types[cons])(
+                    cons, query=True, targetList=True) or list()
+        long_names = _longNames(set(grp for grps in targets.values() for grp in grps))
+
+        for ctrl, grps in targets.items():
+            driven = driven_nodes[ctrl]
+            cons = cons_nodes[driven]
+            self.switches[ctrl] = {
+                'controller': ctrl,
+                'drivenNode': driven,
+                'constraint': cons,
+                'constraintType': cons_types[cons][:-len('Constraint')],
+                'attrName': switch_plugs[ctrl].split('.')[-1],
+                'spacesGrp': spaces_grps.get(ctrl),
+                'enumNames': list(),
+                'groups': [long_names.get(grp, grp) for grp in grps]
+            }
+            self._readEnumNames(self.switches[ctrl])
+
+        all_grps = [grp for switch in self.switches.values()
+                    for grp in switch['groups']]
+        drivers = _connectionMap(all_grps, 'PP_driverNode')
+        cond_nodes = _connectionMap(all_grps, 'PP_condNode')
+        offset_grps = _connectionMap(all_grps, 'PP_offsetGrp')
+        switch_nos = _plugValues([grp + '.PP_switchNo' for grp in all_grps
+                                  if grp in drivers])
+
+        for ctrl, switch in self.switches.items():
+            self._drivers[ctrl] = dict()
+            for grp in switch['groups']:
+                if grp in drivers:
+                    self._drivers[ctrl][drivers[grp]] = grp
+                self.groups[grp] = {'controller': ctrl,
+                                    'driver': drivers.get(grp),
+                                    'switchNo': switch_nos.get(grp + '.PP_switchNo'),
+                                    'condNode': cond_nodes.get(grp),
+                                    'offsetGrp': offset_grps.get(grp)}
+
+        self._nodes = set(self.switches) | set(self.groups)
+        for switch in self.switches.values():
+            self._nodes.update((switch['drivenNode'], switch['constraint']))
+        self._short_names = set(node.split('|')[-1] for node in self._nodes)
+        self._names = _nameTable(self._nodes | set(drivers.values()))
+        self._addNodeCallbacks()
+        self._dirty = False
+
+    def invalidate(self):
+        """Marks the index for rebuilding on the next query."""
+
+        self._dirty = True
+
+    def getSwitch(self, controller):
+        """Returns the switch dict for `controller`, or None."""
+
+        self._update()
+        switch = self.switches.get(self._resolve(controller))
+        if switch:
+            self._readEnumNames(switch)
+
+        return switch
+
+    def getDrivers(self, controller):
+        """Returns the driver nodes of `controller`, in switch order."""
+
+        self._update()
+        switch = self.switches.get(self._resolve(controller))
+        if not switch:
+            return list()
+
+        return [self.groups[grp]['driver'] for grp in switch['groups']
+                if self.groups[grp]['driver']]
+
+    def getConstraintGroups(self, controller):
+        """Returns the constraint target groups of `controller`, or None."""
+
+        self._update()
+        switch = self.switches.get(self._resolve(controller))
+        if switch:
+            return list(switch['groups'])
+
+    def getDriverFromGrp(self, grp):
+        """Returns the driver node of constraint group `grp`, or None."""
+
+        self._update()
+        grp_info = self.groups.get(self._resolve(grp))
+        if grp_info:
+            return grp_info['driver']
+
+    def getDisplayName(self, grp):
+        """Returns the enum display name of constraint group `grp`, or None."""
+
+        self._update()
+        grp_info = self.groups.get(self._resolve(grp))
+        if not grp_info or grp_info['switchNo'] is None:
+            return
+        enum_names = self._readEnumNames(self.switches[grp_info['controller']])
+        if grp_info['switchNo'] < len(enum_names):
+            return enum_names[grp_info['switchNo']]
+
+    def hasDriver(self, controller, driver):
+        """Returns True if `driver` already drives `controller`."""
+
+        self._update()
+        return self._resolve(driver) in self._drivers.get(self._resolve(controller), ())
+
+    def addCallbacks(self):
+        """Installs the scene callbacks that invalidate the index."""
+
+        self.removeCallbacks()
+        self._callbacks = [
+            om.MDGMessage.addConnectionCallback(self._onConnection),
+            om.MDGMessage.addNodeRemovedCallback(self._onNodeRemoved),
+            om.MNodeMessage.addNameChangedCallback(
+                om.MObject(), self._onNameChanged),
+            om.MSceneMessage.addCallback(
+                om.MSceneMessage.kAfterOpen, self._onSceneChanged),
+            om.MSceneMessage.addCallback(
+                om.MSceneMessage.kAfterNew, self._onSceneChanged)
+        ]
+
+    def removeCallbacks(self):
+        """Removes all callbacks installed by the index."""
+
+        for callback_ids in self._callbacks, self._node_callbacks:
+            if callback_ids:
+                om.MMessage.removeCallbacks(callback_ids)
+        self._callbacks = list()
+        self._node_callbacks = list()
+
+    def close(self):
+        """
+        Removes the index's callbacks and drops its contents.  A closed index
+        is no longer told about scene changes, so it rebuilds on every query
+        until addCallbacks is called again.
+        """
+
+        self.removeCallbacks()
+        self.switches = dict()
+        self.groups = dict()
+        self._drivers = dict()
+        self._nodes = set()
+        self._names = dict()
+        self._short_names = set()
+        self._dirty = True
+
+    def _update(self):
+        if self._dirty or not self._callbacks:
+            self.build()
+
+    def _resolve(self, name):
+        # Long name of indexed node `name`, or None
+        return self._names.get(str(name)) if name else None
+
+    def _readEnumNames(self, switch):
+        # Refreshes switch['enumNames'] from the switch attribute
+        switch['enumNames'] = _enumNames(
+            '{}.{}'.format(switch['controller'], switch['attrName']))
+        return switch['enumNames']
+
+    def _addNodeCallbacks(self):
+        if self._node_callbacks:
+            om.MMessage.removeCallbacks(self._node_callbacks)
+        self._node_callbacks = list()
+
+        if not self._callbacks or not self._nodes:
+            return
+
+        sel_list = om.MSelectionList()
+        for node in list(self.switches) + list(self.groups):
+            sel_list.add(node)
+        for i in range(sel_list.length()):
+            self._node_callbacks.append(om.MNodeMessage.addAttributeChangedCallback(
+                sel_list.getDependNode(i), self._onAttributeChanged))
+
+    def _onConnection(self, src_plug, dst_plug, made, client_data=None):
+        if self._dirty:
+            return
+        for plug in src_plug, dst_plug:
+            if plug.partialName(useLongNames=True).startswith('PP_'):
+                self._dirty = True
+                return
+        if om.MFnDependencyNode(dst_plug.node()).name() in self._short_names:
+            self._dirty = True
+
+    def _onNodeRemoved(self, node, client_data=None):
+        if not self._dirty and om.MFnDependencyNode(node).name() in self._short_names:
+            self._dirty = True
+
+    def _onNameChanged(self, node, prev_name, client_data=None):
+        if not self._dirty and prev_name in self._short_names:
+            self._dirty = True
+
+    def _onAttributeChanged(self, msg, plug, other_plug, client_data=None):
+        if self._dirty:
+            return
+        if msg & (om.MNodeMessage.kAttributeAdded | om.MNodeMessage.kAttributeRemoved |
+                  om.MNodeMessage.kAttributeRenamed):
+            self._dirty = True
+        elif msg & om.MNodeMessage.kAttributeSet and \
+                plug.partialName(useLongNames=True) == 'PP_switchNo':
+            self._dirty = True
+
+    def _onSceneChanged(self, client_data=None):
+        self._dirty = True
+
+
+def _connectionMap(nodes, attr_name, plugs=False):
+    # Maps the long name of each node to the long name of the first node
+    # (or the first plug) connected to its `attr_name` attribute, with a
+    # single listConnections call.
+    attr_plugs = cmds.ls(['{}.{}'.format(node, attr_name)
+                          for node in nodes if node])
+    if not attr_plugs:
+        return dict()
+
+    conns = cmds.listConnections(attr_plugs, connections=True,
+                                 plugs=plugs) or list()
+    pairs = [(attr_plug.split('.')[0], other) for attr_plug, other in _pairs(conns)]
+    long_names = _longNames(set(node for node, _ in pairs) |
+                            set(other for _, other in pairs if not plugs))
+    conn_map = dict()
+    for node, other in pairs:
+        node = long_names.get(node, node)
+        if node not in conn_map:
+            conn_map[node] = other if plugs else long_names.get(other, other)
+
+    return conn_map
+
+
+def _longNames(names):
+    # Maps each of `names` that matches one node to its long DAG name (its
+    # name for DG nodes), through the API rather than an ls call per name
+    long_names = dict()
+    sel_list = om.MSelectionList()
+    for name in names:
+        sel_list.clear()
+        try:
+            sel_list.add(name)
+        except RuntimeError:
+            continue
+        try:
+            long_names[name] = sel_list.getDagPath(0).fullPathName()
+        except TypeError:
+            long_names[name] = om.MFnDependencyNode(sel_list.getDependNode(0)).name()
+
+    return long_names
+
+
+def _nameTable(long_names):
+    # Maps every partial path of `long_names` ('a|b|c', 'b|c', 'c') to its
+    # long name, leaving out partial paths shared by several nodes
+    names = dict()
+    for long_name in long_names:
+        if not long_name:
+            continue
+        parts = long_name.lstrip('|').split('|')
+        for i in range(len(parts)):
+            name = '|'.join(parts[i:])
+            names[name] = long_name if names.get(name, long_name) == long_name else None
+        names[long_name] = long_name
+
+    return dict((name, long_name) for name, long_name in names.items() if long_name)
+
+
+def _plugValues(plug_names):
+    # Maps each of `plug_names` to its integer value, read through the API
+    values = dict()
+    sel_list = om.MSelectionList()
+    for plug_name in plug_names:
+        sel_list.clear()
+        try:
+            sel_list.add(plug_name)
+        except RuntimeError:
+            continue
+        values[plug_name] = sel_list.getPlug(0).asInt()
+
+    return values
+
+
+def _enumNames(plug_name):
+    # Field names of enum attribute `plug_name`, in value order
+    sel_list = om.MSelectionList()
+    try:
+        sel_list.add(plug_name)
+    except RuntimeError:
+        return list()
+    enum_attr = om.MFnEnumAttribute(sel_list.getPlug(0).attribute())
+
+    return [enum_attr.fieldName(value)
+            for value in range(enum_attr.getMin(), enum_attr.getMax() + 1)]
+
+
+def _pairs(flat_list):
+    return zip(flat_list[::2], flat_list[1::2])
@@ -0,0 +1,633 @@
+"""
+Headless space switch builder.
+
+Builds and edits (reorders, renames and deletes spaces of) the same PP_*
+space switch network as spaceSwitchSetup.SpaceSwitchWindow without any
+UI, so rig builds can run under mayapy.  Takes the argument dicts
+produced by data.spaces.getSpaceSwitchArgs.
+"""
+from timeit import default_timer
+import maya.cmds as cmds
+
+from .spaceIndex import invalidateSpaceIndex
+from .utils import getFrameRange, sampleMatrices, worldToChannels, setKeys
+
+CONSTRAINT_FUNCS = {
+    'point': cmds.pointConstraint,
+    'orient': cmds.orientConstraint,
+    'parent': cmds.parentConstraint
+}
+
+
+class DriverSpaceRegistry(object):
+    """
+    Per-build registry of driver space groups, keyed by driver node.
+
+    Each `<driver>_space` group is resolved, constrained to its driver and
+    parented to the spaces group once; later switches using the same driver
+    reuse it.  `constraints_saved` counts the point/orient constraints that
+    were not re-issued.
+
+    """
+
+    def __init__(self):
+        self.groups = dict()
+        self.constraints_created = 0
+        self.constraints_saved = 0
+
+    def getGroup(self, driver, spaces_grp=None):
+        """Returns the long name of the space group following `driver`."""
+
+        if driver in self.groups:
+            self.constraints_saved += 2
+            return self.groups[driver]
+
+        if not cmds.objExists(driver + '_space'):
+            driver_grp = cmds.group(
+                empty=True, name=getShortName(driver) + '_space')
+        else:
+            driver_grp = driver + '_space'
+        addMsgAttr(driver, driver_grp, 'PP_driverGroup')
+
+        for cons_type in 'point', 'orient':
+            if cmds.listRelatives(driver_grp, type=cons_type + 'Constraint'):
+                self.constraints_saved += 1
+            else:
+                CONSTRAINT_FUNCS[cons_type](driver, driver_grp,
+                                            maintainOffset=False)
+                self.constraints_created += 1
+
+        if spaces_grp and cmds.listRelatives(driver_grp, parent=True) != [spaces_grp]:
+            driver_grp = cmds.parent(driver_grp, spaces_grp)[0]
+
+        self.groups[driver] = cmds.ls(driver_grp, long=True)[0]
+
+        return self.groups[driver]
+
+
+def buildSpaceSwitches(args_list):
+    """
+    Builds a space switch for every argument dict in `args_list` in a single
+    undo chunk.  Driver space groups are shared by all switches of the build.
+
+    Parameters
+    ----------
+    args_list : list
+        Argument dicts, as returned by data.spaces.getSpaceSwitchArgs.
+
+    Returns
+    -------
+    dict
+        Report with keys 'built' (one result dict per switch, as returned by
+        buildSpaceSwitch), 'failed' (list of (controller, message) tuples),
+        'driverGroups' and 'constraintsSaved' (from the build's
+        DriverSpaceRegistry) and 'elapsed' (seconds).
+
+    """
+
+    report = {'built': list(), 'failed': list(), 'elapsed': 0.0}
+    registry = DriverSpaceRegistry()
+    start = default_timer()
+
+    cmds.undoInfo(openChunk=True)
+    try:
+        for arg_dict in args_list:
+            try:
+                report['built'].append(buildSpaceSwitch(arg_dict, registry))
+            except ValueError as err:
+                report['failed'].append((arg_dict.get('controller'), str(err)))
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+    report['driverGroups'] = len(registry.groups)
+    report['constraintsSaved'] = registry.constraints_saved
+    report['elapsed'] = default_timer() - start
+
+    return report
+
+
+def buildSpaceSwitch(arg_dict, registry=None):
+    """
+    Validates a single argument dict and builds its space switch.
+
+    Drivers that already drive the controller are skipped.  Missing display
+    names default to the driver's short name.
+
+    Parameters
+    ----------
+    arg_dict : dict
+        Keys 'controller', 'drivenNode', 'constraintType', 'spacesGrp',
+        'attrName' and 'driverSpaces' (list of {driver: display_name}).
+    registry : DriverSpaceRegistry, optional
+        Registry of driver space groups shared across switches.
+
+    Returns
+    -------
+    dict
+        Keys 'controller', 'drivenNode', 'added' (list of (driver,
+        display_name) tuples) and 'skipped' (drivers already present).
+
+    """
+
+    controller = arg_dict['controller']
+    driven_node = arg_dict['drivenNode']
+    constraint_type = arg_dict.get('constraintType', 'parent')
+    attr_name = arg_dict.get('attrName', 'spaces')
+    spaces_grp = arg_dict.get('spacesGrp')
+
+    if constraint_type not in CONSTRAINT_FUNCS:
+        raise ValueError(
+            "Invalid constraint type '{}'.".format(constraint_type))
+    if not attr_name:
+        raise ValueError('Attribute name not specified.')
+    for required in driven_node, controller:
+        if not required or not cmds.objExists(required):
+            raise ValueError("'{}' not found.".format(required))
+
+    if not spaces_grp or not cmds.objExists(spaces_grp):
+        spaces_grp = cmds.group(empty=True, world=True,
+                                name=spaces_grp or 'spaces_GRP#')
+
+    if not attributeExists(spaces_grp, 'PP_spacesGroup'):
+        cmds.addAttr(spaces_grp, longName='PP_spacesGroup', at='message')
+    if not attributeExists(controller, 'PP_spacesGroup'):
+        cmds.addAttr(controller, longName='PP_spacesGroup', at='message')
+    cmds.connectAttr(spaces_grp + '.PP_spacesGroup',
+                     controller + '.PP_spacesGroup', force=True)
+
+    existing = getDrivers(controller) or list()
+    driver_spaces = list()
+    skipped = list()
+    for space_dict in arg_dict['driverSpaces']:
+        for driver, display_name in space_dict.items():
+            if not driver:
+                continue
+            if driver in existing:
+                skipped.append(driver)
+                continue
+            if not cmds.objExists(driver):
+                raise ValueError("Driver '{}' not found.".format(driver))
+            driver_spaces.append(
+                {driver: display_name or getShortName(driver)})
+
+    if driver_spaces:
+        spaceSwitch(driven_node, controller, constraint_type,
+                    driver_spaces, spaces_grp, attr_name, registry)
+
+    return {'controller': controller,
+            'drivenNode': driven_node,
+            'added': [item for space_dict in driver_spaces
+                      for item in space_dict.items()],
+            'skipped': skipped}
+
+
+def spaceSwitch(driven_node, controller, constraint_type, driver_spaces, spaces_grp=None, attr_name='spaces', registry=None):
+    """
+    Constrains `driven_node` to a space group per driver and wires the
+    weights to an enum attribute `attr_name` on `controller`.
+
+    Parameters
+    ----------
+    driven_node : str
+        Parent group of the controller that receives the space constraint.
+    controller : str
+        Node that holds the switch attribute.
+    constraint_type : str
+        'parent', 'point' or 'orient'.
+    driver_spaces : list
+        List of {driver: display_name} dicts, in enum order.
+    spaces_grp : str, optional
+        Group that the driver space groups are parented to.
+    attr_name : str, optional
+        Name of the enum switch attribute.
+    registry : DriverSpaceRegistry, optional
+        Registry of driver space groups shared across switches.
+
+    Returns
+    -------
+    dict
+        The applied plan, as returned by planSpaceSwitch.
+
+    """
+
+    plan = planSpaceSwitch(driven_node, controller, constraint_type,
+                           driver_spaces, spaces_grp, attr_name)
+    applySpacePlan(plan, registry)
+
+    return plan
+
+
+def planSpaceSwitch(driven_node, controller, constraint_type, driver_spaces, spaces_grp=None, attr_name='spaces'):
+    """
+    Computes the final enum list, constraint target order, PP_switchNo
+    indices and condition node names for all drivers, querying the existing
+    enum and constraint targets only once.
+
+    Parameters are the same as spaceSwitch, without `registry`.
+
+    Returns
+    -------
+    dict
+        Plan with the input arguments plus 'constraint' (existing space
+        constraint or None), 'enumNames' (final enum list), 'targets'
+        (final constraint target order) and 'spaces' (one dict per driver
+        with 'driver', 'displayName', 'consGrp', 'offsetGrp', 'cond' and
+        'switchNo').
+
+    """
+
+    switch_attr = '{}.{}'.format(controller, attr_name)
+    driven_name = getShortName(driven_node)
+
+    enum_names = list()
+    if attributeExists(controller, attr_name):
+        enum_names = [enum for enum in cmds.addAttr(
+            switch_attr, query=True, enumName=True).split(':') if enum]
+
+    cons_node = _getSpaceConstraint(driven_node)
+    targets = list()
+    if cons_node:
+        targets = CONSTRAINT_FUNCS[constraint_type](
+            cons_node, query=True, targetList=True) or list()
+
+    spaces = list()
+    for space_dict in driver_spaces:
+        for driver, display_name in space_dict.items():
+            cons_grp = '{}_{}_space'.format(driven_name, getShortName(driver))
+            if display_name in enum_names:
+                enum_names.remove(display_name)
+            enum_names.append(display_name)
+            if cons_grp not in targets:
+                targets.append(cons_grp)
+            spaces.append({'driver': driver,
+                           'displayName': display_name,
+                           'consGrp': cons_grp,
+                           'offsetGrp': cons_grp + '_offset',
+                           'cond': '{}_{}_space_COND'.format(driven_name, driver)})
+
+    for space in spaces:
+        space['switchNo'] = targets.index(space['consGrp'])
+
+    return {'drivenNode': driven_node,
+            'controller': controller,
+            'constraintType': constraint_type,
+            'spacesGrp': spaces_grp,
+            'attrName': attr_name,
+            'constraint': cons_node,
+            'enumNames': enum_names,
+            'targets': targets,
+            'spaces': spaces}
+
+
+def applySpacePlan(plan, registry=None):
+    """
+    Builds the node network described by `plan` in one pass.
+
+    Parameters
+    ----------
+    plan : dict
+        Plan as returned by planSpaceSwitch.
+    registry : DriverSpaceRegistry, optional
+        Registry of driver space groups shared across switches.  A new one is
+        used if not given.
+
+    """
+
+    driven_node = plan['drivenNode']
+    controller = plan['controller']
+    spaces_grp = plan['spacesGrp']
+    spaces = plan['spaces']
+    constraint = CONSTRAINT_FUNCS[plan['constraintType']]
+    switch_attr = '{}.{}'.format(controller, plan['attrName'])
+
+    if not spaces:
+        return
+
+    # Driver space groups, following each driver
+    if registry is None:
+        registry = DriverSpaceRegistry()
+    driver_grps = {space['driver']: registry.getGroup(space['driver'], spaces_grp)
+                   for space in spaces}
+
+    # Enum list, in final order
+    enum_string = ':'.join(plan['enumNames'])
+    if not attributeExists(controller, plan['attrName']):
+        cmds.addAttr(controller, longName=plan['attrName'], keyable=True,
+                     attributeType='enum', enumName=enum_string)
+    else:
+        cmds.addAttr(switch_attr, edit=True, enumName=enum_string)
+
+    # Constraint groups, offset to the driven node
+    driven_pos = cmds.xform(driven_node, query=True,
+                            worldSpace=True, rotatePivot=True)
+    driven_rot = cmds.xform(driven_node, query=True,
+                            worldSpace=True, rotation=True)
+    driven_scale = cmds.xform(driven_node, query=True,
+                              worldSpace=True, scale=True)
+    for space in spaces:
+        cons_grp, offset_grp = space['consGrp'], space['offsetGrp']
+        if not cmds.objExists(cons_grp):
+            cons_grp = cmds.group(empty=True, name=cons_grp)
+            offset_grp = cmds.group(cons_grp, name=offset_grp)
+        addMsgAttr(space['driver'], cons_grp, 'PP_driverNode')
+        addMsgAttr(cons_grp, offset_grp, 'PP_offsetGrp')
+
+        cmds.xform(offset_grp, worldSpace=True, translation=driven_pos)
+        cmds.setAttr(offset_grp + '.scale', *driven_scale, type='double3')
+        cmds.xform(offset_grp, worldSpace=True, rotation=driven_rot)
+        cmds.setAttr(cons_grp + '.rotate', 0, 0, 0, type='double3')
+        driver_grp = driver_grps[space['driver']]
+        if cmds.listRelatives(offset_grp, parent=True, fullPath=True) != [driver_grp]:
+            cmds.parent(offset_grp, driver_grp)
+
+    # Space constraint: all new targets in one call
+    new_targets = [space['consGrp'] for space in spaces]
+    cons_node = constraint(*(new_targets + [driven_node]),
+                           maintainOffset=True)[0]
+    weight_list = constraint(cons_node, query=True, weightAliasList=True)
+    addMsgAttr(driven_node, cons_node, 'PP_spaceConstraint')
+    plan['constraint'] = cons_node
+
+    # Switch conditions
+    for space in spaces:
+        cons_grp, cond = space['consGrp'], space['cond']
+        if not attributeExists(cons_grp, 'PP_switchNo'):
+            cmds.addAttr(cons_grp, longName='PP_switchNo', at='long')
+        cmds.setAttr(cons_grp + '.PP_switchNo', space['switchNo'])
+
+        if not cmds.objExists(cond):
+            cond = cmds.shadingNode('condition', name=cond, asUtility=True)
+        _connect(cons_grp + '.PP_switchNo', cond + '.secondTerm')
+        cmds.setAttr(cond + '.operation', 0)
+        cmds.setAttr(cond + '.colorIfTrueR', 1)
+        cmds.setAttr(cond + '.colorIfFalseR', 0)
+        _connect(cond + '.outColorR',
+                 '{}.{}'.format(cons_node, weight_list[space['switchNo']]))
+        _connect(switch_attr, cond + '.firstTerm')
+        addMsgAttr(cons_grp, cond, 'PP_condNode')
+
+    addMsgAttr(controller, driven_node, 'PP_drivenNode')
+
+    if not attributeExists(controller, 'PP_spaceDriver'):
+        cmds.addAttr(controller, longName='PP_spaceDriver', at='long', dv=0)
+    _connect(switch_attr, controller + '.PP_spaceDriver')
+
+
+def bakeSpaces(switchers, target_space, frames=None):
+    """
+    Bakes switcher controllers into another space over a frame range,
+    keeping their world transforms.  All controllers are baked in one pass:
+    their world matrices are sampled once, the switch attributes are keyed
+    to the target space, the new parent matrices are sampled once and the
+    resulting local channels are keyed in bulk.  Locked channels and
+    channels driven by constraints or other non-curve connections are left
+    alone.
+
+    Parameters
+    ----------
+    switchers : list
+        Controllers with a PP_spaceDriver switch.
+    target_space : int or str
+        Enum index or display name of the target space.
+    frames : list, optional
+        Frames to bake.  Defaults to the playback range.
+
+    Returns
+    -------
+    dict
+        Maps each baked controller to its target enum index.
+
+    """
+
+    frames = frames or getFrameRange()
+
+    switch_plugs = dict()
+    for ctrl in switchers:
+        plug = cmds.listConnections(ctrl + '.PP_spaceDriver', source=True,
+                                    destination=False, plugs=True)
+        if not plug:
+            raise ValueError("No space switch found on '{}'.".format(ctrl))
+        enum_names = cmds.addAttr(plug[0], query=True, enumName=True).split(':')
+        if target_space in enum_names:
+            switch_plugs[ctrl] = (plug[0], enum_names.index(target_space))
+        elif isinstance(target_space, int) and 0 <= target_space < len(enum_names):
+            switch_plugs[ctrl] = (plug[0], target_space)
+        else:
+            raise ValueError("Space '{0}' not found on '{1}'.".format(
+                target_space, ctrl))
+
+    ctrls = list(switch_plugs)
+    world_mats = sampleMatrices(ctrls, 'worldMatrix', frames)
+
+    cmds.undoInfo(openChunk=True)
+    try:
+        setKeys({plug: [index]*len(frames)
+                 for plug, index in switch_plugs.values()}, frames)
+        cmds.keyTangent([plug for plug, _ in switch_plugs.values()],
+                        time=(frames[0], frames[-1]), outTangentType='step')
+
+        setKeys(worldToChannels(ctrls, world_mats, frames), frames)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+    return {ctrl: index for ctrl, (_, index) in switch_plugs.items()}
+
+
+def reorderSpaces(controller, cons_grps):
+    """
+    Reorders the spaces of the switch on `controller`: renumbers the
+    constraint groups, re-adds them to the space constraint in the new
+    order and without offset, reorders the enum and rewires the switch
+    conditions.
+
+    Parameters
+    ----------
+    controller : str
+        Node that holds the switch attribute.
+    cons_grps : list
+        Every constraint group of the switch, in the new enum order.
+
+    Returns
+    -------
+    list
+        The new enum names.
+
+    """
+
+    switch_plug, cons_node = _getSwitch(controller)
+    current = getConstraintGroups(controller) or list()
+    if sorted(cmds.ls(cons_grps, long=True)) != sorted(cmds.ls(current, long=True)):
+        raise ValueError("Spaces of '{0}' are {1}, not {2}.".format(
+            controller, current, list(cons_grps)))
+
+    enum_names = cmds.addAttr(switch_plug, query=True, enumName=True).split(':')
+    display_names = [enum_names[cmds.getAttr(grp + '.PP_switchNo')]
+                     for grp in cons_grps]
+    for i, grp in enumerate(cons_grps):
+        cmds.setAttr(grp + '.PP_switchNo', i)
+
+    driven_node = cmds.listConnections(controller + '.PP_drivenNode')[0]
+    constraint = CONSTRAINT_FUNCS[cmds.nodeType(cons_node)[:-len('Constraint')]]
+    if len(cons_grps) > 1:
+        constraint(*(list(cons_grps[1:]) + [driven_node]), edit=True, remove=True)
+        constraint(*(list(cons_grps[1:]) + [driven_node]))
+    cmds.addAttr(switch_plug, edit=True, enumName=':'.join(display_names))
+
+    # Maya reuses freed weight indices, so weights are matched to their
+    # targets by name rather than by position
+    targets = constraint(cons_node, query=True, targetList=True)
+    weights = dict(zip([cmds.ls(grp, long=True)[0] for grp in targets],
+                       constraint(cons_node, query=True, weightAliasList=True)))
+    for grp in cons_grps:
+        cond = cmds.listConnections(grp + '.PP_condNode')[0]
+        _connect(cond + '.outColorR', '{}.{}'.format(
+            cons_node, weights[cmds.ls(grp, long=True)[0]]))
+    invalidateSpaceIndex()
+
+    return display_names
+
+
+def renameSpace(controller, space, display_name):
+    """
+    Renames a space of the switch on `controller`.
+
+    Parameters
+    ----------
+    controller : str
+        Node that holds the switch attribute.
+    space : int or str
+        Enum index or current display name of the space.
+    display_name : str
+        New display name.
+
+    Returns
+    -------
+    list
+        The new enum names.
+
+    """
+
+    switch_plug = _getSwitch(controller)[0]
+    enum_names = cmds.addAttr(switch_plug, query=True, enumName=True).split(':')
+    if space in enum_names:
+        index = enum_names.index(space)
+    elif isinstance(space, int) and 0 <= space < len(enum_names):
+        index = space
+    else:
+        raise ValueError("Space '{0}' not found on '{1}'.".format(space, controller))
+
+    enum_names[index] = display_name
+    cmds.addAttr(switch_plug, edit=True, enumName=':'.join(enum_names))
+    invalidateSpaceIndex()
+
+    return enum_names
+
+
+def deleteSpaceSwitch(controller):
+    """
+    Deletes the switch on `controller`: the condition node and offset group
+    of every space, then the switch attribute.  Driver space groups, which
+    other switches may share, are kept.
+
+    Returns
+    -------
+    int
+        Number of spaces deleted.
+
+    """
+
+    switch_plug = _getSwitch(controller)[0]
+    cons_grps = getConstraintGroups(controller) or list()
+    for grp in cons_grps:
+        nodes = (cmds.listConnections(grp + '.PP_condNode') or list()) + \
+            (cmds.listConnections(grp + '.PP_offsetGrp') or list())
+        if nodes:
+            cmds.delete(nodes)
+    cmds.deleteAttr(switch_plug)
+    invalidateSpaceIndex()
+
+    return len(cons_grps)
+
+
+def getDrivers(controller):
+    """Returns the driver nodes of the space switch on `controller`."""
+
+    drivers = list()
+    for grp in getConstraintGroups(controller) or list():
+        driver = getDriverFromGrp(grp)
+        if driver:
+            drivers.append(driver)
+
+    return drivers
+
+
+def getConstraintGroups(controller):
+    """Returns the constraint target groups of the space switch on `controller`."""
+
+    if not attributeExists(controller, 'PP_drivenNode'):
+        return
+    driven_node = cmds.listConnections(controller + '.PP_drivenNode')
+    if not driven_node:
+        return
+    cons_node = _getSpaceConstraint(driven_node[0])
+    if not cons_node:
+        return
+
+    constraint = CONSTRAINT_FUNCS[cmds.nodeType(cons_node)[:-len('Constraint')]]
+
+    return constraint(cons_node, query=True, targetList=True)
+
+
+def getDriverFromGrp(grp):
+    """Returns the driver node connected to constraint group `grp`."""
+
+    if not attributeExists(grp, 'PP_driverNode'):
+        return
+    driver = cmds.listConnections(grp + '.PP_driverNode')
+    if driver:
+        return driver[0]
+
+
+def attributeExists(node, attr):
+    return cmds.attributeQuery(attr, node=node, exists=True)
+
+
+def getShortName(node):
+    return node.split('|')[-1].split(':')[-1]
+
+
+def addMsgAttr(src_node, dst_node, attr_name):
+    for node in src_node, dst_node:
+        if not attributeExists(node, attr_name):
+            cmds.addAttr(node, longName=attr_name, attributeType='message')
+    _connect('{}.{}'.format(src_node, attr_name),
+             '{}.{}'.format(dst_node, attr_name))
+
+
+def _getSpaceConstraint(driven_node):
+    if not attributeExists(driven_node, 'PP_spaceConstraint'):
+        return
+    cons_node = cmds.listConnections(driven_node + '.PP_spaceConstraint')
+    if cons_node:
+        return cons_node[0]
+
+
+def _getSwitch(controller):
+    # Returns the switch attribute plug and space constraint of `controller`
+    switch_plug = None
+    if attributeExists(controller, 'PP_spaceDriver'):
+        switch_plug = cmds.listConnections(controller + '.PP_spaceDriver',
+                                           source=True, destination=False, plugs=True)
+    driven_node = None
+    if attributeExists(controller, 'PP_drivenNode'):
+        driven_node = cmds.listConnections(controller + '.PP_drivenNode')
+    cons_node = _getSpaceConstraint(driven_node[0]) if driven_node else None
+    if not (switch_plug and cons_node):
+        raise ValueError("No space switch found on '{}'.".format(controller))
+
+    return switch_plug[0], cons_node
+
+
+def _connect(src_plug, dst_plug):
+    if not cmds.isConnected(src_plug, dst_plug):
+        cmds.connectAttr(src_plug, dst_plug, force=True)
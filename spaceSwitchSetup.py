@@ -13,7 +13,9 @@ import os
 import maya.cmds as cmds
 import maya.OpenMaya as OpenMaya
 import maya.OpenMayaUI as mui
-import spaceSwitchScripts as switchUtils
+from . import spaceSwitch as switchApi
+from .spaceIndex import getSpaceIndex, closeSpaceIndex
+from .utils import getFrameRange, snapTransforms
 try:
     from PySide import QtGui
     from PySide.QtCore import *
@@ -314,6 +316,7 @@ class SpaceSwitchWindow(QMainWindow):
         self._editDrivenNode = None
         self._editFrames = []
         self.callback_list = []
+        self.spaceIndex = getSpaceIndex()
         self.readSettings()
         self.loadRecentSettings()
         self.addCallBacks()
@@ -401,11 +404,6 @@ class SpaceSwitchWindow(QMainWindow):
                 if not self.switchAttribute:
                     self.missingValuesWarnings('attribute name not Specified.', self.attributeNameEdit)
                     return
-                for required in [self.drivenNode, self.switchController]:
-                    if not cmds.objExists(required):
-                        self.missingValuesWarnings("%s doesn't exist in the scene" % required)
-                        return
-
                 if not self.spacesLayouts:
                     self.missingValuesWarnings('No spaces given to add. Please add a space first.')
                     return
@@ -413,37 +411,23 @@ class SpaceSwitchWindow(QMainWindow):
                     log.warning("%s doesn't exist in the scene.Creating a default spaces group!" % self.spacesGroup)
                     cmds.select(cmds.group(em=1, n='spaces_GRP#', w=1))
                     getSelected(self.spacesEdit)
-                if not attributeExists(self.spacesGroup, 'PP_spacesGroup'):
-                    cmds.addAttr(self.spacesGroup, longName='PP_spacesGroup', at='message')
-                if not attributeExists(self.switchController, 'PP_spacesGroup'):
-                    cmds.addAttr(self.switchController, longName='PP_spacesGroup', at='message')
+                argDict = {'controller': self.switchController,
+                 'drivenNode': self.drivenNode,
+                 'constraintType': self.constraintType,
+                 'spacesGrp': self.spacesGroup,
+                 'attrName': self.switchAttribute,
+                 'driverSpaces': [{self.getSpaceDriverNode(spaceLayout): self.getSpaceDisplayName(spaceLayout)} for spaceLayout in self.spacesLayouts]}
                 try:
-                    cmds.connectAttr('%s.PP_spacesGroup' % self.spacesGroup, '%s.PP_spacesGroup' % self.switchController, force=True)
-                except Exception as e:
-                    log.info(e)
-
-                spaces = []
-                spacesDict = {}
-                for spaceLayout in self.spacesLayouts:
-                    driverNode = self.getSpaceDriverNode(spaceLayout)
-                    if self.spaceExists(driverNode):
-                        log.info('Found the driver')
-                        continue
-                    displayName = self.getSpaceDisplayName(spaceLayout)
-                    if not driverNode:
-                        continue
-                    else:
-                        if not cmds.objExists(driverNode):
-                            self.missingValuesWarnings("%s doesn't exist in the scene" % driverNode)
-                            return
-                        if not displayName:
-                            displayName = getShortName(driverNode)
-                    spacesDict = {driverNode: displayName}
-                    spaces.append(spacesDict)
-
-                if not spaces:
+                    result = switchApi.buildSpaceSwitch(argDict)
+                except ValueError as e:
+                    self.missingValuesWarnings(str(e))
+                    return
+
+                for driver in result['skipped']:
+                    log.info('%s is already an driving space for %s' % (driver, self.drivenNode))
+
+                if not result['added']:
                     return
-                self.spaceSwitch(self.drivenNode, self.switchController, self.constraintType, spaces, self.spacesGroup, self.switchAttribute)
             except Exception as e:
                 log.exception(e)
                 QMessageBox.warning(self, 'Error:', str(e))
@@ -470,160 +454,27 @@ class SpaceSwitchWindow(QMainWindow):
             lineEdit.setFocus()
 
     def spaceSwitch(self, drivenNode, controller, constraintType, driverSpaces, spacesGrp = None, attrName = 'spaces'):
-        constraintsList = {'point': cmds.pointConstraint,
-         'orient': cmds.orientConstraint,
-         'parent': cmds.parentConstraint}
-        constraint = constraintsList[constraintType]
-        driverGrp = None
-        enumName = []
-        for spaceDict in driverSpaces:
-            for key, value in spaceDict.iteritems():
-                driverGrp = ''
-                if attributeExists(key, 'PP_driverGroup'):
-                    driverGrp = cmds.listConnections(key + '.PP_driverGroup')
-                    if driverGrp:
-                        driverGrp = getMDagPath(driverGrp[0])
-                if not cmds.objExists(key + '_space'):
-                    driverGrp = getMDagPath(cmds.group(empty=True, name=getShortName(key) + '_space'))
-                else:
-                    driverGrp = getMDagPath(key + '_space')
-                addMsgAttr(key, driverGrp.fullPathName(), 'PP_driverGroup')
-                try:
-                    cmds.pointConstraint(key, driverGrp.fullPathName(), maintainOffset=0)
-                    cmds.orientConstraint(key, driverGrp.fullPathName(), maintainOffset=0)
-                except RuntimeError as e:
-                    log.info(e)
-
-                try:
-                    cmds.parent(driverGrp.fullPathName(), spacesGrp)
-                except Exception as e:
-                    log.info(e)
-
-                if not attributeExists(controller, attrName):
-                    cmds.addAttr(controller, longName=attrName, keyable=True, attributeType='enum', enumName=value)
-                enumName = cmds.addAttr('%s.%s' % (controller, attrName), query=True, enumName=True)
-                enumList = enumName.split(':')
-                for enum in enumList:
-                    if enum == value:
-                        enumList.remove(value)
-
-                newEnum = ':'.join(enumList)
-                cmds.addAttr('%s.%s' % (controller, attrName), edit=True, enumName='%s:%s' % (newEnum, value))
-                constraintGrp = '%s_%s_space' % (getShortName(drivenNode), getShortName(key))
-                constraintGrpOffset = '%s_offset' % constraintGrp
-                if not cmds.objExists(constraintGrp):
-                    constraintGrp = cmds.group(empty=True, name=constraintGrp)
-                    constraintGrpOffset = cmds.group(constraintGrp, name='%s_offset' % constraintGrp)
-                addMsgAttr(key, constraintGrp, 'PP_driverNode')
-                addMsgAttr(constraintGrp, constraintGrpOffset, 'PP_offsetGrp')
-                cmds.delete(cmds.pointConstraint(drivenNode, constraintGrpOffset)[0])
-                drivenNodeScale = cmds.xform(drivenNode, query=True, scale=True, worldSpace=True)
-                cmds.setAttr(constraintGrpOffset + '.scale', drivenNodeScale[0], drivenNodeScale[1], drivenNodeScale[2], type='double3')
-                drivenNodeRot = cmds.xform(drivenNode, query=True, rotation=True, worldSpace=True)
-                cmds.xform(constraintGrpOffset, rotation=drivenNodeRot, worldSpace=True)
-                cmds.delete(cmds.orientConstraint(drivenNode, constraintGrp)[0])
-                try:
-                    cmds.parent(constraintGrpOffset, driverGrp.fullPathName())
-                except RuntimeError as e:
-                    log.info(e)
-
-                constraintNode = constraint(constraintGrp, drivenNode, maintainOffset=True)[0]
-                constraintTargetList = constraint(constraintNode, targetList=True, query=True)
-                constraintWeightsList = constraint(constraintNode, weightAliasList=True, query=True)
-                constraintDriverIdx = constraintTargetList.index(constraintGrp)
-                addMsgAttr(drivenNode, constraintNode, 'PP_spaceConstraint')
-                cond = '%s_%s_space_COND' % (getShortName(drivenNode), key)
-                finalEnumList = cmds.addAttr('%s.%s' % (controller, attrName), query=True, enumName=True)
-                finalEnumList = finalEnumList.split(':')
-                if not attributeExists(constraintGrp, 'PP_switchNo'):
-                    cmds.addAttr(constraintGrp, longName='PP_switchNo', at='long')
-                cmds.setAttr('%s.PP_switchNo' % constraintGrp, constraintDriverIdx)
-                if not cmds.objExists(cond):
-                    cond = cmds.shadingNode('condition', name=cond, asUtility=True)
-                try:
-                    cmds.connectAttr('%s.PP_switchNo' % constraintGrp, cond + '.secondTerm')
-                except RuntimeError as e:
-                    log.info(e)
-
-                cmds.setAttr(cond + '.operation', 0)
-                cmds.setAttr(cond + '.colorIfTrueR', 1)
-                cmds.setAttr(cond + '.colorIfFalseR', 0)
-                try:
-                    cmds.connectAttr(cond + '.outColorR', '%s.%s' % (constraintNode, constraintWeightsList[constraintDriverIdx]), force=True)
-                except Exception as e:
-                    log.info(e)
-
-                try:
-                    cmds.connectAttr('%s.%s' % (controller, attrName), cond + '.firstTerm', force=True)
-                except Exception as e:
-                    log.info(e)
-
-                addMsgAttr(controller, drivenNode, 'PP_drivenNode')
-                addMsgAttr(constraintGrp, cond, 'PP_condNode')
-
-        stampName = 'PP_spaceDriver'
-        if not attributeExists(controller, stampName):
-            cmds.addAttr(controller, longName=stampName, at='long', dv=0)
-        try:
-            cmds.connectAttr('%s.%s' % (controller, attrName), '%s.PP_spaceDriver' % controller, force=True)
-        except Exception as e:
-            log.info(e)
-
-        return
+        switchApi.spaceSwitch(drivenNode, controller, constraintType, driverSpaces, spacesGrp, attrName)
 
     def spaceExists(self, driver):
-        driversLst = self.getDrivers(self.switchController)
-        if not driversLst:
-            return
-        if driver in driversLst:
+        if self.spaceIndex.hasDriver(self.switchController, driver):
             log.info('%s is already an driving space for %s' % (driver, self.drivenNode))
             return driver
 
     def getDrivers(self, switcherNode):
-        constraintTargetsList = self.getConstraintGroups(switcherNode)
-        driverNodes = []
-        if not constraintTargetsList:
-            return
-        for target in constraintTargetsList:
-            driverN = self.getDriverFromGrp(target)
-            if driverN:
-                driverNodes.append(driverN)
-
-        return driverNodes
+        return self.spaceIndex.getDrivers(switcherNode) or None
 
     def getConstraintGroups(self, switcherNode):
-        if not attributeExists(switcherNode, 'PP_drivenNode'):
-            return
-        drivenNode = cmds.listConnections(switcherNode + '.PP_drivenNode')
-        if not drivenNode:
-            return
-        spaceConstraint = cmds.listConnections(drivenNode[0] + '.PP_spaceConstraint')
-        if not spaceConstraint:
-            return
-        spaceConstraint = spaceConstraint[0]
-        constraintsList = {'pointConstraint': cmds.pointConstraint,
-         'orientConstraint': cmds.orientConstraint,
-         'parentConstraint': cmds.parentConstraint}
-        constraint = constraintsList[cmds.nodeType(spaceConstraint)]
-        constraintTargetsList = constraint(spaceConstraint, targetList=True, query=True)
-        return constraintTargetsList
+        return self.spaceIndex.getConstraintGroups(switcherNode)
 
     def getDriverFromGrp(self, grp):
-        if not attributeExists(grp, 'PP_driverNode'):
-            return
-        driverN = cmds.listConnections(grp + '.PP_driverNode')
-        if driverN:
-            return driverN[0]
+        return self.spaceIndex.getDriverFromGrp(grp)
 
     def getDisplayName(self, grp, switcher):
-        if not attributeExists(grp, 'PP_switchNo'):
+        displayName = self.spaceIndex.getDisplayName(grp)
+        if displayName is None:
             log.info('No switch No found, skipping the %s driver' % grp)
-            return
-        switchNo = cmds.getAttr('%s.PP_switchNo' % grp)
-        spaceCon = cmds.listConnections(switcher + '.PP_spaceDriver', p=True)
-        enumNames = cmds.addAttr(spaceCon[0], query=True, enumName=True)
-        enumList = enumNames.split(':')
-        return enumList[switchNo]
+        return displayName
 
     def selectFieldNodes(self, editField):
         node = str(editField.text())
@@ -646,32 +497,14 @@ class SpaceSwitchWindow(QMainWindow):
         try:
             if not cmds.objExists(lineEdit):
                 return
-            if not attributeExists(lineEdit, 'PP_drivenNode'):
-                return
-            switcherNode = self.switchController
-            drivenNode = cmds.listConnections(switcherNode + '.PP_drivenNode')
-            if not drivenNode:
+            switch = self.spaceIndex.getSwitch(self.switchController)
+            if not switch:
                 return
-            drivenNode = drivenNode[0]
-            self.drivenNodeEdit.setText(drivenNode)
-            spaceAttr = ''
-            spaceCon = cmds.listConnections(switcherNode + '.PP_spaceDriver', p=True)
-            if spaceCon:
-                spaceAttr = spaceCon[0].split('.')[-1]
-            self.attributeNameEdit.setText(spaceAttr)
-            spaceConstraint = cmds.listConnections(drivenNode + '.PP_spaceConstraint')
-            if spaceConstraint:
-                spaceConstraint = spaceConstraint[0]
-            constraintType = cmds.nodeType(spaceConstraint)
-            if constraintType == 'parentConstraint':
-                self.constraintComboBox.setCurrentIndex(0)
-            if constraintType == 'pointConstraint':
-                self.constraintComboBox.setCurrentIndex(1)
-            if constraintType == 'orientConstraint':
-                self.constraintComboBox.setCurrentIndex(2)
-            spacesGrp = cmds.listConnections(switcherNode + '.PP_spacesGroup')
-            if spacesGrp:
-                cmds.select(spacesGrp[0])
+            self.drivenNodeEdit.setText(switch['drivenNode'])
+            self.attributeNameEdit.setText(switch['attrName'])
+            self.constraintComboBox.setCurrentIndex(['parent', 'point', 'orient'].index(switch['constraintType']))
+            if switch['spacesGrp']:
+                cmds.select(switch['spacesGrp'])
                 getSelected(self.spacesEdit)
             else:
                 self.spacesEdit.setText('')
@@ -710,7 +543,7 @@ class SpaceSwitchWindow(QMainWindow):
     def useTimeline(self, checked = False):
         if not checked:
             return
-        frames = switchUtils.getTimelineRange()
+        frames = [cmds.playbackOptions(query=True, animationStartTime=True), cmds.playbackOptions(query=True, animationEndTime=True)]
         startFrame = frames[0]
         endFrame = frames[-1]
         self.bakeStartFrameSpin.setValue(startFrame)
@@ -720,7 +553,7 @@ class SpaceSwitchWindow(QMainWindow):
     def usePlayback(self, checked = False):
         if not checked:
             return
-        frames = switchUtils.getPlaybackRange()
+        frames = [cmds.playbackOptions(query=True, minTime=True), cmds.playbackOptions(query=True, maxTime=True)]
         startFrame = frames[0]
         endFrame = frames[-1]
         self.bakeStartFrameSpin.setValue(startFrame)
@@ -752,11 +585,9 @@ class SpaceSwitchWindow(QMainWindow):
                     return
                 if not self.bakeStartFrameSpin.isEnabled():
                     return
-                frameRange = [self.bakeStartFrameSpin.value(), self.bakeEndFrameSpin.value()]
+                frames = getFrameRange(self.bakeStartFrameSpin.value(), self.bakeEndFrameSpin.value())
                 targetSpace = self.availableSpacesComboBox.currentIndex()
-                spaceCon = cmds.listConnections(switcherNode + '.PP_spaceDriver', p=True)[0]
-                spaceCon = spaceCon.split('.')[-1]
-                switchUtils.spaceSwitchBake(switcherNode, spaceCon, targetSpace, frameRange)
+                switchApi.bakeSpaces([switcherNode], targetSpace, frames)
             except Exception as e:
                 log.exception(e)
                 return
@@ -776,16 +607,13 @@ class SpaceSwitchWindow(QMainWindow):
             if not switcherNode:
                 return
             self._editSwitcherNode = getMDagPath(switcherNode)
-            drivenNode = cmds.listConnections(switcherNode + '.PP_drivenNode')
-            if drivenNode:
-                self.editDrivenNodeEdit.setText(drivenNode[0])
-                self._editDrivenNode = getMDagPath(drivenNode[0])
-            constraint = cmds.listConnections(drivenNode[0] + '.PP_spaceConstraint')
-            if constraint:
-                self.editDrivingConstEdit.setText(constraint[0])
-                self._editConstraintNode = getMDagPath(constraint[0])
-            else:
+            switch = self.spaceIndex.getSwitch(switcherNode)
+            if not switch:
                 return
+            self.editDrivenNodeEdit.setText(switch['drivenNode'])
+            self._editDrivenNode = getMDagPath(switch['drivenNode'])
+            self.editDrivingConstEdit.setText(switch['constraint'])
+            self._editConstraintNode = getMDagPath(switch['constraint'])
             grpLst = self.getConstraintGroups(switcherNode)
             for i, grp in enumerate(grpLst):
                 driver = self.getDriverFromGrp(grp)
@@ -818,9 +646,7 @@ class SpaceSwitchWindow(QMainWindow):
                 QMessageBox.warning(self, 'Warnning', '%s already has a space group %s' % (getShortName(self.switchController), drivenNode[0]))
                 return
             offsetGroup = cmds.group(n='%s_space_GRP' % getShortName(self.switchController), world=True, empty=True)
-            cmds.delete(cmds.pointConstraint(self.switchController, offsetGroup)[0])
-            drivenNodeRot = cmds.xform(self.switchController, query=True, rotation=True, worldSpace=True)
-            cmds.xform(offsetGroup, rotation=drivenNodeRot, worldSpace=True)
+            snapTransforms([offsetGroup], [self.switchController])
             drivenNodeScale = cmds.xform(self.switchController, query=True, scale=True, worldSpace=True)
             cmds.xform(offsetGroup, scale=drivenNodeScale, worldSpace=True)
             switchController = getMDagPath(self.switchController)
@@ -837,48 +663,24 @@ class SpaceSwitchWindow(QMainWindow):
         try:
             if not self._editFrames:
                 return
-            constraintsList = {'pointConstraint': cmds.pointConstraint,
-             'orientConstraint': cmds.orientConstraint,
-             'parentConstraint': cmds.parentConstraint}
-            orderedDrivers = range(len(self._editFrames))
-            orderedDisplayNames = range(len(self._editFrames))
+            orderedDrivers = [None] * len(self._editFrames)
             for frame in self._editFrames:
-                frame.orderNoLabel.setText('%s-' % self.driversContent.layout().indexOf(frame))
                 idx = self.driversContent.layout().indexOf(frame)
+                frame.orderNoLabel.setText('%s-' % idx)
                 orderedDrivers[idx] = frame.constraintGrp
-                orderedDisplayNames[idx] = frame.displayName
-                cmds.setAttr(frame.constraintGrp + '.PP_switchNo', idx)
 
-            drivenNode = self._editDrivenNode.fullPathName()
-            constraint = self._editConstraintNode.fullPathName()
-            constraintType = constraintsList[cmds.nodeType(constraint)]
             switcherNode = self._editSwitcherNode.fullPathName()
-            spaceCon = cmds.listConnections(switcherNode + '.PP_spaceDriver', p=True)[0]
-            constraintType(orderedDrivers[1:], drivenNode, remove=True, e=True)
-            constraintType(orderedDrivers[1:], drivenNode)
-            cmds.addAttr(spaceCon, edit=True, enumName=':'.join(orderedDisplayNames))
-            constraintWeightsList = constraintType(constraint, weightAliasList=True, query=True)
-            for i, driver in enumerate(orderedDrivers):
-                cond = cmds.listConnections(driver + '.PP_condNode')[0]
-                try:
-                    cmds.connectAttr(cond + '.outColorR', '%s.%s' % (constraint, constraintWeightsList[i]), force=True)
-                except RuntimeError as e:
-                    log.info(e)
-
+            switchApi.reorderSpaces(switcherNode, orderedDrivers)
+            self.spaceIndex.invalidate()
         except Exception as e:
             log.exception(e)
 
     def editDisplayName(self, widget):
         try:
             switcherNode = self._editSwitcherNode.fullPathName()
-            spaceCon = cmds.listConnections(switcherNode + '.PP_spaceDriver', p=True)[0]
             idx = self.driversContent.layout().indexOf(widget)
-            enumName = cmds.addAttr(spaceCon, query=True, enumName=True)
-            enumList = enumName.split(':')
-            enumList[idx] = widget.displayName
-            newEnum = ':'.join(enumList)
-            spaceCon = cmds.listConnections(switcherNode + '.PP_spaceDriver', p=True)[0]
-            cmds.addAttr(spaceCon, edit=True, enumName=newEnum)
+            switchApi.renameSpace(switcherNode, idx, widget.displayName)
+            self.spaceIndex.invalidate()
         except Exception as e:
             log.exception(e)
 
@@ -951,13 +753,8 @@ class SpaceSwitchWindow(QMainWindow):
                     frame.deleteLater()
 
                 switcherNode = self._editSwitcherNode.fullPathName()
-                for grp in self.getConstraintGroups(switcherNode):
-                    driverCond = cmds.listConnections(grp + '.PP_condNode')
-                    driverOffsetGrp = cmds.listConnections(grp + '.PP_offsetGrp')
-                    cmds.delete(driverCond, driverOffsetGrp)
-
-                spaceCon = cmds.listConnections(switcherNode + '.PP_spaceDriver', p=True)[0]
-                cmds.deleteAttr(spaceCon)
+                switchApi.deleteSpaceSwitch(switcherNode)
+                self.spaceIndex.invalidate()
                 self._editFrames = []
                 self._editSwitcherNode = None
                 self._editConstraintNode = None
@@ -996,6 +793,7 @@ class SpaceSwitchWindow(QMainWindow):
 
     def closeEvent(self, event):
         self.writeSettings()
+        closeSpaceIndex()
 
     def readSettings(self):
         settings = QSettings(QSettings.IniFormat, QSettings.UserScope, 'PurplePuppet_INC', 'PP_SpaceSwitchTool')
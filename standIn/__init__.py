@@ -0,0 +1,51 @@
+"""
+In-memory stand-in for the Maya modules as5util uses (maya.cmds,
+maya.api.OpenMaya, maya.api.OpenMayaAnim and pymel.core), to run the
+build pipeline and its benchmarks without Maya.
+
+    $ AS5UTIL_STANDIN=1 python
+    >>> from as5util.standIn import characters
+    >>> characters.newCharacter('g8f')
+
+It is opt-in: as5util installs it on import only when the AS5UTIL_STANDIN
+environment variable is set, and never replaces an imported maya.cmds.
+See scene.py for what the scene models.
+"""
+import sys
+import types
+
+from .scene import getScene, newScene
+
+_MODULES = ('maya', 'maya.cmds', 'maya.api', 'maya.api.OpenMaya',
+            'maya.api.OpenMayaAnim', 'pymel', 'pymel.core')
+
+
+def install():
+    """
+    Registers the stand-in modules as maya.cmds, maya.api.OpenMaya,
+    maya.api.OpenMayaAnim and pymel.core.  Does nothing if they are already
+    importable.
+    """
+
+    if 'maya.cmds' in sys.modules:
+        return
+
+    from . import cmds, openMaya, openMayaAnim, pymelCore
+
+    maya = types.ModuleType('maya')
+    api = types.ModuleType('maya.api')
+    pymel = types.ModuleType('pymel')
+    maya.cmds, maya.api = cmds, api
+    api.OpenMaya, api.OpenMayaAnim = openMaya, openMayaAnim
+    pymel.core = pymelCore
+
+    for name, module in zip(_MODULES, (maya, cmds, api, openMaya, openMayaAnim,
+                                       pymel, pymelCore)):
+        sys.modules[name] = module
+
+
+def isInstalled():
+    """Returns True if maya.cmds is the stand-in."""
+
+    module = sys.modules.get('maya.cmds')
+    return module is not None and module.__name__ == __name__ + '.cmds'
@@ -0,0 +1,337 @@
+"""
+Synthetic scenes for running the build pipeline on the stand-in.
+
+newCharacter builds what preBuild expects: a source skeleton named after
+a skeleton map's source joints, the body mesh with its breast vertex sets
+and an AS5 FitSkeleton with the map's joints.  newRig builds what
+postBuild expects: a mock of the rig AS5 builds from that FitSkeleton,
+with deform joints following FK controls, IK, FK/IK switch, spine, aim
+and root controls, and the AllSet, ControlSet and DeformSet sets.  IK
+chains are not solved.
+"""
+from collections import OrderedDict
+import numpy as np
+
+from .. import matrix
+from ..data.shapes import CTRL_SHAPES
+from . import cmds
+from .scene import AttrSpec, getScene, newScene
+
+# FitSkeleton joint: (parent, world position) of a generic character,
+# parents first, right side at -X and facing +Z
+AS5_JOINTS = OrderedDict([
+    ('Root', (None, (0, 100, 0))),
+    ('Pelvis', ('Root', (0, 98, 0))),
+    ('ButtockBase', ('Pelvis', (-8, 92, -8))),
+    ('ButtockEnd', ('ButtockBase', (-8, 90, -12))),
+    ('Spine1', ('Root', (0, 108, 0))),
+    ('Spine2', ('Spine1', (0, 118, 0))),
+    ('Spine3', ('Spine2', (0, 128, 0))),
+    ('Chest', ('Spine3', (0, 138, 0))),
+    ('Neck', ('Chest', (0, 150, 0))),
+    ('Head', ('Neck', (0, 160, 1))),
+    ('HeadEnd', ('Head', (0, 178, 1))),
+    ('Jaw', ('Head', (0, 163, 4))),
+    ('JawEnd', ('Jaw', (0, 157, 10))),
+    ('Tongue1', ('Jaw', (0, 161, 5))),
+    ('Tongue2', ('Tongue1', (0, 161, 6))),
+    ('Tongue3', ('Tongue2', (0, 161, 7))),
+    ('Tongue4', ('Tongue3', (0, 161, 8))),
+    ('TongueEnd', ('Tongue4', (0, 161, 9))),
+    ('Eye', ('Head', (-3, 167, 8))),
+    ('EyeEnd', ('Eye', (-3, 167, 10))),
+    ('Hip', ('Root', (-10, 95, 0))),
+    ('Knee', ('Hip', (-10, 52, 2))),
+    ('Ankle', ('Knee', (-10, 8, -2))),
+    ('Heel', ('Ankle', (-10, 0, -6))),
+    ('Toes', ('Ankle', (-10, 2, 10))),
+    ('ToesEnd', ('Toes', (-10, 1, 16))),
+    ('FootSideInner', ('Ankle', (-6, 0, 6))),
+    ('FootSideOuter', ('Ankle', (-14, 0, 4))),
+    ('BreastBase', ('Chest', (-8, 135, 8))),
+    ('BreastMid', ('BreastBase', (-9, 132, 14))),
+    ('BreastEnd', ('BreastMid', (-9, 131, 18))),
+    ('Scapula', ('Chest', (-4, 145, -2))),
+    ('Shoulder', ('Scapula', (-17, 145, -4))),
+    ('Elbow', ('Shoulder', (-45, 145, -6))),
+    ('Wrist', ('Elbow', (-70, 145, -4))),
+    ('ThumbFinger1', ('Wrist', (-73, 143, 0))),
+    ('ThumbFinger2', ('ThumbFinger1', (-76, 142, 3))),
+    ('ThumbFinger3', ('ThumbFinger2', (-79, 141, 5))),
+    ('ThumbFinger4', ('ThumbFinger3', (-81, 140, 6)))] + [
+    ('{0}Finger{1}'.format(finger, i + 1),
+     ('Wrist' if i == 0 else '{0}Finger{1}'.format(finger, i),
+      (x, 145, z)))
+    for finger, z in [('Index', -1), ('Middle', -3), ('Ring', -5), ('Pinky', -7)]
+    for i, x in enumerate((-79, -84, -87, -89))] + [
+    ('TestesBase', ('Root', (0, 92, 4))),
+    ('Testis', ('TestesBase', (-2, 88, 5))),
+    ('TestisEnd', ('Testis', (-2, 85, 5))),
+    ('Gens1', ('Root', (0, 90, 6)))] + [
+    ('Gens{}'.format(i), ('Gens{}'.format(i - 1), (0, 91 - i, 4 + 2 * i)))
+    for i in range(2, 7)] + [
+    ('GensEnd', ('Gens6', (0, 84, 18)))])
+# Vertex sets placing FitSkeleton joints: set name: (joint, vertex count)
+VTX_SETS = OrderedDict([('VtxBreastMid_R', ('BreastMid', 8)),
+                        ('VtxBreastEnd_R', ('BreastEnd', 8))])
+# FK controls parented to FKParentConstraintToChest_M instead of their joint
+CHEST_FK = ('Scapula', 'BreastBase')
+# Joints preBuild and postBuild address by name, in every FitSkeleton
+REQUIRED_JOINTS = ('Pelvis', 'Spine3', 'BreastBase', 'BreastMid', 'BreastEnd')
+LIMBS = OrderedDict([('Arm', ('Shoulder', 'Elbow', 'Wrist')),
+                     ('Leg', ('Hip', 'Knee', 'Ankle'))])
+
+
+def _skelMap(map_name):
+    # pre needs the stand-in modules installed first
+    from ..pre import getSkelMap
+    return getSkelMap(map_name)
+
+
+def _fitNames(map_name):
+    # FitSkeleton joint names of a map, in template order
+    names = set(jname.split('_')[0] for jname in _skelMap(map_name).tables.order)
+    names.update(REQUIRED_JOINTS)
+    return [name for name in AS5_JOINTS if name in names]
+
+
+def _fitParent(name, names):
+    # Nearest template ancestor of `name` present in `names`
+    parent = AS5_JOINTS[name][0]
+    while parent is not None and parent not in names:
+        parent = AS5_JOINTS[parent][0]
+
+    return parent
+
+
+def _position(name, side='_R'):
+    position = np.array(AS5_JOINTS[name][1], dtype=float)
+    if side == '_L':
+        position[0] *= -1.0
+
+    return position
+
+
+def _side(name):
+    return '_M' if AS5_JOINTS[name][1][0] == 0 else '_R'
+
+
+def _createJoint(name, parent, position):
+    # Joint at a world position, with identity orientation
+    scene = getScene()
+    joint = scene.createNode('joint', name, parent)
+    parent_loc = scene.worldMatrix(parent)[3, :3] if parent is not None else np.zeros(3)
+    scene.setValue(scene.plug(joint, 'translate'), position - parent_loc)
+
+    return joint
+
+
+def newCharacter(map_name):
+    """
+    Opens a new scene holding a character for `map_name`: the source
+    skeleton (named after the map's source joints, slightly off the
+    template so preBuild has work to do), the 'Body' mesh with the
+    breast vertex sets and the 'FitSkeleton' of the map's joints and
+    REQUIRED_JOINTS.
+
+    Returns
+    -------
+    Scene
+
+    """
+
+    scene = newScene()
+    tables = _skelMap(map_name).tables
+
+    # Source skeleton, parented to the nearest mapped ancestor
+    sources = dict()
+    for name in AS5_JOINTS:
+        src_name = tables.as5_to_source.get(name + _side(name))
+        if not src_name:
+            continue
+        parent = AS5_JOINTS[name][0]
+        while parent is not None and parent not in sources:
+            parent = AS5_JOINTS[parent][0]
+        jitter = np.sin(np.arange(3) + len(sources)) * 0.5
+        sources[name] = _createJoint(src_name, sources.get(parent),
+                                     _position(name) + jitter)
+
+    # Body mesh and vertex sets
+    body = scene.createNode('transform', 'Body')
+    shape = scene.createNode('mesh', 'BodyShape', body)
+    points, start = [np.array([[-40.0, 0.0, -15.0], [40.0, 180.0, 15.0]])], 2
+    for set_name, (joint_name, count) in VTX_SETS.items():
+        angles = np.linspace(0.0, 2.0 * np.pi, count, endpoint=False)
+        ring = np.stack([np.cos(angles), np.sin(angles), np.zeros(count)], axis=-1) * 2.0
+        points.append(_position(joint_name) + ring)
+        vtx_set = scene.createNode('objectSet', set_name)
+        scene.addMembers(vtx_set, [(shape, tuple(range(start, start + count)))])
+        start += count
+    shape.data['points'] = np.concatenate(points)
+
+    # FitSkeleton
+    fit_names = _fitNames(map_name)
+    fit_root = scene.createNode('transform', 'FitSkeleton')
+    fit_joints = dict()
+    for name in fit_names:
+        parent = _fitParent(name, fit_names)
+        fit_joints[name] = _createJoint(name, fit_joints.get(parent, fit_root),
+                                        _position(name))
+    scene.resetCounts()
+
+    return scene
+
+
+def newRig(map_name):
+    """
+    Opens a new scene holding a mock of the AS5 rig built from the
+    FitSkeleton of `map_name`, before postBuild.
+
+    Returns
+    -------
+    Scene
+
+    """
+
+    scene = newScene()
+    names = _fitNames(map_name)
+    controls, deform_joints = list(), list()
+
+    def node(node_type, name, parent=None):
+        return scene.createNode(node_type, name, parent)
+
+    def control(name, parent, world_mat, size=5.0, ctrl_type='fk'):
+        ctrl = scene.createNode('transform', name, parent)
+        shape = scene.createNode('nurbsCurve', name + 'Shape', ctrl)
+        shape.data['cvs'] = np.array(CTRL_SHAPES[ctrl_type]['point'], dtype=float) * size
+        scene.setWorldMatrix(ctrl, world_mat)
+        controls.append(ctrl)
+        return ctrl
+
+    def offsetGroups(name, parent, world_mat, prefix='FK', size=5.0, ctrl_type='fk'):
+        # <prefix>Offset > <prefix>Extra > <prefix> control
+        offset = node('transform', '{0}Offset{1}'.format(prefix, name), parent)
+        scene.setWorldMatrix(offset, world_mat)
+        extra = node('transform', '{0}Extra{1}'.format(prefix, name), offset)
+        return control('{0}{1}'.format(prefix, name), extra, world_mat, size, ctrl_type)
+
+    main = control('Main', None, np.identity(4), 40.0, 'other')
+    motion = node('transform', 'MotionSystem', main)
+    deform = node('transform', 'DeformationSystem', main)
+
+    # Deform joints, aimed at their first child
+    joints, world_mats = OrderedDict(), dict()
+    for name in names:
+        children = [child for child in names if _fitParent(child, names) == name]
+        for side in ('_M',) if _side(name) == '_M' else ('_R', '_L'):
+            parent_name = _fitParent(name, names)
+            parent = joints[parent_name + (side if _side(parent_name) != '_M' else '_M')] \
+                if parent_name else deform
+            position = _position(name, side)
+            rot = world_mats[parent.name][:3, :3] if parent is not deform else np.identity(3)
+            if children:
+                aim = _position(children[0], side) - position
+                up = (0.0, 1.0, 0.0) if abs(aim[2]) > abs(aim[1]) else (0.0, 0.0, 1.0)
+                rot = matrix.aimMatrices(aim, up)
+            world_mat = matrix.composeMatrix(position, rot)
+            joint = node('joint', name + side, parent)
+            scene.setWorldMatrix(joint, world_mat)
+            joints[joint.name] = joint
+            world_mats[joint.name] = world_mat
+            deform_joints.append(joint)
+
+    # FK controls driving the deform joints
+    root_mat = world_mats['Root_M']
+    root_offset = node('transform', 'RootOffsetX_M', motion)
+    scene.setWorldMatrix(root_offset, root_mat)
+    root_ctrl = control('RootX_M', node('transform', 'RootExtraX_M', root_offset),
+                        root_mat, 20.0)
+    fk_system = node('transform', 'FKSystem', motion)
+    chest = node('transform', 'FKParentConstraintToChest_M', fk_system)
+    fk_ctrls = dict()
+    for jname, joint in joints.items():
+        if not [child for child in joint.children if child.isA('joint')]:
+            continue
+        base = jname.split('_')[0]
+        parent = joint.parent
+        if base in CHEST_FK and 'Chest_M' in joints:
+            fk_parent = chest
+        elif parent.name in fk_ctrls:
+            fk_parent = fk_ctrls[parent.name]
+        else:
+            fk_parent = root_ctrl if jname == 'Root_M' else fk_system
+        fk_ctrls[jname] = offsetGroups(jname, fk_parent, world_mats[jname])
+    if 'Chest_M' in joints:
+        _constrain(scene, 'parent', [joints['Chest_M']], chest)
+
+    # IK, pole and FK/IK controls of the limbs
+    ik_system = node('transform', 'IKSystem', motion)
+    fkik_system = node('transform', 'FKIKSystem', motion)
+    for limb, (start, mid, end) in LIMBS.items():
+        for side in '_R', '_L':
+            end_mat = matrix.composeMatrix(world_mats[end + side][3, :3])
+            ik_ctrl = offsetGroups(limb + side, ik_system, end_mat, 'IK', 8.0, 'ik')
+            if limb == 'Arm':
+                aligned = node('transform', 'IKFKAligned' + limb + side, ik_ctrl)
+                scene.setWorldMatrix(aligned, world_mats[end + side])
+            else:
+                heel = control('RollHeel' + side, ik_ctrl, end_mat, 3.0)
+                toes_end = control('RollToesEnd' + side, heel, end_mat, 3.0)
+                control('RollToes' + side, toes_end, end_mat, 3.0)
+                control('IKToes' + side, toes_end, end_mat, 3.0)
+            pole_mat = matrix.composeMatrix(
+                world_mats[mid + side][3, :3] + (0, 0, -40 if limb == 'Arm' else 40))
+            offsetGroups(limb + side, ik_system, pole_mat, 'Pole', 3.0, 'pole')
+            _constrain(scene, 'parent', [ik_ctrl], scene.find('PoleOffset' + limb + side),
+                       keep_offset=True, rotate=False)
+            fkik_mat = matrix.composeMatrix(world_mats[start + side][3, :3] + (0, 10, -20))
+            fkik_parent = node('transform', 'FKIKParentConstraint' + limb + side,
+                               fkik_system)
+            fkik = control('FKIK' + limb + side, fkik_parent, fkik_mat, 3.0, 'other')
+            _addAttr(scene, fkik, 'FKIKBlend', 0.0)
+
+    # Spine, aim and switch controls
+    spine_mat = matrix.composeMatrix(world_mats['Root_M'][3, :3] + (0, 10, -25))
+    _addAttr(scene, control('FKIKSpine_M', fkik_system, spine_mat, 3.0, 'other'),
+             'FKIKBlend', 0.0)
+    for i in range(1, 4):
+        spine = control('IKSpine{}_M'.format(i), ik_system, matrix.composeMatrix(
+            world_mats['Root_M'][3, :3] + (0, 12 * i, 0)), 12.0, 'ik')
+    for attr_name in 'stretchy', 'volume':
+        _addAttr(scene, spine, attr_name, 1.0)
+    _addAttr(scene, control('IKSpline3_M', ik_system, spine_mat, 10.0, 'ik'), 'volume', 1.0)
+
+    eye_mat = matrix.composeMatrix(world_mats['Head_M'][3, :3] + (0, 6, 40))
+    aim_offset = node('transform', 'AimOffsetEye_M', motion)
+    scene.setWorldMatrix(aim_offset, eye_mat)
+    control('AimEye_M', aim_offset, eye_mat, 4.0, 'other')
+    _constrain(scene, 'parent', [joints['Head_M']], aim_offset, keep_offset=True)
+
+    # Deform joints follow their FK controls.  Constraints come after the
+    # hierarchy, so a joint's first child is still its child joint
+    for jname, ctrl in fk_ctrls.items():
+        _constrain(scene, 'parent', [ctrl], joints[jname])
+
+    # Sets
+    for set_name, members in [('AllSet', list(scene.nodes.values())),
+                              ('ControlSet', controls),
+                              ('DeformSet', deform_joints)]:
+        scene.addMembers(node('objectSet', set_name), members)
+    scene.resetCounts()
+
+    return scene
+
+
+def _addAttr(scene, node, attr_name, value):
+    scene.addAttr(node, AttrSpec(attr_name, attr_name, 'double', value, keyable=True))
+
+
+def _constrain(scene, kind, targets, driven, keep_offset=False, rotate=True):
+    # Counted as commands until the scene's counts are reset
+    func = {'parent': cmds.parentConstraint, 'point': cmds.pointConstraint,
+            'orient': cmds.orientConstraint}[kind]
+    kwargs = {'maintainOffset': keep_offset}
+    if not rotate:
+        kwargs['skipRotate'] = ('x', 'y', 'z')
+
+    return func(*([target.name for target in targets] + [driven.name]), **kwargs)
@@ -0,0 +1,1259 @@
+"""
+Stand-in for maya.cmds, backed by the in-memory scene (see scene.py).
+
+Implements the commands and flags used by as5util, with Maya's return
+values and errors: ValueError for missing objects, RuntimeError for
+invalid operations.  Every call is counted in Scene.commands and reported
+to command callbacks, as MCommandMessage does in Maya.
+"""
+from functools import wraps
+import os
+import re
+import tempfile
+import numpy as np
+
+from .. import matrix
+from .scene import AttrSpec, Plug, getScene, newScene, isType
+
+_COMPONENT = re.compile(r'^(.+)\.(vtx|cv)\[(\d+)(?::(\d+))?\]$')
+_RANGE = re.compile(r'^(.+)\.(\w+)\[(\d+):(\d+)\]$')
+_CONSTRAINT_KINDS = ('parent', 'point', 'orient', 'aim')
+_TRANSLATE = ('translateX', 'translateY', 'translateZ')
+_ROTATE = ('rotateX', 'rotateY', 'rotateZ')
+# Attribute types of addAttr -attributeType/-dataType
+_ATTR_KINDS = {
+    'double': 'double', 'float': 'double', 'doubleLinear': 'doubleLinear',
+    'doubleAngle': 'doubleAngle', 'bool': 'bool', 'long': 'long', 'short': 'long',
+    'byte': 'long', 'enum': 'enum', 'message': 'message', 'string': 'string',
+    'stringArray': 'stringArray', 'doubleArray': 'doubleArray', 'matrix': 'matrix',
+    'double3': 'compound', 'float3': 'compound', 'compound': 'compound', 'time': 'time'
+}
+_DEFAULTS = {'string': '', 'stringArray': list(), 'doubleArray': list(),
+             'message': None, 'matrix': None, 'compound': None, 'bool': False,
+             'long': 0, 'enum': 0}
+
+
+def _command(func):
+    # Counts each call of a command
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        getScene().recordCommand(func.__name__.rstrip('_'))
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _flag(kwargs, *names, **default):
+    for name in names:
+        if name in kwargs:
+            return kwargs[name]
+
+    return default.get('default')
+
+
+def _flatten(args):
+    items = list()
+    for arg in args:
+        if isinstance(arg, (list, tuple, set)):
+            items.extend(_flatten(arg))
+        elif arg is not None:
+            items.append(str(arg))
+
+    return items
+
+
+def _node(name):
+    node = getScene().find(str(name).split('.')[0])
+    if node is None:
+        raise ValueError('No object matches name: {}'.format(name))
+
+    return node
+
+
+def _plug(plug_name):
+    plug_name = str(plug_name)
+    node_name, _, attr_name = plug_name.partition('.')
+    if not attr_name:
+        raise ValueError('No attribute specified: {}'.format(plug_name))
+    try:
+        return getScene().plug(_node(node_name), attr_name)
+    except ValueError:
+        raise ValueError('No object matches name: {}'.format(plug_name))
+
+
+def _component(name):
+    # (shape node, vertex or CV indices) of 'mesh.vtx[i]' / 'curve.cv[i:j]'
+    match = _COMPONENT.match(str(name))
+    if not match:
+        return
+    node = getScene().find(match.group(1))
+    if node is None:
+        return
+    if not node.isA('shape'):
+        shapes = getScene().shapes(node)
+        if not shapes:
+            return
+        node = shapes[0]
+    start = int(match.group(3))
+    end = int(match.group(4)) if match.group(4) is not None else start
+
+    return node, tuple(range(start, end + 1))
+
+
+def componentName(shape, indices):
+    """Returns compact component names, e.g. ['BodyShape.vtx[0:3]'], of indices."""
+
+    kind = 'vtx' if shape.isA('mesh') else 'cv'
+    indices = sorted(indices)
+    names, start = list(), 0
+    for i in range(1, len(indices) + 1):
+        if i == len(indices) or indices[i] != indices[i - 1] + 1:
+            first, last = indices[start], indices[i - 1]
+            names.append('{0}.{1}[{2}]'.format(shape.name, kind, first) if first == last
+                         else '{0}.{1}[{2}:{3}]'.format(shape.name, kind, first, last))
+            start = i
+
+    return names
+
+
+def _memberNames(members):
+    names = list()
+    for member in members:
+        if isinstance(member, tuple):
+            names.extend(componentName(*member))
+        else:
+            names.append(member.name)
+
+    return names
+
+
+def _items(args):
+    # Nodes and (shape, indices) components named by `args`
+    items = list()
+    for name in _flatten(args):
+        component = _component(name)
+        if component is not None:
+            items.append(component)
+        else:
+            items.append(_node(name))
+
+    return items
+
+
+def _pointsOf(shape):
+    return shape.data['points'] if shape.isA('mesh') else shape.data['cvs']
+
+
+def _worldPoints(shape, indices=None):
+    points = _pointsOf(shape)
+    if indices is not None:
+        points = points[list(indices)]
+
+    return matrix.transformPoints(points, getScene().worldMatrix(shape))
+
+
+def _uniqueResults(nodes):
+    seen, result = set(), list()
+    for node in nodes:
+        if id(node) not in seen:
+            seen.add(id(node))
+            result.append(node)
+
+    return result
+
+
+# Scene and files
+
+
+@_command
+def file(*args, **kwargs):
+    """Supports -new and -import of FitSkeleton .ma files (see fitSkeleton)."""
+
+    if _flag(kwargs, 'new', 'f') is True and not args:
+        newScene()
+        return
+    if _flag(kwargs, 'i', 'import'):
+        from ..fitSkeleton import readMaFile
+        return _importSkeleton(readMaFile(args[0]))
+    if _flag(kwargs, 'new'):
+        newScene()
+        return
+
+    raise RuntimeError('Unsupported file operation.')
+
+
+def _importSkeleton(fit_skel):
+    scene = getScene()
+    nodes = list()
+    for i, name in enumerate(fit_skel.names):
+        parent = nodes[fit_skel.parents[i]] if fit_skel.parents[i] >= 0 else None
+        node = scene.createNode(fit_skel.types[i], name, parent)
+        nodes.append(node)
+        values = {'translate': fit_skel.translate[i], 'rotate': fit_skel.rotate[i],
+                  'rotateOrder': fit_skel.rotate_order[i]}
+        if node.isA('joint'):
+            values['jointOrient'] = fit_skel.joint_orient[i]
+        for flags in fit_skel.attr_defs[i]:
+            _addAttrFlags(node, flags)
+        values.update(fit_skel.attr_values[i])
+        for attr_name, value in values.items():
+            scene.setValue(scene.plug(node, attr_name), value)
+
+    return [node.name for node in nodes]
+
+
+@_command
+def internalVar(**kwargs):
+    path = os.path.join(tempfile.gettempdir(), 'as5utilStandIn', 'maya')
+
+    return path.replace('\\', '/') + '/'
+
+
+@_command
+def undoInfo(*args, **kwargs):
+    pass
+
+
+@_command
+def warning(message):
+    getScene().warnings.append(str(message))
+
+
+@_command
+def error(message):
+    raise RuntimeError(str(message))
+
+
+@_command
+def playbackOptions(**kwargs):
+    scene = getScene()
+    if _flag(kwargs, 'query', 'q'):
+        if _flag(kwargs, 'minTime', 'min'):
+            return scene.min_time
+        if _flag(kwargs, 'maxTime', 'max'):
+            return scene.max_time
+        return
+
+    min_time = _flag(kwargs, 'minTime', 'min')
+    max_time = _flag(kwargs, 'maxTime', 'max')
+    if min_time is not None:
+        scene.min_time = float(min_time)
+    if max_time is not None:
+        scene.max_time = float(max_time)
+
+
+@_command
+def currentTime(*args, **kwargs):
+    scene = getScene()
+    if _flag(kwargs, 'query', 'q'):
+        return scene.time
+    scene.time = float(args[0])
+
+    return scene.time
+
+
+# Nodes
+
+
+@_command
+def createNode(node_type, name=None, parent=None, skipSelect=False, **kwargs):
+    scene = getScene()
+    name = name or _flag(kwargs, 'n')
+    parent = parent or _flag(kwargs, 'p')
+    node = scene.createNode(node_type, name, _node(parent) if parent else None)
+    if not (skipSelect or _flag(kwargs, 'ss')):
+        scene.selection = [node]
+
+    return node.name
+
+
+@_command
+def shadingNode(node_type, **kwargs):
+    node = getScene().createNode(node_type, _flag(kwargs, 'name', 'n'))
+
+    return node.name
+
+
+@_command
+def objExists(name):
+    name = str(name)
+    if '.' in name:
+        return _component(name) is not None or getScene().parsePlug(name) is not None
+
+    return getScene().find(name) is not None
+
+
+@_command
+def objectType(name, isAType=None, isType=None, **kwargs):
+    node = _node(name)
+    base_type = isAType or _flag(kwargs, 'isa')
+    if base_type:
+        return node.isA(base_type)
+    if isType or _flag(kwargs, 'i'):
+        return node.type == (isType or kwargs['i'])
+
+    return node.type
+
+
+@_command
+def nodeType(name, **kwargs):
+    return _node(name).type
+
+
+@_command
+def ls(*args, **kwargs):
+    scene = getScene()
+    types = _flag(kwargs, 'type', 'typ')
+    types = [types] if isinstance(types, str) else types
+    exact = _flag(kwargs, 'exactType', 'et')
+    long_names = _flag(kwargs, 'long', 'l')
+    objects_only = _flag(kwargs, 'objectsOnly', 'o')
+
+    if _flag(kwargs, 'selection', 'sl'):
+        nodes = [item for item in scene.selection if not isinstance(item, tuple)]
+    elif args:
+        nodes, plugs = list(), list()
+        for name in _flatten(args):
+            if '.' in name:
+                if _component(name) is not None:
+                    plugs.append(name)
+                    continue
+                node_name, attr_name = name.split('.', 1)
+                for node in scene.match(node_name):
+                    try:
+                        plug = scene.plug(node, attr_name)
+                    except ValueError:
+                        continue
+                    if objects_only:
+                        nodes.append(node)
+                    else:
+                        plugs.append('{0}.{1}'.format(node.name, attr_name)
+                                     if plug.index is None or '[' in attr_name
+                                     else plug.name())
+            else:
+                nodes.extend(scene.match(name))
+        if plugs:
+            return plugs
+    else:
+        nodes = list(scene.nodes.values())
+
+    nodes = _uniqueResults(nodes)
+    if types:
+        nodes = [node for node in nodes if any(node.isA(type_name) for type_name in types)]
+    if exact:
+        nodes = [node for node in nodes if node.type == exact]
+
+    if _flag(kwargs, 'uuid'):
+        return [node.uuid for node in nodes]
+    names = [node.longName() if long_names else node.name for node in nodes]
+    if _flag(kwargs, 'showType', 'st'):
+        return [item for node, name in zip(nodes, names) for item in (name, node.type)]
+
+    return names
+
+
+@_command
+def listRelatives(*args, **kwargs):
+    scene = getScene()
+    nodes = [_node(name) for name in _flatten(args)] if args else \
+        [item for item in scene.selection if not isinstance(item, tuple)]
+    types = _flag(kwargs, 'type', 'typ')
+    types = [types] if isinstance(types, str) else types
+
+    result = list()
+    for node in nodes:
+        if _flag(kwargs, 'parent', 'p'):
+            result.extend([node.parent] if node.parent else list())
+        elif _flag(kwargs, 'allParents', 'ap'):
+            result.extend([node.parent] if node.parent else list())
+        elif _flag(kwargs, 'allDescendents', 'ad'):
+            result.extend(reversed(_descendants(node)))
+        elif _flag(kwargs, 'shapes', 's'):
+            result.extend(scene.shapes(node))
+        else:
+            result.extend(node.children)
+
+    result = _uniqueResults(result)
+    if types:
+        result = [node for node in result if any(node.isA(type_name) for type_name in types)]
+    if not result:
+        return
+
+    if _flag(kwargs, 'fullPath', 'f'):
+        return [node.longName() for node in result]
+
+    return [node.name for node in result]
+
+
+def _descendants(node):
+    # Depth-first, parents before children
+    nodes = list()
+    for child in node.children:
+        nodes.append(child)
+        nodes.extend(_descendants(child))
+
+    return nodes
+
+
+@_command
+def rename(old_name, new_name):
+    return getScene().rename(_node(old_name), new_name)
+
+
+@_command
+def delete(*args, **kwargs):
+    scene = getScene()
+    if not args:
+        names = [item.name for item in scene.selection if not isinstance(item, tuple)]
+    else:
+        names = _flatten(args)
+    for name in names:
+        node = scene.find(name)
+        if node is None:
+            raise ValueError('No object matches name: {}'.format(name))
+        scene.delete(node)
+
+
+@_command
+def select(*args, **kwargs):
+    scene = getScene()
+    if _flag(kwargs, 'clear', 'cl'):
+        scene.selection = list()
+        return
+
+    items = _items(args)
+    if _flag(kwargs, 'add', 'af'):
+        scene.selection += [item for item in items if item not in scene.selection]
+    elif _flag(kwargs, 'deselect', 'd'):
+        scene.selection = [item for item in scene.selection if item not in items]
+    else:
+        scene.selection = items
+
+
+@_command
+def parent(*args, **kwargs):
+    scene = getScene()
+    names = _flatten(args)
+    world = _flag(kwargs, 'world', 'w')
+    new_parent = None if world else _node(names.pop())
+    relative = _flag(kwargs, 'relative', 'r')
+
+    result = list()
+    for name in names:
+        node = _node(name)
+        if node.parent is new_parent:
+            raise RuntimeError("Object '{}' is already a child of the given parent.".format(
+                name) if new_parent else "Object '{}' is already a child of world.".format(name))
+        scene.setParent(node, new_parent, keep_world=not relative)
+        result.append(node.name)
+
+    return result
+
+
+@_command
+def group(*args, **kwargs):
+    scene = getScene()
+    name = _flag(kwargs, 'name', 'n') or 'group#'
+    parent_name = _flag(kwargs, 'parent', 'p')
+
+    if _flag(kwargs, 'empty', 'em') or not args:
+        grp = scene.createNode('transform', name,
+                               _node(parent_name) if parent_name else None)
+        return grp.name
+
+    nodes = [_node(item) for item in _flatten(args)]
+    grp_parent = None if _flag(kwargs, 'world', 'w') else nodes[0].parent
+    if parent_name:
+        grp_parent = _node(parent_name)
+    grp = scene.createNode('transform', name, grp_parent)
+    for node in nodes:
+        scene.setParent(node, grp)
+    scene.selection = [grp]
+
+    return grp.name
+
+
+@_command
+def joint(*args, **kwargs):
+    scene = getScene()
+    selected = [item for item in scene.selection
+                if not isinstance(item, tuple) and item.isA('joint')]
+    node = scene.createNode('joint', _flag(kwargs, 'name', 'n') or 'joint#',
+                            selected[-1] if selected else None)
+    position = _flag(kwargs, 'position', 'p')
+    if position is not None:
+        world = scene.worldMatrix(node).copy()
+        world[3, :3] = position
+        scene.setWorldMatrix(node, world, rotate=False, scale=False)
+    scene.selection = [node]
+
+    return node.name
+
+
+@_command
+def curve(**kwargs):
+    scene = getScene()
+    points = np.array(_flag(kwargs, 'point', 'p'), dtype=float).reshape(-1, 3)
+    xform = scene.createNode('transform', _flag(kwargs, 'name', 'n') or 'curve#')
+    shape = scene.createNode('nurbsCurve', xform.name + 'Shape', xform)
+    shape.data['cvs'] = points
+    shape.data['degree'] = int(_flag(kwargs, 'degree', 'd', default=3))
+    shape.data['knots'] = list(_flag(kwargs, 'knot', 'k', default=list()))
+    scene.selection = [xform]
+
+    return xform.name
+
+
+@_command
+def spaceLocator(**kwargs):
+    scene = getScene()
+    xform = scene.createNode('transform', _flag(kwargs, 'name', 'n') or 'locator#')
+    scene.createNode('locator', xform.name + 'Shape', xform)
+    scene.selection = [xform]
+
+    return [xform.name]
+
+
+@_command
+def polyCube(**kwargs):
+    """Unit cube mesh, for tests and character stand-ins."""
+
+    scene = getScene()
+    xform = scene.createNode('transform', _flag(kwargs, 'name', 'n') or 'pCube#')
+    shape = scene.createNode('mesh', xform.name + 'Shape', xform)
+    shape.data['points'] = np.array([[x, y, z] for x in (-0.5, 0.5)
+                                     for y in (-0.5, 0.5) for z in (-0.5, 0.5)])
+
+    return [xform.name]
+
+
+# Attributes
+
+
+@_command
+def getAttr(plug_name, **kwargs):
+    scene = getScene()
+    plug = _plug(plug_name)
+    spec = plug.spec
+
+    if _flag(kwargs, 'lock', 'l'):
+        return plug.node.isLocked(spec)
+    if _flag(kwargs, 'keyable', 'k'):
+        return plug.node.isKeyable(spec)
+    if _flag(kwargs, 'type'):
+        return _typeName(spec)
+
+    value = scene.getValue(plug, _flag(kwargs, 'time', 't'))
+    if spec.kind == 'compound':
+        return [tuple(value)]
+    if spec.kind == 'matrix':
+        return [float(item) for item in np.ravel(value)]
+    if spec.kind == 'enum' and _flag(kwargs, 'asString', 'asString'):
+        return spec.enum_names[value]
+
+    return value
+
+
+def _typeName(spec):
+    if spec.kind == 'compound':
+        return 'double3'
+    if spec.kind == 'time':
+        return 'time'
+
+    return spec.kind
+
+
+@_command
+def setAttr(plug_name, *values, **kwargs):
+    scene = getScene()
+    match = _RANGE.match(str(plug_name))
+    if match and match.group(2) in ('ktv', 'keyTimeValue'):
+        curve_node = _node(match.group(1))
+        for time, value in zip(values[::2], values[1::2]):
+            scene.setKey(curve_node, time, value)
+        return
+
+    plug = _plug(plug_name)
+    lock = _flag(kwargs, 'lock', 'l')
+    keyable = _flag(kwargs, 'keyable', 'k')
+    if keyable is not None:
+        scene.setKeyable(plug, keyable)
+    if lock is False:
+        scene.setLock(plug, False)
+
+    if values:
+        data_type = _flag(kwargs, 'type', 'typ')
+        if data_type == 'stringArray':
+            value = [str(item) for item in values[1:]]
+        elif data_type == 'doubleArray':
+            value = [float(item) for item in values[0]]
+        elif plug.spec.kind == 'compound' or data_type in ('double3', 'float3'):
+            value = [float(item) for item in _flatten_values(values)]
+        elif data_type == 'matrix':
+            value = np.reshape(np.array(_flatten_values(values), dtype=float), (4, 4))
+        else:
+            value = values[0]
+        scene.setValue(plug, value)
+
+    if lock:
+        scene.setLock(plug, True)
+
+
+def _flatten_values(values):
+    items = list()
+    for value in values:
+        if isinstance(value, (list, tuple, np.ndarray)):
+            items.extend(_flatten_values(value))
+        else:
+            items.append(value)
+
+    return items
+
+
+@_command
+def addAttr(*args, **kwargs):
+    scene = getScene()
+    target = str(args[0]) if args else None
+
+    if _flag(kwargs, 'query', 'q'):
+        spec = _plug(target).spec if '.' in target else \
+            _node(target).spec(_flag(kwargs, 'longName', 'ln', 'attribute'))
+        if _flag(kwargs, 'enumName', 'en'):
+            return ':'.join(spec.enum_names or list())
+        if _flag(kwargs, 'exists', 'ex'):
+            return spec is not None
+        if _flag(kwargs, 'defaultValue', 'dv'):
+            return spec.default
+        return
+
+    if _flag(kwargs, 'edit', 'e'):
+        plug = _plug(target)
+        enum_names = _flag(kwargs, 'enumName', 'en')
+        if enum_names is not None:
+            plug.spec.enum_names = _enumNames(enum_names)
+        scene.dirty()
+        return
+
+    _addAttrFlags(_node(target), kwargs)
+
+
+def _addAttrFlags(node, flags):
+    # Adds a dynamic attribute from addAttr flags (long or short names)
+    scene = getScene()
+    long_name = _flag(flags, 'longName', 'ln')
+    short_name = _flag(flags, 'shortName', 'sn') or long_name
+    long_name = long_name or short_name
+    type_name = _flag(flags, 'attributeType', 'at') or _flag(flags, 'dataType', 'dt') or 'double'
+    kind = _ATTR_KINDS.get(type_name, 'double')
+    default = _flag(flags, 'defaultValue', 'dv')
+    if default is None:
+        default = _DEFAULTS.get(kind, 0.0)
+    enum_names = _flag(flags, 'enumName', 'en')
+    parent = _flag(flags, 'parent', 'p')
+
+    scene.addAttr(node, AttrSpec(
+        long_name, short_name, kind, default,
+        keyable=bool(_flag(flags, 'keyable', 'k')),
+        parent=parent, array=bool(_flag(flags, 'multi', 'm')),
+        enum_names=_enumNames(enum_names) if kind == 'enum' else None))
+
+
+def _enumNames(enum_string):
+    return [item.split('=')[0] for item in str(enum_string or '').split(':') if item]
+
+
+@_command
+def attributeQuery(attr_name, **kwargs):
+    node = _node(_flag(kwargs, 'node', 'n'))
+    spec = node.spec(attr_name)
+    if _flag(kwargs, 'exists', 'ex'):
+        return spec is not None
+    if spec is None:
+        raise RuntimeError("No attribute '{0}.{1}'.".format(node.name, attr_name))
+    if _flag(kwargs, 'listEnum', 'le'):
+        return [':'.join(spec.enum_names or list())]
+    if _flag(kwargs, 'keyable', 'k'):
+        return node.isKeyable(spec)
+    if _flag(kwargs, 'attributeType', 'at'):
+        return _typeName(spec)
+
+
+@_command
+def deleteAttr(*args, **kwargs):
+    attr_name = _flag(kwargs, 'attribute', 'at')
+    target = str(args[0])
+    if attr_name is None:
+        target, attr_name = target.split('.', 1)
+    getScene().deleteAttr(_node(target), attr_name)
+
+
+@_command
+def connectAttr(src, dst, force=False, **kwargs):
+    scene = getScene()
+    src_plug, dst_plug = _plug(src), _plug(dst)
+    if dst_plug in scene.inputs and not (force or _flag(kwargs, 'f')):
+        raise RuntimeError("'{0}' is already connected to '{1}'.".format(
+            scene.inputs[dst_plug].name(), dst_plug.name()))
+    scene.connect(src_plug, dst_plug)
+
+
+@_command
+def disconnectAttr(src, dst, **kwargs):
+    getScene().disconnect(_plug(src), _plug(dst))
+
+
+@_command
+def isConnected(src, dst, **kwargs):
+    return getScene().inputs.get(_plug(dst)) == _plug(src)
+
+
+@_command
+def listConnections(*args, **kwargs):
+    scene = getScene()
+    source = _flag(kwargs, 'source', 's', default=True)
+    destination = _flag(kwargs, 'destination', 'd', default=True)
+    plugs = _flag(kwargs, 'plugs', 'p')
+    connections = _flag(kwargs, 'connections', 'c')
+    node_type = _flag(kwargs, 'type', 't')
+
+    result = list()
+    for name in _flatten(args):
+        if '.' in name:
+            query = _plug(name)
+            match = lambda plug: plug.node is query.node and \
+                (plug.spec is query.spec or plug.spec.parent == query.spec.name) and \
+                (query.index is None or plug.index == query.index)
+            node = query.node
+        else:
+            node = _node(name)
+            match = lambda plug: plug.node is node
+
+        node_connections = scene.connections(node)
+        pairs = list()
+        if source:
+            pairs += [(dst, src) for src, dst in node_connections if match(dst)]
+        if destination:
+            pairs += [(src, dst) for src, dst in node_connections if match(src)]
+        for own, other in pairs:
+            if node_type and not other.node.isA(node_type):
+                continue
+            if connections:
+                result.append(own.name() if '.' not in name else name)
+            result.append(other.name() if plugs else other.node.name)
+
+    return result or None
+
+
+# Transforms
+
+
+def _worldPivot(node):
+    scene = getScene()
+    if node.isA('transform') and not node.isA('joint'):
+        return matrix.transformPoints(np.array(scene.channel(node, 'rotatePivot')),
+                                      scene.worldMatrix(node))
+
+    return scene.worldMatrix(node)[3, :3]
+
+
+@_command
+def xform(*args, **kwargs):
+    scene = getScene()
+    query = _flag(kwargs, 'query', 'q')
+    world = _flag(kwargs, 'worldSpace', 'ws')
+    translation = _flag(kwargs, 'translation', 't')
+    rotation = _flag(kwargs, 'rotation', 'ro')
+    scale = _flag(kwargs, 'scale', 's')
+    mat = _flag(kwargs, 'matrix', 'm')
+    items = _items(args) if args else list(scene.selection)
+
+    if query:
+        if translation:
+            values = list()
+            for item in items:
+                if isinstance(item, tuple):
+                    values.extend(np.ravel(_worldPoints(*item)))
+                elif world:
+                    values.extend(scene.worldMatrix(item)[3, :3])
+                else:
+                    values.extend(scene.channel(item, 'translate'))
+            return [float(value) for value in values]
+        node = items[0]
+        if _flag(kwargs, 'rotatePivot', 'rp'):
+            if world:
+                return [float(value) for value in _worldPivot(node)]
+            return list(scene.channel(node, 'rotatePivot'))
+        if rotation:
+            if not world:
+                return list(scene.channel(node, 'rotate'))
+            return [float(value) for value in matrix.matrixToEuler(
+                matrix.rotationPart(scene.worldMatrix(node)),
+                scene.channel(node, 'rotateOrder'))]
+        if scale:
+            mat = scene.worldMatrix(node) if world else scene.localMatrix(node)
+            return [float(value) for value in np.linalg.norm(mat[:3, :3], axis=-1)]
+        if mat:
+            mat = scene.worldMatrix(node) if world else scene.localMatrix(node)
+            return [float(value) for value in np.ravel(mat)]
+        return
+
+    for node in items:
+        if _flag(kwargs, 'centerPivots', 'cp'):
+            _centerPivots(node)
+            continue
+        relative = _flag(kwargs, 'relative', 'r')
+        if mat is not None:
+            mat = np.reshape(np.array(mat, dtype=float), (4, 4))
+            if world:
+                scene.setWorldMatrix(node, mat)
+            else:
+                scene.setWorldMatrix(node, np.matmul(mat, scene.parentMatrix(node)))
+        if translation is not None:
+            if world:
+                world_mat = scene.worldMatrix(node).copy()
+                world_mat[3, :3] = np.add(world_mat[3, :3], translation) if relative \
+                    else translation
+                scene.setWorldMatrix(node, world_mat, rotate=False, scale=False)
+            else:
+                current = scene.channel(node, 'translate')
+                scene.setValue(scene.plug(node, 'translate'),
+                               np.add(current, translation) if relative else translation)
+        if rotation is not None:
+            if world:
+                world_mat = scene.worldMatrix(node).copy()
+                world_mat[:3, :3] = matrix.eulerToMatrix(
+                    rotation, scene.channel(node, 'rotateOrder')) * \
+                    np.linalg.norm(world_mat[:3, :3], axis=-1)[:, np.newaxis]
+                scene.setWorldMatrix(node, world_mat, translate=False, scale=False)
+            else:
+                scene.setValue(scene.plug(node, 'rotate'), rotation)
+        if scale is not None:
+            scene.setValue(scene.plug(node, 'scale'), scale)
+
+
+def _centerPivots(node):
+    # Moves the rotate and scale pivots to the bounding box center of the
+    # shapes, compensating with rotatePivotTranslate so nothing moves
+    scene = getScene()
+    points = [_pointsOf(shape) for shape in scene.shapes(node)
+              if 'points' in shape.data or 'cvs' in shape.data]
+    if not points:
+        return
+    points = np.concatenate(points)
+    center = (points.min(axis=0) + points.max(axis=0)) / 2.0
+
+    old_pivot = np.array(scene.channel(node, 'rotatePivot'))
+    rot = np.matmul(matrix.eulerToMatrix(scene.channel(node, 'rotateAxis')),
+                    matrix.eulerToMatrix(scene.channel(node, 'rotate'),
+                                         scene.channel(node, 'rotateOrder')))
+    delta = center - old_pivot
+    offset = np.array(scene.channel(node, 'rotatePivotTranslate')) + \
+        matrix.transformVectors(delta, rot) - delta
+    for attr_name, value in [('rotatePivot', center), ('scalePivot', center),
+                             ('rotatePivotTranslate', offset)]:
+        scene.setValue(scene.plug(node, attr_name), value)
+
+
+def _moveArgs(args, kwargs):
+    # Splits move/rotate arguments into (values, nodes)
+    values, names = list(), list()
+    for arg in args:
+        if isinstance(arg, (int, float, np.floating, np.integer)):
+            values.append(float(arg))
+        else:
+            names.append(arg)
+    nodes = _items(names) if names else list(getScene().selection)
+    axes = [i for i, axis in enumerate('xyz') if kwargs.get(axis)]
+
+    return values, nodes, axes
+
+
+def _keepChildren(node):
+    # World matrices of the transform children of `node`, to restore
+    scene = getScene()
+    return [(child, scene.worldMatrix(child)) for child in node.children
+            if child.isA('transform') and not child.isA('constraint')]
+
+
+@_command
+def move(*args, **kwargs):
+    scene = getScene()
+    values, nodes, axes = _moveArgs(args, kwargs)
+    relative = _flag(kwargs, 'relative', 'r')
+    keep_children = _flag(kwargs, 'preserveChildPosition', 'pcp')
+
+    for node in nodes:
+        children = _keepChildren(node) if keep_children else list()
+        world_mat = scene.worldMatrix(node).copy()
+        pivot = _worldPivot(node)
+        target = pivot.copy()
+        for i, axis in enumerate(axes or range(3)):
+            target[axis] = pivot[axis] + values[i] if relative else values[i]
+        world_mat[3, :3] += target - pivot
+        scene.setWorldMatrix(node, world_mat, rotate=False, scale=False)
+        for child, child_mat in children:
+            scene.setWorldMatrix(child, child_mat)
+
+
+@_command
+def rotate(*args, **kwargs):
+    scene = getScene()
+    values, nodes, axes = _moveArgs(args, kwargs)
+    angles = np.zeros(3)
+    for i, axis in enumerate(axes or range(3)):
+        angles[axis] = values[i]
+    delta = matrix.eulerToMatrix(angles)
+
+    for node in nodes:
+        world_mat = scene.worldMatrix(node).copy()
+        rot = matrix.rotationPart(world_mat)
+        scale = np.linalg.norm(world_mat[:3, :3], axis=-1)[:, np.newaxis]
+        if _flag(kwargs, 'relative', 'r'):
+            rot = np.matmul(delta, rot) if _flag(kwargs, 'objectSpace', 'os') else \
+                np.matmul(rot, delta)
+        else:
+            rot = delta
+        world_mat[:3, :3] = rot * scale
+        scene.setWorldMatrix(node, world_mat, translate=False, scale=False)
+
+
+@_command
+def makeIdentity(*args, **kwargs):
+    scene = getScene()
+    for node in _items(args) if args else list(scene.selection):
+        if _flag(kwargs, 'apply', 'a'):
+            # Frozen transforms keep their children in place
+            children = _keepChildren(node)
+            _freeze(node)
+            for child, child_mat in children:
+                scene.setWorldMatrix(child, child_mat)
+            continue
+        for attr_name, value in [('translate', (0, 0, 0)), ('rotate', (0, 0, 0)),
+                                 ('scale', (1, 1, 1))]:
+            plug = scene.plug(node, attr_name)
+            if not node.isLocked(plug.spec) and plug not in scene.inputs:
+                scene.setValue(plug, value)
+
+
+def _freeze(node):
+    scene = getScene()
+    local = scene.localMatrix(node)
+    if node.isA('joint'):
+        rot = matrix.rotationPart(local)
+        scene.setValue(scene.plug(node, 'jointOrient'), matrix.matrixToEuler(rot))
+        for attr_name in 'rotate', 'rotateAxis':
+            scene.setValue(scene.plug(node, attr_name), (0, 0, 0))
+        scene.setValue(scene.plug(node, 'scale'), (1, 1, 1))
+        return
+
+    bake = local.copy()
+    bake[3, :3] = 0.0
+    for shape in scene.shapes(node):
+        key = 'points' if shape.isA('mesh') else 'cvs'
+        if key in shape.data:
+            shape.data[key] = matrix.transformPoints(shape.data[key], bake)
+    scene.setValue(scene.plug(node, 'rotate'), (0, 0, 0))
+    scene.setValue(scene.plug(node, 'scale'), (1, 1, 1))
+    scene.dirty()
+
+
+# Constraints
+
+
+def _constrain(kind, args, kwargs):
+    scene = getScene()
+    names = _flatten(args)
+
+    if _flag(kwargs, 'query', 'q'):
+        cons = _node(names[0])
+        if not cons.isA('constraint'):
+            cons = [child for child in cons.children
+                    if child.type == kind + 'Constraint'][0]
+        live = [i for i, target in enumerate(cons.data['targets']) if target.alive]
+        if _flag(kwargs, 'targetList', 'tl'):
+            return [cons.data['targets'][i].name for i in live] or None
+        if _flag(kwargs, 'weightAliasList', 'wal'):
+            return [cons.data['weights'][i] for i in live] or None
+        return
+
+    targets = [_node(name) for name in names[:-1]]
+    driven = _node(names[-1])
+    existing = [child for child in driven.children if child.type == kind + 'Constraint']
+    if existing:
+        cons = existing[0]
+    else:
+        cons = scene.createNode(kind + 'Constraint',
+                                _flag(kwargs, 'name', 'n') or
+                                '{0}_{1}Constraint1'.format(driven.name, kind), driven)
+        cons.data.update({'kind': kind, 'driven': driven, 'targets': list(),
+                          'weights': list(), 'offsets': list(), 'indices': list()})
+        _connectConstraint(cons, driven, kind, kwargs)
+        for flag, attr_name in [(('aimVector', 'aim'), 'aimVector'),
+                                (('upVector', 'u'), 'upVector'),
+                                (('worldUpVector', 'wu'), 'worldUpVector')]:
+            value = _flag(kwargs, *flag)
+            if value is not None:
+                scene.setValue(scene.plug(cons, attr_name), value)
+        up_type = _flag(kwargs, 'worldUpType', 'wut')
+        if up_type is not None:
+            scene.setValue(scene.plug(cons, 'worldUpType'),
+                           cons.spec('worldUpType').enum_names.index(up_type))
+        up_object = _flag(kwargs, 'worldUpObject', 'wuo')
+        if up_object:
+            cons.data['up_object'] = _node(up_object)
+
+    if _flag(kwargs, 'remove', 'rm'):
+        for target in targets:
+            if target in cons.data['targets']:
+                index = cons.data['targets'].index(target)
+                scene.deleteAttr(cons, cons.data['weights'][index])
+                for key in 'targets', 'weights', 'offsets', 'indices':
+                    del cons.data[key][index]
+        scene.dirty()
+        return
+
+    keep_offset = _flag(kwargs, 'maintainOffset', 'mo')
+    weight = float(_flag(kwargs, 'weight', 'w', default=1.0))
+    driven_mat = scene.worldMatrix(driven)
+    for target in targets:
+        if target in cons.data['targets']:
+            continue
+        offset = np.identity(4)
+        if keep_offset:
+            target_mat = scene.worldMatrix(target)
+            if kind == 'point':
+                offset[3, :3] = driven_mat[3, :3] - target_mat[3, :3]
+            else:
+                rigid = lambda mat: matrix.composeMatrix(matrix.translationPart(mat),
+                                                         matrix.rotationPart(mat))
+                offset = np.matmul(rigid(driven_mat), np.linalg.inv(rigid(target_mat)))
+                if kind == 'orient':
+                    offset[3, :3] = 0.0
+        # As in Maya, a new target takes the lowest free index, reusing
+        # those of removed targets, and targets are listed in index order
+        indices = cons.data['indices']
+        index = min(set(range(len(indices) + 1)) - set(indices))
+        position = len([i for i in indices if i < index])
+        weight_name = '{0}W{1}'.format(target.name, index)
+        scene.addAttr(cons, AttrSpec(weight_name, 'w{}'.format(index),
+                                     'double', weight, keyable=True))
+        for key, value in [('targets', target), ('weights', weight_name),
+                           ('offsets', offset), ('indices', index)]:
+            cons.data[key].insert(position, value)
+    scene.dirty()
+
+    return [cons.name]
+
+
+def _connectConstraint(cons, driven, kind, kwargs):
+    scene = getScene()
+    skip_translate = _axes(_flag(kwargs, 'skipTranslate', 'st'))
+    skip_rotate = _axes(_flag(kwargs, 'skipRotate', 'sr'))
+    channels = list()
+    if kind in ('parent', 'point'):
+        channels += [('constraintTranslate' + axis, attr_name)
+                     for axis, attr_name in zip('XYZ', _TRANSLATE) if axis not in skip_translate]
+    if kind in ('parent', 'orient', 'aim'):
+        channels += [('constraintRotate' + axis, attr_name)
+                     for axis, attr_name in zip('XYZ', _ROTATE) if axis not in skip_rotate]
+    for src, dst in channels:
+        scene.connect(scene.plug(cons, src), scene.plug(driven, dst))
+
+
+def _axes(flag):
+    if not flag:
+        return set()
+    if isinstance(flag, str):
+        flag = [flag]
+
+    return set(axis.upper() for axis in flag)
+
+
+@_command
+def parentConstraint(*args, **kwargs):
+    return _constrain('parent', args, kwargs)
+
+
+@_command
+def pointConstraint(*args, **kwargs):
+    return _constrain('point', args, kwargs)
+
+
+@_command
+def orientConstraint(*args, **kwargs):
+    return _constrain('orient', args, kwargs)
+
+
+@_command
+def aimConstraint(*args, **kwargs):
+    return _constrain('aim', args, kwargs)
+
+
+# Sets and layers
+
+
+@_command
+def sets(*args, **kwargs):
+    scene = getScene()
+    if _flag(kwargs, 'query', 'q'):
+        return _memberNames(scene.members(_node(args[0]))) or None
+
+    for flag in 'addElement', 'add', 'include', 'in', 'forceElement', 'fe':
+        if flag in kwargs:
+            scene.addMembers(_node(kwargs[flag]), _items(args))
+            return
+    for flag in 'remove', 'rm':
+        if flag in kwargs:
+            obj_set = _node(kwargs[flag])
+            items = _items(args)
+            obj_set.data['members'] = [member for member in obj_set.data['members']
+                                       if member not in items]
+            return
+    for flag in 'clear', 'cl':
+        if flag in kwargs:
+            _node(kwargs[flag]).data['members'] = list()
+            return
+
+    obj_set = scene.createNode('objectSet', _flag(kwargs, 'name', 'n') or 'set#')
+    if not _flag(kwargs, 'empty', 'em'):
+        scene.addMembers(obj_set, _items(args) if args else list(scene.selection))
+
+    return obj_set.name
+
+
+@_command
+def createDisplayLayer(*args, **kwargs):
+    scene = getScene()
+    layer = scene.createNode('displayLayer', _flag(kwargs, 'name', 'n') or 'layer#')
+    if not _flag(kwargs, 'empty', 'e'):
+        scene.addMembers(layer, _items(args) if args else
+                         [item for item in scene.selection if not isinstance(item, tuple)])
+
+    return layer.name
+
+
+@_command
+def editDisplayLayerMembers(layer, *args, **kwargs):
+    getScene().addMembers(_node(layer), _items(args))
+
+
+# Animation
+
+
+def _curveOf(plug):
+    src = getScene().inputs.get(plug)
+    if src is not None and src.node.isA('animCurve'):
+        return src.node
+
+
+def _keyPlugs(names, kwargs):
+    scene = getScene()
+    attributes = _flag(kwargs, 'attribute', 'at')
+    if isinstance(attributes, str):
+        attributes = [attributes]
+
+    plugs = list()
+    for name in _flatten(names):
+        if '.' in name:
+            plug = _plug(name)
+            plugs.extend([scene.plug(plug.node, child) for child in plug.spec.children]
+                         or [plug])
+            continue
+        node = _node(name)
+        specs = [node.spec(attr_name) for attr_name in attributes] if attributes else \
+            [spec for spec in node.specs() if node.isKeyable(spec)]
+        for spec in specs:
+            if spec.kind == 'compound':
+                plugs.extend(scene.plug(node, child) for child in spec.children)
+            elif spec.kind != 'message':
+                plugs.append(Plug(node, spec))
+
+    return plugs
+
+
+@_command
+def setKeyframe(*args, **kwargs):
+    # Maya keys a channel driven by a constraint through a pairBlend that
+    # keeps the constraint in control; here the channel is left alone
+    scene = getScene()
+    time = float(_flag(kwargs, 'time', 't', default=scene.time))
+    count = 0
+    for plug in _keyPlugs(args or [item.name for item in scene.selection], kwargs):
+        if plug.node.isLocked(plug.spec):
+            continue
+        if plug in scene.inputs and _curveOf(plug) is None:
+            continue
+        value = _flag(kwargs, 'value', 'v')
+        value = scene.getValue(plug, time) if value is None else value
+        curve_node = _curveOf(plug)
+        if curve_node is None:
+            curve_type = {'doubleLinear': 'animCurveTL',
+                          'doubleAngle': 'animCurveTA'}.get(plug.spec.kind, 'animCurveTU')
+            curve_node = scene.createNode(curve_type, '{0}_{1}'.format(plug.node.name,
+                                                                       plug.spec.name))
+            scene.connect(scene.plug(curve_node, 'output'), plug)
+        scene.setKey(curve_node, time, value)
+        count += 1
+
+    return count
+
+
+@_command
+def keyframe(*args, **kwargs):
+    times = list()
+    for plug in _keyPlugs(args, kwargs):
+        curve_node = _curveOf(plug)
+        if curve_node is not None:
+            times.extend(sorted(curve_node.data['keys']))
+    if _flag(kwargs, 'query', 'q') and _flag(kwargs, 'keyframeCount', 'kc'):
+        return len(times)
+
+    return times or None
+
+
+@_command
+def cutKey(*args, **kwargs):
+    scene = getScene()
+    time_range = _flag(kwargs, 'time', 't')
+    for plug in _keyPlugs(args, kwargs):
+        curve_node = _curveOf(plug)
+        if curve_node is None:
+            continue
+        keys = curve_node.data['keys']
+        for time in list(keys):
+            if time_range is None or time_range[0] <= time <= time_range[1]:
+                del keys[time]
+                curve_node.data['step'].discard(time)
+        if not keys:
+            scene.delete(curve_node)
+        scene.dirty()
+
+
+@_command
+def keyTangent(*args, **kwargs):
+    time_range = _flag(kwargs, 'time', 't')
+    step = _flag(kwargs, 'outTangentType', 'ott') == 'step'
+    for plug in _keyPlugs(args, kwargs):
+        curve_node = _curveOf(plug)
+        if curve_node is None:
+            continue
+        for time in curve_node.data['keys']:
+            if time_range is None or time_range[0] <= time <= time_range[1]:
+                if step:
+                    curve_node.data['step'].add(time)
+                else:
+                    curve_node.data['step'].discard(time)
+    getScene().dirty()
+
+
+def getAnimCurveKeys(curve_name):
+    """Returns the (times, values) of an animation curve, sorted by time."""
+
+    keys = _node(curve_name).data['keys']
+    times = sorted(keys)
+
+    return times, [keys[time] for time in times]
+
+
+def isTypeName(node_type, base_type):
+    return isType(node_type, base_type)
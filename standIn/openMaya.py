@@ -0,0 +1,782 @@
+"""
+Stand-in for maya.api.OpenMaya, backed by the in-memory scene.
+
+Covers selection lists, dependency node and plug access, unit and matrix
+data and the scene messages used by as5util.  As in Maya, plugs return
+angles in radians through asDouble and in any unit through asMAngle.
+"""
+import math
+import numpy as np
+
+from . import scene as _scene
+from .cmds import _component, componentName
+from .scene import Plug, getScene
+
+
+class MFn(object):
+    kInvalid = 0
+    kDependencyNode = 4
+    kDagNode = 107
+    kTransform = 110
+    kJoint = 121
+    kMesh = 296
+    kNurbsCurve = 267
+    kSet = 459
+    kAnimCurve = 7
+    kAttribute = 554
+    kNumericAttribute = 566
+    kUnitAttribute = 571
+    kEnumAttribute = 568
+    kTypedAttribute = 575
+    kMessageAttribute = 572
+    kCompoundAttribute = 564
+    kMatrixAttribute = 570
+    kComponent = 524
+    kMeshVertComponent = 550
+    kCurveCVComponent = 533
+
+
+_NODE_FNS = [('dagNode', MFn.kDagNode), ('transform', MFn.kTransform),
+             ('joint', MFn.kJoint), ('mesh', MFn.kMesh), ('nurbsCurve', MFn.kNurbsCurve),
+             ('objectSet', MFn.kSet), ('animCurve', MFn.kAnimCurve)]
+_UNIT_KINDS = {'doubleLinear': 'distance', 'doubleAngle': 'angle', 'time': 'time'}
+_NUMERIC_KINDS = ('double', 'bool', 'long')
+
+
+class MObject(object):
+    """Handle to a node, an attribute of a node or a component."""
+
+    kNullObj = None
+
+    def __init__(self, node=None, spec=None, component=None):
+        self._node = node
+        self._spec = spec
+        self._component = component
+
+    def __eq__(self, other):
+        return isinstance(other, MObject) and (self._node, self._spec, self._component) == \
+            (other._node, other._spec, other._component)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self._node), id(self._spec)))
+
+    def isNull(self):
+        return self._node is None and self._spec is None and self._component is None
+
+    def apiType(self):
+        fns = self._fns()
+        return fns[-1] if fns else MFn.kInvalid
+
+    def hasFn(self, fn):
+        return fn in self._fns()
+
+    def _fns(self):
+        if self._component is not None:
+            return [MFn.kComponent, MFn.kMeshVertComponent
+                    if self._component[0].isA('mesh') else MFn.kCurveCVComponent]
+        if self._spec is not None:
+            kind = self._spec.kind
+            fns = [MFn.kAttribute]
+            if kind in _UNIT_KINDS:
+                fns.append(MFn.kUnitAttribute)
+            elif kind == 'enum':
+                fns.append(MFn.kEnumAttribute)
+            elif kind in _NUMERIC_KINDS:
+                fns.append(MFn.kNumericAttribute)
+            elif kind == 'message':
+                fns.append(MFn.kMessageAttribute)
+            elif kind == 'compound':
+                fns.append(MFn.kCompoundAttribute)
+            elif kind == 'matrix':
+                fns.append(MFn.kMatrixAttribute)
+            else:
+                fns.append(MFn.kTypedAttribute)
+            return fns
+        if self._node is not None:
+            return [MFn.kDependencyNode] + [fn for type_name, fn in _NODE_FNS
+                                            if self._node.isA(type_name)]
+
+        return list()
+
+
+MObject.kNullObj = MObject()
+
+
+class MDagPath(object):
+
+    def __init__(self, node=None):
+        self._node = node
+
+    def node(self):
+        return MObject(self._node)
+
+    def fullPathName(self):
+        return self._node.longName()
+
+    def partialPathName(self):
+        return self._node.name
+
+    def isValid(self):
+        return self._node is not None and self._node.alive
+
+    def hasFn(self, fn):
+        return self.node().hasFn(fn)
+
+    def inclusiveMatrix(self):
+        return MMatrix(getScene().worldMatrix(self._node))
+
+
+class MSelectionList(object):
+    """Nodes, plugs and components, added by name or wildcard pattern."""
+
+    def __init__(self):
+        self._items = list()
+
+    def add(self, item):
+        if isinstance(item, MObject):
+            self._items.append(('node', item._node))
+            return self
+        name = str(item)
+        scn = getScene()
+        if '.' in name:
+            component = _component(name)
+            if component is not None:
+                self._items.append(('component', component))
+                return self
+            plug = scn.parsePlug(name)
+            if plug is None:
+                raise RuntimeError('(kInvalidParameter): Object does not exist')
+            self._items.append(('plug', plug))
+            return self
+        nodes = scn.match(name)
+        if not nodes:
+            raise RuntimeError('(kInvalidParameter): Object does not exist')
+        self._items.extend(('node', node) for node in nodes)
+
+        return self
+
+    def clear(self):
+        self._items = list()
+
+    def length(self):
+        return len(self._items)
+
+    def isEmpty(self):
+        return not self._items
+
+    def _item(self, index):
+        if index >= len(self._items):
+            raise IndexError('(kInvalidParameter): Index not within range')
+        return self._items[index]
+
+    def _node(self, index):
+        kind, item = self._item(index)
+        if kind == 'plug':
+            return item.node
+        if kind == 'component':
+            return item[0]
+
+        return item
+
+    def getDependNode(self, index):
+        return MObject(self._node(index))
+
+    def getDagPath(self, index):
+        node = self._node(index)
+        if not node.is_dag:
+            raise TypeError('(kInvalidParameter): Object is not a DAG node')
+
+        return MDagPath(node)
+
+    def getComponent(self, index):
+        kind, item = self._item(index)
+        if kind == 'component':
+            return MDagPath(item[0]), MObject(component=item)
+
+        return self.getDagPath(index), MObject()
+
+    def getPlug(self, index):
+        kind, item = self._item(index)
+        if kind != 'plug':
+            raise TypeError('(kInvalidParameter): Item is not a plug')
+
+        return MPlug(item)
+
+    def getSelectionStrings(self, index=None):
+        items = self._items if index is None else [self._item(index)]
+        strings = list()
+        for kind, item in items:
+            if kind == 'plug':
+                strings.append(item.name())
+            elif kind == 'component':
+                strings.extend(componentName(*item))
+            else:
+                strings.append(item.name)
+
+        return strings
+
+
+class MFnDependencyNode(object):
+
+    def __init__(self, obj=None):
+        self._node = obj._node if obj is not None else None
+
+    @property
+    def typeName(self):
+        return self._node.type
+
+    def name(self):
+        return self._node.name
+
+    def absoluteName(self):
+        return ':' + self._node.name
+
+    def attributeCount(self):
+        return len(self._node.specs())
+
+    def attribute(self, index):
+        if isinstance(index, str):
+            spec = self._node.spec(index)
+        else:
+            spec = self._node.specs()[index]
+
+        return MObject(self._node, spec)
+
+    def hasAttribute(self, attr_name):
+        return self._node.spec(attr_name) is not None
+
+    def findPlug(self, attr, want_networked_plug=False):
+        spec = self._node.spec(attr) if isinstance(attr, str) else attr._spec
+        if spec is None:
+            raise RuntimeError('(kInvalidParameter): Cannot find attribute')
+
+        return MPlug(Plug(self._node, spec))
+
+
+class MPlug(object):
+    """Plug of a node attribute, optionally an element of an array."""
+
+    def __init__(self, obj=None, attribute=None):
+        if isinstance(obj, Plug):
+            self._plug = obj
+        elif obj is not None:
+            self._plug = Plug(obj._node, attribute._spec)
+        else:
+            self._plug = None
+
+    def __eq__(self, other):
+        return isinstance(other, MPlug) and self._plug == other._plug
+
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def isNull(self):
+        return self._plug is None
+
+    @property
+    def isArray(self):
+        return self._plug.spec.array and self._plug.index is None
+
+    @property
+    def isElement(self):
+        return self._plug.index is not None
+
+    @property
+    def isCompound(self):
+        return self._plug.spec.kind == 'compound'
+
+    @property
+    def isChild(self):
+        return self._plug.spec.parent is not None
+
+    @property
+    def isLocked(self):
+        return self._plug.node.isLocked(self._plug.spec)
+
+    @property
+    def isKeyable(self):
+        return self._plug.node.isKeyable(self._plug.spec)
+
+    @property
+    def isDestination(self):
+        return self._plug in getScene().inputs
+
+    def source(self):
+        src = getScene().inputs.get(self._plug)
+        return MPlug(src) if src is not None else MPlug()
+
+    def numChildren(self):
+        return len(self._plug.spec.children)
+
+    def parent(self):
+        node = self._plug.node
+        return MPlug(Plug(node, node.spec(self._plug.spec.parent), self._plug.index))
+
+    def child(self, index):
+        node = self._plug.node
+        return MPlug(Plug(node, node.spec(self._plug.spec.children[index]), self._plug.index))
+
+    def elementByLogicalIndex(self, index):
+        return MPlug(Plug(self._plug.node, self._plug.spec, index))
+
+    def node(self):
+        return MObject(self._plug.node)
+
+    def attribute(self):
+        return MObject(self._plug.node, self._plug.spec)
+
+    def name(self):
+        return self._plug.name(long_names=False)
+
+    def partialName(self, includeNodeName=False, includeNonMandatoryIndices=False,
+                    includeInstancedIndices=False, useAlias=False, useFullAttributePath=False,
+                    useLongNames=False):
+        name = self._plug.name(long_names=useLongNames)
+
+        return name if includeNodeName else name.split('.', 1)[1]
+
+    def _value(self, context=None):
+        time = context._time if context is not None else None
+        return getScene().getValue(self._plug, time)
+
+    def asDouble(self, context=None):
+        value = float(self._value(context))
+        if self._plug.spec.kind == 'doubleAngle':
+            value = math.radians(value)
+
+        return value
+
+    def asFloat(self, context=None):
+        return self.asDouble(context)
+
+    def asInt(self, context=None):
+        return int(self._value(context))
+
+    asShort = asInt
+    asLong = asInt
+
+    def asBool(self, context=None):
+        return bool(self._value(context))
+
+    def asString(self, context=None):
+        return str(self._value(context))
+
+    def asMAngle(self, context=None):
+        return MAngle(math.radians(float(self._value(context))))
+
+    def asMDistance(self, context=None):
+        return MDistance(float(self._value(context)))
+
+    def asMTime(self, context=None):
+        return MTime(float(self._value(context)), MTime.uiUnit())
+
+    def asMObject(self, context=None):
+        value = self._value(context)
+        if self._plug.spec.kind == 'matrix':
+            return _MatrixDataObject(value)
+
+        return MObject()
+
+    def setDouble(self, value):
+        if self._plug.spec.kind == 'doubleAngle':
+            value = math.degrees(value)
+        getScene().setValue(self._plug, value)
+
+    def setInt(self, value):
+        getScene().setValue(self._plug, value)
+
+    setShort = setInt
+
+    def setBool(self, value):
+        getScene().setValue(self._plug, value)
+
+
+class _MatrixDataObject(MObject):
+    # Matrix data returned by MPlug.asMObject
+    def __init__(self, value):
+        super(_MatrixDataObject, self).__init__()
+        self._matrix = np.asarray(value, dtype=float)
+
+    def isNull(self):
+        return False
+
+
+class MMatrix(object):
+    """4x4 matrix, iterable over its 16 values in row order."""
+
+    def __init__(self, values=None):
+        self._values = np.identity(4) if values is None else \
+            np.reshape(np.array(values, dtype=float), (4, 4))
+
+    def __iter__(self):
+        return iter(float(value) for value in np.ravel(self._values))
+
+    def __len__(self):
+        return 16
+
+    def __getitem__(self, index):
+        return float(np.ravel(self._values)[index])
+
+    def __mul__(self, other):
+        return MMatrix(np.matmul(self._values, other._values))
+
+    def inverse(self):
+        return MMatrix(np.linalg.inv(self._values))
+
+    def getElement(self, row, column):
+        return float(self._values[row, column])
+
+
+class MFnMatrixData(object):
+
+    def __init__(self, obj=None):
+        self._obj = obj
+
+    def matrix(self):
+        return MMatrix(self._obj._matrix)
+
+
+class MFnAttribute(object):
+
+    def __init__(self, obj):
+        self._spec = obj._spec
+
+    @property
+    def name(self):
+        return self._spec.name
+
+    @property
+    def shortName(self):
+        return self._spec.short
+
+    @property
+    def keyable(self):
+        return self._spec.keyable
+
+    @property
+    def dynamic(self):
+        return self._spec.dynamic
+
+
+class MFnUnitAttribute(MFnAttribute):
+    kInvalid = 0
+    kAngle = 1
+    kDistance = 2
+    kTime = 3
+
+    def unitType(self):
+        return {'angle': self.kAngle, 'distance': self.kDistance,
+                'time': self.kTime}.get(_UNIT_KINDS.get(self._spec.kind), self.kInvalid)
+
+
+class MFnNumericData(object):
+    kInvalid = 0
+    kBoolean = 1
+    kByte = 2
+    kChar = 3
+    kShort = 4
+    kInt = 7
+    kLong = 7
+    kFloat = 10
+    kDouble = 11
+
+
+class MFnNumericAttribute(MFnAttribute):
+
+    def numericType(self):
+        return {'bool': MFnNumericData.kBoolean, 'long': MFnNumericData.kInt}.get(
+            self._spec.kind, MFnNumericData.kDouble)
+
+
+class MFnEnumAttribute(MFnAttribute):
+
+    def fieldName(self, index):
+        return self._spec.enum_names[index]
+
+    def getMin(self):
+        return 0
+
+    def getMax(self):
+        return len(self._spec.enum_names) - 1
+
+
+class MFnSingleIndexedComponent(object):
+
+    def __init__(self, obj=None):
+        self._component = obj._component if obj is not None else None
+
+    def getElements(self):
+        return list(self._component[1])
+
+    @property
+    def elementCount(self):
+        return len(self._component[1])
+
+
+class MFnMesh(object):
+
+    def __init__(self, dag_path=None):
+        self._node = dag_path._node if dag_path is not None else None
+
+    def getPoints(self, space=None):
+        # Object-space positions as (x, y, z, w) points, as MPointArray
+        # converts to numpy in Maya
+        return MPointArray(tuple(point) + (1.0,) for point in self._node.data['points'])
+
+
+class MSpace(object):
+    kInvalid = 0
+    kTransform = 1
+    kPreTransform = 2
+    kPostTransform = 3
+    kWorld = 4
+    kObject = kPreTransform
+
+
+class MTime(object):
+    kInvalid = 0
+    kFilm = 6
+
+    def __init__(self, value=0.0, unit=kFilm):
+        self.value = float(value)
+        self.unit = unit
+
+    @staticmethod
+    def uiUnit():
+        return MTime.kFilm
+
+    def asUnits(self, unit):
+        return self.value
+
+
+class MTimeArray(list):
+    pass
+
+
+class MDoubleArray(list):
+    pass
+
+
+class MPointArray(list):
+    pass
+
+
+class MDGContext(object):
+    """Evaluation context at a time."""
+
+    def __init__(self, time=None):
+        self._time = time.value if time is not None else None
+
+    def isNormal(self):
+        return self._time is None
+
+
+MDGContext.kNormal = MDGContext()
+
+
+class MDistance(object):
+    kInvalid = 0
+    kInches = 1
+    kFeet = 2
+    kYards = 3
+    kMiles = 4
+    kMillimeters = 5
+    kCentimeters = 6
+    kKilometers = 7
+    kMeters = 8
+
+    def __init__(self, value=0.0, unit=kCentimeters):
+        self.value = float(value)
+        self.unit = unit
+
+    @staticmethod
+    def uiUnit():
+        return MDistance.kCentimeters
+
+    @staticmethod
+    def internalUnit():
+        return MDistance.kCentimeters
+
+    @staticmethod
+    def internalToUI(value):
+        return float(value)
+
+    @staticmethod
+    def uiToInternal(value):
+        return float(value)
+
+    def asUnits(self, unit):
+        return self.value
+
+    def asCentimeters(self):
+        return self.value
+
+
+class MAngle(object):
+    kInvalid = 0
+    kRadians = 1
+    kDegrees = 2
+
+    def __init__(self, value=0.0, unit=kRadians):
+        self.unit = unit
+        self.value = float(value)
+
+    @staticmethod
+    def uiUnit():
+        return MAngle.kDegrees
+
+    @staticmethod
+    def internalUnit():
+        return MAngle.kRadians
+
+    @staticmethod
+    def internalToUI(value):
+        return math.degrees(value)
+
+    @staticmethod
+    def uiToInternal(value):
+        return math.radians(value)
+
+    def asRadians(self):
+        return self.value if self.unit == self.kRadians else math.radians(self.value)
+
+    def asDegrees(self):
+        return math.degrees(self.asRadians())
+
+    def asUnits(self, unit):
+        return self.asDegrees() if unit == self.kDegrees else self.asRadians()
+
+
+# Messages
+
+
+class MMessage(object):
+
+    @staticmethod
+    def removeCallback(callback_id):
+        for item in getattr(callback_id, 'callback_ids', [callback_id]):
+            _scene.removeCallback(item)
+
+    @staticmethod
+    def removeCallbacks(callback_ids):
+        for callback_id in callback_ids:
+            MMessage.removeCallback(callback_id)
+
+
+class _CallbackGroup(int):
+    # Callback id standing for several scene callbacks
+    def __new__(cls, callback_ids):
+        group = super(_CallbackGroup, cls).__new__(cls, callback_ids[0])
+        group.callback_ids = callback_ids
+        return group
+
+
+class MCommandMessage(MMessage):
+
+    @staticmethod
+    def addCommandCallback(func, client_data=None):
+        return _scene.addCallback('command', lambda command: func(command, client_data))
+
+
+class MDGMessage(MMessage):
+
+    @staticmethod
+    def addNodeAddedCallback(func, node_type='dependNode', client_data=None):
+        return _scene.addCallback('nodeAdded', _nodeFilter(func, node_type, client_data))
+
+    @staticmethod
+    def addNodeRemovedCallback(func, node_type='dependNode', client_data=None):
+        return _scene.addCallback('nodeRemoved', _nodeFilter(func, node_type, client_data))
+
+    @staticmethod
+    def addConnectionCallback(func, client_data=None):
+        return _scene.addCallback('connection', lambda src, dst, made: func(
+            MPlug(src), MPlug(dst), made, client_data))
+
+
+def _nodeFilter(func, node_type, client_data):
+    def callback(node):
+        if node_type in ('dependNode', None) or node.isA(node_type):
+            func(MObject(node), client_data)
+
+    return callback
+
+
+class MNodeMessage(MMessage):
+    kConnectionMade = 0x01
+    kConnectionBroken = 0x02
+    kAttributeEval = 0x04
+    kAttributeSet = 0x08
+    kAttributeLocked = 0x10
+    kAttributeUnlocked = 0x20
+    kAttributeAdded = 0x40
+    kAttributeRemoved = 0x80
+    kAttributeRenamed = 0x100
+    kIncomingDirection = 0x800
+    kOtherPlugSet = 0x4000
+
+    @staticmethod
+    def addNameChangedCallback(obj, func, client_data=None):
+        target = obj._node if obj is not None else None
+
+        def callback(node, prev_name):
+            if target is None or node is target:
+                func(MObject(node), prev_name, client_data)
+
+        return _scene.addCallback('nameChanged', callback)
+
+    @staticmethod
+    def addAttributeChangedCallback(obj, func, client_data=None):
+        target = obj._node
+        messages = {'set': MNodeMessage.kAttributeSet,
+                    'added': MNodeMessage.kAttributeAdded,
+                    'removed': MNodeMessage.kAttributeRemoved}
+
+        def attributeChanged(node, change, spec):
+            if node is target:
+                func(messages[change], MPlug(Plug(node, spec)), MPlug(), client_data)
+
+        def connectionChanged(src, dst, made):
+            flag = MNodeMessage.kConnectionMade if made else MNodeMessage.kConnectionBroken
+            if dst.node is target:
+                func(flag | MNodeMessage.kIncomingDirection, MPlug(dst), MPlug(src), client_data)
+            elif src.node is target:
+                func(flag, MPlug(src), MPlug(dst), client_data)
+
+        return _CallbackGroup([_scene.addCallback('attributeChanged', attributeChanged),
+                               _scene.addCallback('connection', connectionChanged)])
+
+
+class MSceneMessage(MMessage):
+    kAfterNew = 'afterNew'
+    kAfterOpen = 'afterOpen'
+    kBeforeNew = 'beforeNew'
+    kBeforeOpen = 'beforeOpen'
+
+    @staticmethod
+    def addCallback(message, func, client_data=None):
+        def callback(event):
+            if event == message:
+                func(client_data)
+
+        return _scene.addCallback('scene', callback)
+
+
+class MGlobal(object):
+
+    @staticmethod
+    def getActiveSelectionList():
+        sel_list = MSelectionList()
+        for item in getScene().selection:
+            sel_list._items.append(('component', item) if isinstance(item, tuple)
+                                   else ('node', item))
+
+        return sel_list
+
+    @staticmethod
+    def displayWarning(message):
+        getScene().warnings.append(str(message))
@@ -0,0 +1,53 @@
+"""
+Stand-in for maya.api.OpenMayaAnim, backed by the in-memory scene.
+"""
+import math
+
+from .scene import getScene
+
+
+class MFnAnimCurve(object):
+    """Function set of an animCurveTA, animCurveTL or animCurveTU node."""
+
+    kAnimCurveTA = 0
+    kAnimCurveTL = 1
+    kAnimCurveTT = 2
+    kAnimCurveTU = 3
+    kAnimCurveUnknown = 8
+
+    _TYPES = {'animCurveTA': kAnimCurveTA, 'animCurveTL': kAnimCurveTL,
+              'animCurveTU': kAnimCurveTU}
+
+    def __init__(self, obj=None):
+        self._node = obj._node if obj is not None else None
+
+    @property
+    def animCurveType(self):
+        return self._TYPES.get(self._node.type, self.kAnimCurveUnknown)
+
+    @property
+    def numKeys(self):
+        return len(self._node.data['keys'])
+
+    def addKeys(self, times, values, tangentInType=None, tangentOutType=None,
+                keepExistingKeys=False, change=None):
+        """Adds keys at MTimes `times`; values are in internal units."""
+
+        if not keepExistingKeys:
+            self._node.data['keys'].clear()
+        for time, value in zip(times, values):
+            if self.animCurveType == self.kAnimCurveTA:
+                value = math.degrees(value)
+            getScene().setKey(self._node, time.value, value)
+
+    def input(self, index):
+        from .openMaya import MTime
+        return MTime(sorted(self._node.data['keys'])[index])
+
+    def value(self, index):
+        keys = self._node.data['keys']
+        value = keys[sorted(keys)[index]]
+        if self.animCurveType == self.kAnimCurveTA:
+            value = math.radians(value)
+
+        return value
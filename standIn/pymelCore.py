@@ -0,0 +1,682 @@
+"""
+Stand-in for pymel.core, backed by the in-memory scene.
+
+PyNodes wrap scene nodes; attribute access, listing and editing go
+through the stand-in cmds, so they are counted as the commands pymel
+would issue.  Transform queries and edits read the scene directly, as
+pymel does through the API.
+"""
+import numpy as np
+
+from .. import matrix
+from . import cmds
+from .scene import getScene
+
+
+# Data types
+
+
+class Vector(object):
+    """3D vector with arithmetic, as pymel.core.datatypes.Vector."""
+
+    def __init__(self, *args):
+        if len(args) == 1:
+            args = args[0]
+        self._values = np.array(args if len(args) else (0.0, 0.0, 0.0), dtype=float)[:3]
+
+    def __iter__(self):
+        return iter(float(value) for value in self._values)
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        return float(self._values[index])
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, ', '.join(
+            str(value) for value in self))
+
+    def __add__(self, other):
+        return type(self)(self._values + np.asarray(list(other), dtype=float))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return type(self)(self._values - np.asarray(list(other), dtype=float))
+
+    def __rsub__(self, other):
+        return type(self)(np.asarray(list(other), dtype=float) - self._values)
+
+    def __mul__(self, scalar):
+        return type(self)(self._values * float(scalar))
+
+    __rmul__ = __mul__
+
+    def __div__(self, scalar):
+        return type(self)(self._values / float(scalar))
+
+    __truediv__ = __div__
+
+    def __neg__(self):
+        return type(self)(-self._values)
+
+    def __eq__(self, other):
+        try:
+            return np.allclose(self._values, list(other))
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def x(self):
+        return float(self._values[0])
+
+    @property
+    def y(self):
+        return float(self._values[1])
+
+    @property
+    def z(self):
+        return float(self._values[2])
+
+    def length(self):
+        return float(np.linalg.norm(self._values))
+
+    def normal(self):
+        return type(self)(self._values / np.linalg.norm(self._values))
+
+
+class Point(Vector):
+    pass
+
+
+class EulerRotation(Vector):
+    """Rotation in degrees with a rotate order."""
+
+    def __init__(self, *args, **kwargs):
+        super(EulerRotation, self).__init__(*args)
+        self.order = kwargs.get('order', 'xyz')
+
+    def asMatrix(self):
+        return matrix.eulerToMatrix(self._values, self.order)
+
+
+class Matrix(object):
+    """4x4 matrix in Maya's row-vector convention."""
+
+    def __init__(self, values=None):
+        self._values = np.identity(4) if values is None else \
+            np.reshape(np.array(values, dtype=float), (4, 4))
+
+    def __mul__(self, other):
+        return Matrix(np.matmul(self._values, other._values))
+
+    def __iter__(self):
+        return iter([list(row) for row in self._values])
+
+    def inverse(self):
+        return Matrix(np.linalg.inv(self._values))
+
+    @property
+    def translate(self):
+        return Vector(self._values[3, :3])
+
+    @property
+    def rotate(self):
+        return EulerRotation(matrix.matrixToEuler(matrix.rotationPart(self._values)))
+
+
+class _Module(object):
+    # Attribute namespace, as pymel.core.datatypes and nodetypes
+    def __init__(self, **members):
+        self.__dict__.update(members)
+
+
+# Attributes
+
+
+class Attribute(object):
+    """Plug of a PyNode, named 'node.attr'."""
+
+    def __init__(self, node, attr_name):
+        self._node = node
+        self._attr = attr_name
+
+    def __str__(self):
+        return '{0}.{1}'.format(self._node.name(), self._attr)
+
+    def __repr__(self):
+        return "Attribute('{}')".format(self)
+
+    def name(self):
+        return str(self)
+
+    def node(self):
+        return self._node
+
+    def get(self, **kwargs):
+        value = cmds.getAttr(str(self), **kwargs)
+        if isinstance(value, list) and len(value) == 1 and isinstance(value[0], tuple):
+            return Vector(value[0]) if len(value[0]) == 3 else value[0]
+
+        return value
+
+    def set(self, *args, **kwargs):
+        if len(args) == 1 and isinstance(args[0], (list, tuple, Vector)):
+            args = tuple(args[0])
+        cmds.setAttr(str(self), *args, **kwargs)
+
+    def lock(self):
+        cmds.setAttr(str(self), lock=True)
+
+    def unlock(self):
+        cmds.setAttr(str(self), lock=False)
+
+    def isLocked(self):
+        return cmds.getAttr(str(self), lock=True)
+
+    def connect(self, other, force=False):
+        cmds.connectAttr(str(self), str(other), force=force)
+
+    def listConnections(self, **kwargs):
+        return _pyNodes(cmds.listConnections(str(self), **kwargs))
+
+
+# Nodes
+
+
+class DependNode(object):
+    """Wrapper of a scene node, equal to other PyNodes of the same node."""
+
+    def __init__(self, node):
+        self.__dict__['_node'] = node
+
+    def __getattr__(self, attr_name):
+        if attr_name.startswith('_'):
+            raise AttributeError(attr_name)
+        if self._node.spec(attr_name) is None:
+            raise AttributeError("{0} has no attribute or method named '{1}'".format(
+                self._node.name, attr_name))
+
+        return Attribute(self, attr_name)
+
+    def __str__(self):
+        return self._node.name
+
+    def __repr__(self):
+        return "{0}('{1}')".format(type(self).__name__, self._node.name)
+
+    def __eq__(self, other):
+        if isinstance(other, DependNode):
+            return other._node is self._node
+        return str(other) == self._node.name
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(id(self._node))
+
+    def name(self, long=False):
+        return self._node.longName() if long else self._node.name
+
+    nodeName = name
+
+    def type(self):
+        return self._node.type
+
+    def exists(self):
+        return self._node.alive
+
+    def attr(self, attr_name):
+        if self._node.spec(attr_name.split('[')[0].split('.')[-1]) is None:
+            raise AttributeError("{0} has no attribute '{1}'".format(self._node.name, attr_name))
+
+        return Attribute(self, attr_name)
+
+    def hasAttr(self, attr_name):
+        return self._node.spec(attr_name) is not None
+
+    def setAttr(self, attr_name, *args, **kwargs):
+        self.attr(attr_name).set(*args, **kwargs)
+
+    def getAttr(self, attr_name, **kwargs):
+        return self.attr(attr_name).get(**kwargs)
+
+    def listConnections(self, **kwargs):
+        return _pyNodes(cmds.listConnections(str(self), **kwargs))
+
+    def rename(self, new_name):
+        cmds.rename(str(self), new_name)
+        return self
+
+
+class DagNode(DependNode):
+
+    def listRelatives(self, **kwargs):
+        return _pyNodes(cmds.listRelatives(str(self), **kwargs))
+
+    def getParent(self):
+        parent = self._node.parent
+        return PyNode(parent) if parent is not None else None
+
+    def getChildren(self, **kwargs):
+        return self.listRelatives(children=True, **kwargs)
+
+    def setParent(self, *args, **kwargs):
+        new_parent = args[0] if args else None
+        new_parent = _node(new_parent) if new_parent is not None else None
+        if new_parent is self._node.parent:
+            return self
+        relative = kwargs.get('relative', kwargs.get('r', False))
+        if new_parent is None:
+            cmds.parent(str(self), world=True, relative=relative)
+        else:
+            cmds.parent(str(self), new_parent.name, relative=relative)
+
+        return self
+
+    def getShape(self):
+        shapes = getScene().shapes(self._node)
+        return PyNode(shapes[0]) if shapes else None
+
+    def getShapes(self):
+        return [PyNode(shape) for shape in getScene().shapes(self._node)]
+
+
+class Transform(DagNode):
+
+    def getMatrix(self, worldSpace=False, **kwargs):
+        if _worldSpace(kwargs, worldSpace):
+            return Matrix(getScene().worldMatrix(self._node))
+
+        return Matrix(getScene().localMatrix(self._node))
+
+    def getTranslation(self, space='object', **kwargs):
+        scene = getScene()
+        if _worldSpace(kwargs, space=space):
+            return Vector(scene.worldMatrix(self._node)[3, :3])
+
+        return Vector(scene.channel(self._node, 'translate'))
+
+    def setTranslation(self, vector, space='object', **kwargs):
+        scene = getScene()
+        if _worldSpace(kwargs, space=space):
+            world = scene.worldMatrix(self._node).copy()
+            world[3, :3] = list(vector)
+            scene.setWorldMatrix(self._node, world, rotate=False, scale=False)
+        else:
+            scene.setValue(scene.plug(self._node, 'translate'), list(vector))
+
+    def getRotation(self, space='object', **kwargs):
+        scene = getScene()
+        order = int(scene.channel(self._node, 'rotateOrder'))
+        if _worldSpace(kwargs, space=space):
+            return EulerRotation(matrix.matrixToEuler(
+                matrix.rotationPart(scene.worldMatrix(self._node)), order),
+                order=matrix.ROTATE_ORDERS[order])
+
+        return EulerRotation(scene.channel(self._node, 'rotate'),
+                             order=matrix.ROTATE_ORDERS[order])
+
+    def setRotation(self, rotation, space='object', **kwargs):
+        scene = getScene()
+        order = getattr(rotation, 'order', matrix.ROTATE_ORDERS[
+            int(scene.channel(self._node, 'rotateOrder'))])
+        if _worldSpace(kwargs, space=space):
+            world = scene.worldMatrix(self._node).copy()
+            scale = np.linalg.norm(world[:3, :3], axis=-1)[:, np.newaxis]
+            world[:3, :3] = matrix.eulerToMatrix(list(rotation), order) * scale
+            scene.setWorldMatrix(self._node, world, translate=False, scale=False)
+        else:
+            scene.setValue(scene.plug(self._node, 'rotate'), list(rotation))
+
+    def getScale(self):
+        return list(getScene().channel(self._node, 'scale'))
+
+    def setScale(self, scale):
+        scene = getScene()
+        scene.setValue(scene.plug(self._node, 'scale'), list(scale))
+
+    def getCVs(self, space='preTransform', **kwargs):
+        return self.getShape().getCVs(space=space, **kwargs)
+
+    def setCVs(self, points, space='preTransform', **kwargs):
+        self.getShape().setCVs(points, space=space, **kwargs)
+
+    def updateCurve(self):
+        self.getShape().updateCurve()
+
+
+class Joint(Transform):
+    pass
+
+
+class Constraint(Transform):
+    pass
+
+
+class NurbsCurve(DagNode):
+
+    def getCVs(self, space='preTransform', **kwargs):
+        scene = getScene()
+        points = self._node.data.get('cvs', np.zeros((0, 3)))
+        if _worldSpace(kwargs, space=space):
+            points = matrix.transformPoints(points, scene.worldMatrix(self._node))
+
+        return [Point(point) for point in points]
+
+    def setCVs(self, points, space='preTransform', **kwargs):
+        scene = getScene()
+        points = np.array([list(point) for point in points], dtype=float)
+        if _worldSpace(kwargs, space=space):
+            points = matrix.transformPoints(
+                points, np.linalg.inv(scene.worldMatrix(self._node)))
+        self._node.data['cvs'] = points
+
+    def updateCurve(self):
+        getScene().recordCommand('updateCurve')
+
+
+class Mesh(DagNode):
+
+    @property
+    def vtx(self):
+        return MeshVertex(self._node, range(len(self._node.data.get('points', ()))))
+
+
+class ObjectSet(DependNode):
+
+    def members(self):
+        return _pyNodes(cmds.sets(str(self), query=True))
+
+    def addMembers(self, members):
+        members = _names(members)
+        if members:
+            cmds.sets(members, addElement=str(self))
+
+    def removeMembers(self, members):
+        members = _names(members)
+        if members:
+            cmds.sets(members, remove=str(self))
+
+    def clear(self):
+        cmds.sets(clear=str(self))
+
+    def __iter__(self):
+        return iter(self.members())
+
+    def __len__(self):
+        return len(getScene().members(self._node))
+
+
+class DisplayLayer(DependNode):
+
+    def addMembers(self, members):
+        cmds.editDisplayLayerMembers(str(self), _names(members))
+
+
+class MeshVertex(object):
+    """Vertices of a mesh, named as 'BodyShape.vtx[0:3]'."""
+
+    def __init__(self, shape, indices):
+        self._shape = shape
+        self._indices = tuple(indices)
+
+    def __str__(self):
+        return ' '.join(cmds.componentName(self._shape, self._indices))
+
+    def __repr__(self):
+        return "MeshVertex('{}')".format(self)
+
+    def __iter__(self):
+        return iter(MeshVertex(self._shape, [index]) for index in self._indices)
+
+    def __len__(self):
+        return len(self._indices)
+
+    def indices(self):
+        return list(self._indices)
+
+    def node(self):
+        return PyNode(self._shape)
+
+
+# Most derived first
+_CLASSES = [('displayLayer', DisplayLayer), ('objectSet', ObjectSet),
+            ('mesh', Mesh), ('nurbsCurve', NurbsCurve), ('constraint', Constraint),
+            ('joint', Joint), ('transform', Transform), ('dagNode', DagNode)]
+
+datatypes = dt = _Module(Vector=Vector, Point=Point, EulerRotation=EulerRotation,
+                         Matrix=Matrix)
+nodetypes = nt = _Module(DependNode=DependNode, DagNode=DagNode, Transform=Transform,
+                         Joint=Joint, ObjectSet=ObjectSet, DisplayLayer=DisplayLayer,
+                         NurbsCurve=NurbsCurve, Mesh=Mesh, Constraint=Constraint)
+
+
+def PyNode(item):
+    """Returns the PyNode of a scene node, node name or component name."""
+
+    if isinstance(item, (DependNode, MeshVertex)):
+        return item
+    if not hasattr(item, 'isA'):
+        name = str(item)
+        component = cmds._component(name)
+        if component is not None:
+            return MeshVertex(*component)
+        if '.' in name:
+            node_name, attr_name = name.split('.', 1)
+            return PyNode(node_name).attr(attr_name)
+        item = _node(name)
+
+    for type_name, node_class in _CLASSES:
+        if item.isA(type_name):
+            return node_class(item)
+
+    return DependNode(item)
+
+
+def _node(item):
+    if isinstance(item, DependNode):
+        return item._node
+    node = getScene().find(str(item))
+    if node is None:
+        raise ValueError('No object matches name: {}'.format(item))
+
+    return node
+
+
+def _pyNodes(names):
+    return [PyNode(name) for name in names or ()]
+
+
+def _names(items):
+    # Node and component names of PyNodes, strings and nested lists
+    if items is None:
+        return list()
+    if isinstance(items, (DependNode, MeshVertex, Attribute, str)):
+        return [str(items)]
+
+    names = list()
+    for item in items:
+        names.extend(_names(item))
+
+    return names
+
+
+def _worldSpace(kwargs, default=False, space=None):
+    if space == 'world':
+        return True
+
+    return bool(kwargs.get('worldSpace', kwargs.get('ws', default)))
+
+
+# Commands
+
+
+def ls(*args, **kwargs):
+    if args:
+        names = _names(args)
+        if not names:
+            return list()
+        return _pyNodes(cmds.ls(names, **kwargs))
+
+    return _pyNodes(cmds.ls(**kwargs))
+
+
+def listRelatives(*args, **kwargs):
+    return _pyNodes(cmds.listRelatives(*_names(args), **kwargs))
+
+
+def createNode(node_type, **kwargs):
+    return PyNode(cmds.createNode(node_type, **kwargs))
+
+
+def objExists(name):
+    return cmds.objExists(str(name))
+
+
+def hasAttr(node, attr_name):
+    return PyNode(node).hasAttr(attr_name)
+
+
+def setAttr(plug, *args, **kwargs):
+    if len(args) == 1 and isinstance(args[0], (list, tuple, Vector)):
+        args = tuple(args[0])
+    cmds.setAttr(str(plug), *args, **kwargs)
+
+
+def getAttr(plug, **kwargs):
+    return PyNode(str(plug)).get(**kwargs)
+
+
+def select(*args, **kwargs):
+    cmds.select(*_names(args), **kwargs)
+
+
+def delete(*args, **kwargs):
+    names = _names(args)
+    if args and not names:
+        return
+    cmds.delete(*names, **kwargs)
+
+
+def parent(*args, **kwargs):
+    return _pyNodes(cmds.parent(*_names(args), **kwargs))
+
+
+def _splitValues(args):
+    # (numbers, object names) of move/rotate arguments in any order
+    values, names = list(), list()
+    for arg in args:
+        if isinstance(arg, (int, float, np.floating, np.integer)):
+            values.append(float(arg))
+        elif isinstance(arg, (Vector, np.ndarray)) or \
+                (isinstance(arg, (list, tuple)) and arg and
+                 all(isinstance(item, (int, float, np.floating, np.integer)) for item in arg)):
+            values.extend(float(item) for item in arg)
+        else:
+            names.extend(_names(arg))
+
+    return values, names
+
+
+def move(*args, **kwargs):
+    values, names = _splitValues(args)
+    cmds.move(*(values + names), **kwargs)
+
+
+def rotate(*args, **kwargs):
+    values, names = _splitValues(args)
+    cmds.rotate(*(values + names), **kwargs)
+
+
+def xform(*args, **kwargs):
+    return cmds.xform(*_names(args), **kwargs)
+
+
+def makeIdentity(*args, **kwargs):
+    cmds.makeIdentity(*_names(args), **kwargs)
+
+
+def _constraint(func, args, kwargs):
+    for flag in 'worldUpObject', 'wuo':
+        if flag in kwargs:
+            kwargs[flag] = str(kwargs[flag])
+    result = func(*_names(args), **kwargs)
+    if kwargs.get('query', kwargs.get('q')):
+        return result
+
+    return PyNode(result[0])
+
+
+def parentConstraint(*args, **kwargs):
+    return _constraint(cmds.parentConstraint, args, kwargs)
+
+
+def pointConstraint(*args, **kwargs):
+    return _constraint(cmds.pointConstraint, args, kwargs)
+
+
+def orientConstraint(*args, **kwargs):
+    return _constraint(cmds.orientConstraint, args, kwargs)
+
+
+def aimConstraint(*args, **kwargs):
+    return _constraint(cmds.aimConstraint, args, kwargs)
+
+
+def curve(**kwargs):
+    return PyNode(cmds.curve(**kwargs))
+
+
+def spaceLocator(**kwargs):
+    return PyNode(cmds.spaceLocator(**kwargs)[0])
+
+
+def createDisplayLayer(*args, **kwargs):
+    return PyNode(cmds.createDisplayLayer(*_names(args), **kwargs))
+
+
+def sets(*args, **kwargs):
+    result = cmds.sets(*_names(args), **kwargs)
+    if kwargs.get('query', kwargs.get('q')):
+        return _pyNodes(result)
+
+    return PyNode(result) if result else result
+
+
+def importFile(path, **kwargs):
+    return cmds.file(path, i=True, **kwargs)
+
+
+def warning(*args):
+    cmds.warning(' '.join(str(arg) for arg in args))
+
+
+def error(*args):
+    cmds.error(' '.join(str(arg) for arg in args))
+
+
+def currentTime(*args, **kwargs):
+    return cmds.currentTime(*args, **kwargs)
+
+
+def playbackOptions(**kwargs):
+    return cmds.playbackOptions(**kwargs)
+
+
+class _Mel(object):
+    # MEL procedures are not run; `source` is only counted
+
+    def source(self, path):
+        getScene().recordCommand('source')
+
+    def eval(self, command):
+        getScene().recordCommand('eval')
+
+
+mel = _Mel()
@@ -0,0 +1,965 @@
+"""
+In-memory scene behind the stand-in Maya modules.
+
+Models what the rig tools touch: the DAG hierarchy, transforms and joints
+with Maya's matrix composition, static and dynamic attributes with
+locking and keyable state, connections, object sets, display layers,
+constraints, condition nodes and animation curves, all evaluated at any
+time.  Node names are unique in the scene.  Units are centimeters,
+degrees and frames.
+"""
+from collections import OrderedDict
+import fnmatch
+import re
+import uuid
+import numpy as np
+
+from .. import matrix
+
+# type: parent type
+TYPE_PARENTS = {
+    'node': None,
+    'dagNode': 'node',
+    'transform': 'dagNode',
+    'joint': 'transform',
+    'constraint': 'transform',
+    'parentConstraint': 'constraint',
+    'pointConstraint': 'constraint',
+    'orientConstraint': 'constraint',
+    'aimConstraint': 'constraint',
+    'shape': 'dagNode',
+    'mesh': 'shape',
+    'nurbsCurve': 'shape',
+    'locator': 'shape',
+    'objectSet': 'node',
+    'displayLayer': 'node',
+    'condition': 'node',
+    'animCurve': 'node',
+    'animCurveTL': 'animCurve',
+    'animCurveTA': 'animCurve',
+    'animCurveTU': 'animCurve',
+}
+ROTATE_ORDER_NAMES = ['xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx']
+
+_PLUG = re.compile(r'^([^\[\]]+)(?:\[(\d+)(?::(\d+))?\])?$')
+_CALLBACKS = OrderedDict()
+_NEXT_ID = [1]
+_SCENE = [None]
+
+
+class AttrSpec(object):
+    """
+    Description of an attribute.  `kind` is a Maya attribute or data type
+    name ('double', 'doubleLinear', 'doubleAngle', 'bool', 'enum', 'long',
+    'string', 'matrix', 'message', 'stringArray', 'doubleArray' or
+    'compound').
+    """
+
+    def __init__(self, name, short=None, kind='double', default=0.0, keyable=False,
+                 children=(), parent=None, array=False, output=False,
+                 enum_names=None, dynamic=False):
+        self.name = name
+        self.short = short or name
+        self.kind = kind
+        self.default = default
+        self.keyable = keyable
+        self.children = tuple(children)
+        self.parent = parent
+        self.array = array
+        self.output = output
+        self.enum_names = enum_names
+        self.dynamic = dynamic
+
+
+def _vector(name, short, kind, default=(0.0, 0.0, 0.0), keyable=False, output=False,
+            axes='XYZ'):
+    # Compound attribute with three children
+    children = [AttrSpec(name + axis, short + axis.lower(), kind, default[i],
+                         keyable, parent=name, output=output)
+                for i, axis in enumerate(axes)]
+
+    return [AttrSpec(name, short, 'compound', tuple(default), keyable,
+                     children=[child.name for child in children],
+                     output=output)] + children
+
+
+_TYPE_ATTRS = {
+    'node': [AttrSpec('message', 'msg', 'message', None)],
+    'dagNode': (
+        [AttrSpec('visibility', 'v', 'bool', True, True),
+         AttrSpec('overrideEnabled', 'ove', 'bool', False),
+         AttrSpec('overrideRGBColors', 'ovrgbf', 'bool', False)] +
+        _vector('overrideColorRGB', 'ovrgb', 'double', axes='RGB') +
+        [AttrSpec(name, short, 'matrix', None, array=array, output=True)
+         for name, short, array in [('matrix', 'm', False),
+                                    ('worldMatrix', 'wm', True),
+                                    ('worldInverseMatrix', 'wim', True),
+                                    ('parentMatrix', 'pm', True),
+                                    ('parentInverseMatrix', 'pim', True)]]),
+    'transform': (
+        _vector('translate', 't', 'doubleLinear', keyable=True) +
+        _vector('rotate', 'r', 'doubleAngle', keyable=True) +
+        _vector('scale', 's', 'double', (1.0, 1.0, 1.0), keyable=True) +
+        [AttrSpec('rotateOrder', 'ro', 'enum', 0, enum_names=ROTATE_ORDER_NAMES)] +
+        _vector('rotateAxis', 'ra', 'doubleAngle') +
+        _vector('rotatePivot', 'rp', 'doubleLinear') +
+        _vector('rotatePivotTranslate', 'rpt', 'doubleLinear') +
+        _vector('scalePivot', 'sp', 'doubleLinear') +
+        [AttrSpec('inheritsTransform', 'it', 'bool', True)]),
+    'joint': (
+        _vector('jointOrient', 'jo', 'doubleAngle') +
+        [AttrSpec('radius', 'radi', 'double', 1.0),
+         AttrSpec('drawStyle', 'ds', 'enum', 0, enum_names=['Bone', 'Multi-child as Box', 'None']),
+         AttrSpec('segmentScaleCompensate', 'ssc', 'bool', True)]),
+    'constraint': (
+        _vector('constraintTranslate', 'ct', 'doubleLinear', output=True) +
+        _vector('constraintRotate', 'cr', 'doubleAngle', output=True) +
+        [AttrSpec('interpType', 'int', 'enum', 1,
+                  enum_names=['No Flip', 'Average', 'Shortest', 'Longest', 'Cache'])]),
+    'aimConstraint': (
+        _vector('aimVector', 'a', 'double', (1.0, 0.0, 0.0)) +
+        _vector('upVector', 'u', 'double', (0.0, 1.0, 0.0)) +
+        _vector('worldUpVector', 'wu', 'double', (0.0, 1.0, 0.0)) +
+        [AttrSpec('worldUpType', 'wut', 'enum', 3,
+                  enum_names=['scene', 'object', 'objectrotation', 'vector', 'none'])]),
+    'condition': (
+        [AttrSpec('firstTerm', 'ft', 'double', 0.0),
+         AttrSpec('secondTerm', 'st', 'double', 0.0),
+         AttrSpec('operation', 'op', 'enum', 0,
+                  enum_names=['Equal', 'Not Equal', 'Greater Than', 'Greater or Equal',
+                              'Less Than', 'Less or Equal'])] +
+        _vector('colorIfTrue', 'ct', 'double', axes='RGB') +
+        _vector('colorIfFalse', 'cf', 'double', (1.0, 1.0, 1.0), axes='RGB') +
+        _vector('outColor', 'oc', 'double', output=True, axes='RGB')),
+    'animCurve': [AttrSpec('output', 'o', 'double', 0.0, output=True),
+                  AttrSpec('keyTimeValue', 'ktv', 'double', None, array=True)],
+    'displayLayer': [AttrSpec('displayType', 'dt', 'enum', 0,
+                              enum_names=['Normal', 'Template', 'Reference']),
+                     AttrSpec('visibility', 'v', 'bool', True)],
+}
+_TYPE_SPECS = dict()
+
+
+def typeSpecs(node_type):
+    """Returns (long name: AttrSpec, short name: long name) for a node type."""
+
+    if node_type not in _TYPE_SPECS:
+        parent_type = TYPE_PARENTS.get(node_type, 'node')
+        specs, shorts = OrderedDict(), dict()
+        if parent_type:
+            parent_specs, parent_shorts = typeSpecs(parent_type)
+            specs.update(parent_specs)
+            shorts.update(parent_shorts)
+        for spec in _TYPE_ATTRS.get(node_type, ()):
+            specs[spec.name] = spec
+            shorts[spec.short] = spec.name
+        _TYPE_SPECS[node_type] = (specs, shorts)
+
+    return _TYPE_SPECS[node_type]
+
+
+def isType(node_type, base_type):
+    """Returns whether `node_type` is `base_type` or derives from it."""
+
+    while node_type:
+        if node_type == base_type:
+            return True
+        node_type = TYPE_PARENTS.get(node_type, 'node' if node_type != 'node' else None)
+
+    return False
+
+
+class Node(object):
+    """A scene node.  `data` holds type-specific state (points, keys, members...)."""
+
+    def __init__(self, scene, name, node_type):
+        self.scene = scene
+        self.name = name
+        self.type = node_type
+        self.parent = None
+        self.children = list()
+        self.uuid = str(uuid.uuid4()).upper()
+        self.values = dict()
+        self.locked = set()
+        self.keyable = dict()
+        self.dynamic = OrderedDict()
+        self.aliases = dict()
+        self.data = dict()
+        self.alive = True
+
+    def __repr__(self):
+        return '<{0} {1}>'.format(self.type, self.name)
+
+    def isA(self, base_type):
+        return isType(self.type, base_type)
+
+    @property
+    def is_dag(self):
+        return self.isA('dagNode')
+
+    def longName(self):
+        names = list()
+        node = self
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+
+        return '|' + '|'.join(reversed(names))
+
+    def specs(self):
+        """Returns every AttrSpec of the node, static then dynamic."""
+
+        return list(typeSpecs(self.type)[0].values()) + list(self.dynamic.values())
+
+    def spec(self, attr_name):
+        """Returns the AttrSpec named `attr_name` (long, short or alias), or None."""
+
+        attr_name = self.aliases.get(attr_name, attr_name)
+        if attr_name in self.dynamic:
+            return self.dynamic[attr_name]
+        for spec in self.dynamic.values():
+            if spec.short == attr_name:
+                return spec
+        specs, shorts = typeSpecs(self.type)
+
+        return specs.get(shorts.get(attr_name, attr_name))
+
+    def isKeyable(self, spec):
+        return self.keyable.get(spec.name, spec.keyable)
+
+    def isLocked(self, spec):
+        return spec.name in self.locked or \
+            (spec.parent is not None and spec.parent in self.locked)
+
+
+class Plug(object):
+    """Attribute of a node, with an element index for array attributes."""
+
+    __slots__ = ('node', 'spec', 'index')
+
+    def __init__(self, node, spec, index=None):
+        self.node = node
+        self.spec = spec
+        self.index = index
+
+    @property
+    def attr(self):
+        return self.spec.name
+
+    def _key(self):
+        return (id(self.node), self.spec.name, self.index)
+
+    def __eq__(self, other):
+        return isinstance(other, Plug) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return '<Plug {}>'.format(self.name())
+
+    def name(self, long_names=True):
+        attr_name = self.spec.name if long_names else self.spec.short
+        if self.index is not None:
+            attr_name += '[{}]'.format(self.index)
+
+        return '{0}.{1}'.format(self.node.name, attr_name)
+
+
+class Scene(object):
+    """
+    Stand-in Maya scene.
+
+    Attributes
+    ----------
+    nodes : OrderedDict
+        Node name to Node, in creation order.
+    time, min_time, max_time : float
+        Current time and playback range.
+    selection : list
+        Selected nodes and (shape, indices) components.
+    commands : dict
+        Command name to number of calls, counted by the stand-in cmds.
+    nodes_created : int
+        Nodes created since the last resetCounts.
+    warnings : list
+        Messages of cmds.warning, collected instead of printed.
+
+    """
+
+    def __init__(self):
+        self.nodes = OrderedDict()
+        self.time = 1.0
+        self.min_time = 1.0
+        self.max_time = 24.0
+        self.selection = list()
+        self.inputs = dict()
+        self.outputs = dict()
+        self._node_connections = dict()
+        self._member_sets = list()
+        self.commands = dict()
+        self.nodes_created = 0
+        self.warnings = list()
+        self._cache = dict()
+        self._evaluating = set()
+
+    # Bookkeeping
+
+    def recordCommand(self, command):
+        self.commands[command] = self.commands.get(command, 0) + 1
+        fire('command', command)
+
+    def resetCounts(self):
+        self.commands = dict()
+        self.nodes_created = 0
+
+    def dirty(self):
+        self._cache.clear()
+
+    # Nodes
+
+    def createNode(self, node_type, name=None, parent=None):
+        """Creates a node; shapes without a parent get a new transform."""
+
+        if isType(node_type, 'shape') and parent is None:
+            parent = self.createNode('transform', _shapeParentName(node_type, name))
+            name = name or parent.name + 'Shape'
+
+        node = Node(self, self.uniqueName(name or node_type + '#'), node_type)
+        self.nodes[node.name] = node
+        if parent is not None:
+            self._attach(node, parent)
+        if node.isA('objectSet') or node.isA('displayLayer'):
+            node.data['members'] = list()
+            self._member_sets.append(node)
+        if node.isA('animCurve'):
+            node.data['keys'] = dict()
+            node.data['step'] = set()
+        self.nodes_created += 1
+        self.dirty()
+        fire('nodeAdded', node)
+
+        return node
+
+    def uniqueName(self, name):
+        """Returns `name`, or the next free name with a number suffix."""
+
+        if '#' not in name and name not in self.nodes:
+            return name
+
+        base = name.replace('#', '')
+        if '#' not in name:
+            base = base.rstrip('0123456789')
+        number = 1
+        while '{0}{1}'.format(base, number) in self.nodes:
+            number += 1
+
+        return '{0}{1}'.format(base, number)
+
+    def find(self, name):
+        """Returns the node named `name` (a name or DAG path), or None."""
+
+        if not name:
+            return
+        name = str(name)
+        path = name.split('|')
+        node = self.nodes.get(path[-1])
+        if node is None and ':' in path[-1]:
+            node = self.nodes.get(path[-1].rsplit(':', 1)[-1])
+        if node is not None and len(path) > 1 and path[0] == '' and \
+                node.longName() != name:
+            return
+
+        return node
+
+    def match(self, pattern):
+        """Returns the nodes whose names match a wildcard pattern."""
+
+        if not any(char in pattern for char in '*?['):
+            node = self.find(pattern)
+            return [node] if node else list()
+
+        pattern = pattern.rsplit('|', 1)[-1]
+        return [node for name, node in self.nodes.items()
+                if fnmatch.fnmatchcase(name, pattern)]
+
+    def rename(self, node, new_name):
+        prev_name = node.name
+        del self.nodes[node.name]
+        node.name = self.uniqueName(new_name)
+        self.nodes[node.name] = node
+        fire('nameChanged', node, prev_name)
+
+        return node.name
+
+    def delete(self, node):
+        """
+        Deletes `node`, its DAG children and its connections.  Plugs that
+        `node` drives keep their last evaluated value, as in Maya, so
+        deleting a constraint leaves the driven node where it was.
+        """
+
+        if not node.alive:
+            return
+        for child in list(node.children):
+            self.delete(child)
+
+        connections = self.connections(node)
+        driven = [(dst, self.getValue(dst)) for src, dst in connections
+                  if src.node is node and dst.node is not node]
+        for src, dst in connections:
+            self.disconnect(src, dst)
+        for dst, value in driven:
+            self._store(dst, value)
+        if node in self._member_sets:
+            self._member_sets.remove(node)
+        for other in self._member_sets:
+            other.data['members'] = [member for member in other.data['members']
+                                     if _memberNode(member) is not node]
+        self.selection = [item for item in self.selection if _memberNode(item) is not node]
+
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        del self.nodes[node.name]
+        node.alive = False
+        self.dirty()
+        fire('nodeRemoved', node)
+
+    def setParent(self, node, parent, keep_world=True):
+        """
+        Moves `node` under `parent` (None for the world), keeping its world
+        transform unless `keep_world` is False.
+        """
+
+        ancestor = parent
+        while ancestor is not None:
+            if ancestor is node:
+                raise RuntimeError("Cannot parent '{}' under itself.".format(node.name))
+            ancestor = ancestor.parent
+
+        world = self.worldMatrix(node) if keep_world and node.isA('transform') else None
+        if node.parent is not None:
+            node.parent.children.remove(node)
+            node.parent = None
+        if parent is not None:
+            self._attach(node, parent)
+        self.dirty()
+
+        if world is not None:
+            self.setWorldMatrix(node, world)
+
+    def _attach(self, node, parent):
+        node.parent = parent
+        parent.children.append(node)
+
+    def shapes(self, node):
+        return [child for child in node.children if child.isA('shape')]
+
+    def transformOf(self, node):
+        # Transform of a shape, or the node itself
+        return node.parent if node.isA('shape') else node
+
+    # Attributes
+
+    def plug(self, node, attr_name):
+        """Returns the Plug for 'attr', 'attr[i]' or 'compound.attr' on `node`."""
+
+        attr_name = attr_name.split('.')[-1]
+        match = _PLUG.match(attr_name)
+        if not match:
+            raise ValueError("Invalid attribute '{}'.".format(attr_name))
+        spec = node.spec(match.group(1))
+        if spec is None:
+            raise ValueError("No attribute '{0}.{1}'.".format(node.name, attr_name))
+        index = int(match.group(2)) if match.group(2) is not None else None
+        if spec.array and index is None and spec.kind == 'matrix':
+            index = 0
+
+        return Plug(node, spec, index)
+
+    def parsePlug(self, plug_name):
+        """Returns the Plug named 'node.attr', or None if it does not exist."""
+
+        if '.' not in plug_name:
+            return
+        node_name, attr_name = plug_name.split('.', 1)
+        node = self.find(node_name)
+        if node is None:
+            return
+        try:
+            return self.plug(node, attr_name)
+        except ValueError:
+            return
+
+    def addAttr(self, node, spec):
+        if node.spec(spec.name) is not None:
+            raise RuntimeError("Attribute '{0}.{1}' already exists.".format(
+                node.name, spec.name))
+        spec.dynamic = True
+        node.dynamic[spec.name] = spec
+        if spec.parent and spec.parent in node.dynamic:
+            parent = node.dynamic[spec.parent]
+            parent.children = parent.children + (spec.name,)
+        self.dirty()
+        fire('attributeChanged', node, 'added', spec)
+
+    def deleteAttr(self, node, attr_name):
+        spec = node.spec(attr_name)
+        if spec is None or not spec.dynamic:
+            raise RuntimeError("Cannot delete '{0}.{1}'.".format(node.name, attr_name))
+        for src, dst in self.connections(node):
+            if (dst.node is node and dst.spec is spec) or (src.node is node and src.spec is spec):
+                self.disconnect(src, dst)
+        for child in spec.children:
+            node.dynamic.pop(child, None)
+            node.values.pop(child, None)
+        node.dynamic.pop(spec.name)
+        node.values.pop(spec.name, None)
+        for alias, name in list(node.aliases.items()):
+            if name == spec.name:
+                del node.aliases[alias]
+        self.dirty()
+        fire('attributeChanged', node, 'removed', spec)
+
+    def getValue(self, plug, time=None):
+        """
+        Returns the value of `plug` at `time` (the current time by
+        default): a float, int, bool or string; a tuple for compounds; a
+        (4, 4) array for matrices; a list for array data.
+        """
+
+        time = self.time if time is None else time
+        spec = plug.spec
+        if spec.kind == 'compound':
+            return tuple(self.getValue(Plug(plug.node, plug.node.spec(child)), time)
+                         for child in spec.children)
+
+        src = self.inputs.get(plug)
+        if src is not None:
+            key = (plug, time)
+            if key not in self._evaluating:
+                self._evaluating.add(key)
+                try:
+                    value = self.getValue(src, time)
+                finally:
+                    self._evaluating.discard(key)
+                return _cast(spec, value)
+
+        if spec.output:
+            return self._compute(plug, time)
+
+        return self._stored(plug)
+
+    def _stored(self, plug):
+        key = plug.spec.name if plug.index is None else (plug.spec.name, plug.index)
+        value = plug.node.values.get(key, plug.spec.default)
+
+        return list(value) if isinstance(value, list) else value
+
+    def setValue(self, plug, value):
+        """Sets an unlocked, unconnected plug; compounds take a sequence."""
+
+        node, spec = plug.node, plug.spec
+        if node.isLocked(spec):
+            raise RuntimeError("The attribute '{}' is locked.".format(plug.name()))
+        src = self.inputs.get(plug)
+        if src is not None and not src.node.isA('animCurve'):
+            raise RuntimeError("The attribute '{}' is connected.".format(plug.name()))
+
+        if spec.kind == 'compound':
+            for child, item in zip(spec.children, value):
+                self.setValue(Plug(node, node.spec(child)), item)
+            return
+
+        key = spec.name if plug.index is None else (spec.name, plug.index)
+        node.values[key] = _cast(spec, value)
+        self.dirty()
+        fire('attributeChanged', node, 'set', spec)
+
+    def _store(self, plug, value):
+        # Writes the stored value of `plug`, ignoring locks and connections
+        node, spec = plug.node, plug.spec
+        if spec.kind == 'compound':
+            for child, item in zip(spec.children, value):
+                self._store(Plug(node, node.spec(child)), item)
+            return
+
+        key = spec.name if plug.index is None else (spec.name, plug.index)
+        node.values[key] = _cast(spec, value)
+        self.dirty()
+
+    def setLock(self, plug, locked):
+        names = [plug.spec.name] + list(plug.spec.children)
+        for name in names:
+            if locked:
+                plug.node.locked.add(name)
+            else:
+                plug.node.locked.discard(name)
+
+    def setKeyable(self, plug, keyable):
+        for name in [plug.spec.name] + list(plug.spec.children):
+            plug.node.keyable[name] = keyable
+
+    def connect(self, src, dst):
+        """Connects `src` to `dst`, replacing any input of `dst`."""
+
+        if dst.node.isLocked(dst.spec):
+            raise RuntimeError("The attribute '{}' is locked.".format(dst.name()))
+        if dst in self.inputs:
+            self.disconnect(self.inputs[dst], dst)
+        self.inputs[dst] = src
+        self.outputs.setdefault(src, list()).append(dst)
+        for node in src.node, dst.node:
+            self._node_connections.setdefault(node, OrderedDict())[(src, dst)] = None
+        self.dirty()
+        fire('connection', src, dst, True)
+
+    def disconnect(self, src, dst):
+        if self.inputs.get(dst) != src:
+            return
+        del self.inputs[dst]
+        self.outputs[src].remove(dst)
+        if not self.outputs[src]:
+            del self.outputs[src]
+        for node in src.node, dst.node:
+            self._node_connections[node].pop((src, dst), None)
+        self.dirty()
+        fire('connection', src, dst, False)
+
+    def connections(self, node):
+        """Returns (src, dst) pairs of every connection to or from `node`."""
+
+        return list(self._node_connections.get(node, ()))
+
+    # Evaluation
+
+    def _compute(self, plug, time):
+        node, name = plug.node, plug.spec.name
+        if plug.spec.kind == 'matrix':
+            if name == 'matrix':
+                return self.localMatrix(node, time)
+            if name == 'worldMatrix':
+                return self.worldMatrix(node, time)
+            if name == 'worldInverseMatrix':
+                return np.linalg.inv(self.worldMatrix(node, time))
+            if name == 'parentMatrix':
+                return self.parentMatrix(node, time)
+            if name == 'parentInverseMatrix':
+                return np.linalg.inv(self.parentMatrix(node, time))
+        if node.isA('constraint'):
+            return self._constraintChannels(node, time).get(name, 0.0)
+        if node.isA('condition'):
+            return self._conditionOutput(node, name, time)
+        if node.isA('animCurve'):
+            return self.curveValue(node, time)
+
+        return plug.spec.default
+
+    def _cached(self, key, func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    def channel(self, node, attr_name, time=None):
+        return self.getValue(self.plug(node, attr_name), time)
+
+    def localMatrix(self, node, time=None):
+        """Returns the local matrix of a transform or joint, shape (4, 4)."""
+
+        time = self.time if time is None else time
+        if not node.isA('transform'):
+            return np.identity(4)
+
+        return self._cached(('local', id(node), time),
+                            lambda: self._localMatrix(node, time))
+
+    def _localMatrix(self, node, time):
+        get = lambda attr_name: np.array(self.channel(node, attr_name, time), dtype=float)
+        rotate_order = int(self.channel(node, 'rotateOrder', time))
+        rot = matrix.eulerToMatrix(get('rotate'), rotate_order)
+        rotate_axis = matrix.eulerToMatrix(get('rotateAxis'))
+        scale = np.diag(get('scale'))
+
+        if node.isA('joint'):
+            joint_orient = matrix.eulerToMatrix(get('jointOrient'))
+            rot3 = np.matmul(np.matmul(np.matmul(scale, rotate_axis), rot), joint_orient)
+            return matrix.composeMatrix(get('translate'), rot3)
+
+        pivot = get('rotatePivot')
+        scale_pivot = get('scalePivot')
+        rot3 = np.matmul(rotate_axis, rot)
+        mat = matrix.composeMatrix(-scale_pivot)
+        mat = np.matmul(mat, matrix.composeMatrix(rotate=scale))
+        mat = np.matmul(mat, matrix.composeMatrix(scale_pivot - pivot))
+        mat = np.matmul(mat, matrix.composeMatrix(rotate=rot3))
+
+        return np.matmul(mat, matrix.composeMatrix(
+            pivot + get('rotatePivotTranslate') + get('translate')))
+
+    def worldMatrix(self, node, time=None):
+        time = self.time if time is None else time
+        if not node.is_dag:
+            return np.identity(4)
+
+        return self._cached(('world', id(node), time), lambda: np.matmul(
+            self.localMatrix(node, time), self.parentMatrix(node, time)))
+
+    def parentMatrix(self, node, time=None):
+        if node.parent is None or (node.isA('transform') and
+                                   not self.channel(node, 'inheritsTransform', time)):
+            return np.identity(4)
+
+        return self.worldMatrix(node.parent, time)
+
+    def setWorldMatrix(self, node, world_mat, translate=True, rotate=True, scale=True):
+        """
+        Sets the channels of an unconstrained transform so its world matrix
+        is `world_mat`.  Joints keep their rotate and absorb the rotation
+        into jointOrient.
+        """
+
+        local = np.matmul(world_mat, np.linalg.inv(self.parentMatrix(node)))
+        values = self.channelsFromMatrix(node, local, keep_rotate=node.isA('joint'))
+        if not scale:
+            values.pop('scale')
+        if not rotate:
+            values.pop('rotate', None)
+            values.pop('jointOrient', None)
+        if not translate:
+            values.pop('translate')
+        # Connected channels (constrained, driven) keep their inputs
+        for attr_name, value in values.items():
+            for axis, item in zip('XYZ', value):
+                plug = self.plug(node, attr_name + axis)
+                if plug not in self.inputs:
+                    self.setValue(plug, item)
+
+    def channelsFromMatrix(self, node, local, keep_rotate=False):
+        """
+        Returns translate, rotate, scale (and, with `keep_rotate` on joints,
+        jointOrient instead of rotate) giving `node` the local matrix `local`.
+        """
+
+        local = np.asarray(local, dtype=float)
+        scale = np.linalg.norm(local[:3, :3], axis=-1)
+        rot = local[:3, :3] / scale[:, np.newaxis]
+        rotate_axis = matrix.eulerToMatrix(self.channel(node, 'rotateAxis'))
+        rotate_order = int(self.channel(node, 'rotateOrder'))
+        values = {'scale': tuple(scale)}
+
+        if node.isA('joint'):
+            joint_orient = matrix.eulerToMatrix(self.channel(node, 'jointOrient'))
+            if keep_rotate:
+                local_rot = matrix.eulerToMatrix(self.channel(node, 'rotate'), rotate_order)
+                orient = np.matmul(np.matmul(local_rot.T, rotate_axis.T), rot)
+                values['jointOrient'] = tuple(matrix.matrixToEuler(orient))
+            else:
+                values['rotate'] = tuple(matrix.matrixToEuler(
+                    matrix.localRotation(rot, np.identity(3), joint_orient, rotate_axis),
+                    rotate_order))
+            values['translate'] = tuple(local[3, :3])
+            return values
+
+        values['rotate'] = tuple(matrix.matrixToEuler(
+            matrix.localRotation(rot, np.identity(3), None, rotate_axis), rotate_order))
+        pivot = np.array(self.channel(node, 'rotatePivot'))
+        pivot_offset = np.array(self.channel(node, 'rotatePivotTranslate'))
+        values['translate'] = tuple(local[3, :3] + matrix.transformVectors(pivot, local)
+                                    - pivot - pivot_offset)
+
+        return values
+
+    def _constraintChannels(self, cons, time):
+        return self._cached(('cons', id(cons), time),
+                            lambda: self._solveConstraint(cons, time))
+
+    def _solveConstraint(self, cons, time):
+        data = cons.data
+        driven, kind = data['driven'], data['kind']
+        targets = [(i, target) for i, target in enumerate(data['targets']) if target.alive]
+        weights = np.array([self.channel(cons, data['weights'][i], time)
+                            for i, _ in targets], dtype=float)
+        if not driven.alive or not targets or weights.sum() <= 0.0:
+            return self._restChannels(driven)
+        weights /= weights.sum()
+
+        offsets = np.array([data['offsets'][i] for i, _ in targets])
+        target_mats = np.array([self.worldMatrix(target, time) for _, target in targets])
+        if kind == 'point':
+            mats = target_mats.copy()
+            mats[:, 3, :3] += offsets[:, 3, :3]
+        else:
+            mats = np.matmul(offsets, target_mats)
+        locs = np.sum(mats[:, 3, :3] * weights[:, np.newaxis], axis=0)
+        rots = _blendRotations(matrix.rotationPart(mats), weights)
+
+        if kind == 'point':
+            rots = np.identity(3)
+        elif kind == 'orient':
+            locs = self._pivotPosition(driven, time)
+        elif kind == 'aim':
+            world_up = np.array(self.channel(cons, 'worldUpVector', time))
+            up_object = data.get('up_object')
+            up_type = int(self.channel(cons, 'worldUpType', time))
+            if up_type == 2 and up_object is not None and up_object.alive:
+                world_up = matrix.transformVectors(world_up, self.worldMatrix(up_object, time))
+            elif up_type == 0:
+                world_up = np.array([0.0, 1.0, 0.0])
+            position = self._pivotPosition(driven, time)
+            rots = matrix.aimMatrices(locs - position, world_up,
+                                      self.channel(cons, 'aimVector', time),
+                                      self.channel(cons, 'upVector', time))
+            locs = position
+
+        local = np.matmul(matrix.composeMatrix(locs, rots),
+                          np.linalg.inv(self.parentMatrix(driven, time)))
+        values = self.channelsFromMatrix(driven, local)
+        channels = dict()
+        for i, axis in enumerate('XYZ'):
+            channels['constraintTranslate' + axis] = values['translate'][i]
+            channels['constraintRotate' + axis] = values['rotate'][i]
+
+        return channels
+
+    def _pivotPosition(self, node, time):
+        # World position of the rotate pivot, without evaluating rotation
+        position = np.array(self.channel(node, 'translate', time), dtype=float)
+        if not node.isA('joint'):
+            position += np.array(self.channel(node, 'rotatePivot', time)) + \
+                np.array(self.channel(node, 'rotatePivotTranslate', time))
+
+        return matrix.transformPoints(position, self.parentMatrix(node, time))
+
+    def _restChannels(self, driven):
+        channels = dict()
+        for i, axis in enumerate('XYZ'):
+            channels['constraintTranslate' + axis] = driven.values.get('translate' + axis, 0.0)
+            channels['constraintRotate' + axis] = driven.values.get('rotate' + axis, 0.0)
+
+        return channels
+
+    def _conditionOutput(self, node, attr_name, time):
+        first = self.channel(node, 'firstTerm', time)
+        second = self.channel(node, 'secondTerm', time)
+        operation = int(self.channel(node, 'operation', time))
+        result = [first == second, first != second, first > second, first >= second,
+                  first < second, first <= second][operation]
+        axis = attr_name[-1]
+
+        return self.channel(node, ('colorIfTrue' if result else 'colorIfFalse') + axis, time)
+
+    # Animation
+
+    def setKey(self, curve, time, value):
+        curve.data['keys'][float(time)] = float(value)
+        self.dirty()
+
+    def curveValue(self, curve, time):
+        keys = curve.data['keys']
+        if not keys:
+            return 0.0
+        times = sorted(keys)
+        if time <= times[0]:
+            return keys[times[0]]
+        if time >= times[-1]:
+            return keys[times[-1]]
+        i = int(np.searchsorted(times, time, side='right'))
+        t0, t1 = times[i - 1], times[i]
+        if t0 in curve.data['step']:
+            return keys[t0]
+
+        return keys[t0] + (keys[t1] - keys[t0]) * (time - t0) / (t1 - t0)
+
+    # Sets
+
+    def members(self, obj_set):
+        return list(obj_set.data['members'])
+
+    def addMembers(self, obj_set, members):
+        current = obj_set.data['members']
+        for member in members:
+            if member not in current:
+                current.append(member)
+        self.dirty()
+
+
+def getScene():
+    """Returns the current stand-in scene, creating one on first use."""
+
+    if _SCENE[0] is None:
+        _SCENE[0] = Scene()
+
+    return _SCENE[0]
+
+
+def newScene():
+    """Replaces the current scene with an empty one."""
+
+    _SCENE[0] = Scene()
+    fire('scene', 'afterNew')
+
+    return _SCENE[0]
+
+
+def addCallback(kind, func, *args):
+    """
+    Registers `func` for a scene event: 'command', 'nodeAdded',
+    'nodeRemoved', 'connection', 'nameChanged', 'attributeChanged' or
+    'scene'.  Callbacks outlive scenes, as in Maya.
+    """
+
+    callback_id = _NEXT_ID[0]
+    _NEXT_ID[0] += 1
+    _CALLBACKS[callback_id] = (kind, func, args)
+
+    return callback_id
+
+
+def removeCallback(callback_id):
+    _CALLBACKS.pop(callback_id, None)
+
+
+def fire(kind, *args):
+    for callback_kind, func, _ in list(_CALLBACKS.values()):
+        if callback_kind == kind:
+            func(*args)
+
+
+def _shapeParentName(node_type, name):
+    if name:
+        return name[:-len('Shape')] if name.endswith('Shape') else name + '#'
+
+    return {'mesh': 'polySurface#', 'nurbsCurve': 'curve#',
+            'locator': 'locator#'}.get(node_type, 'transform#')
+
+
+def _memberNode(member):
+    return member[0] if isinstance(member, tuple) else member
+
+
+def _cast(spec, value):
+    if spec.kind in ('bool',):
+        return bool(value)
+    if spec.kind in ('enum', 'long', 'short'):
+        return int(round(float(value)))
+    if spec.kind in ('double', 'doubleLinear', 'doubleAngle', 'time'):
+        return float(value)
+
+    return value
+
+
+def _blendRotations(rots, weights):
+    # Weighted rotation average, projected back onto a rotation
+    if len(rots) == 1:
+        return rots[0]
+    mean = np.sum(rots * weights[:, np.newaxis, np.newaxis], axis=0)
+    u, _, vt = np.linalg.svd(mean)
+    rot = np.matmul(u, vt)
+    if np.linalg.det(rot) < 0:
+        u[:, -1] *= -1
+        rot = np.matmul(u, vt)
+
+    return rot
@@ -1,6 +1,14 @@
+from collections import OrderedDict
 from functools import partial
+import hashlib
+import numpy as np
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
 import pymel.core as pm
 from .data import CTRL_SHAPES
+from . import matrix
+from .matrix import eulerToMatrix
 
 CONTROL_COLORS = {
     'Left': (1.0, 0.0, 0.0),
@@ -9,12 +17,74 @@ CONTROL_COLORS = {
     'Other': (1.0, 1.0, 0.15)
 }
 
+# (mesh, vertex index hash): (points and matrix hash, centroid, vertex count),
+# for getAverageLoc
+_CENTROID_CACHE = dict()
+
+ANIM_CURVE_TYPES = {
+    'doubleAngle': 'animCurveTA',
+    'doubleLinear': 'animCurveTL'
+}
+
 
 def getAverageLoc(node_list):
-    locs = [pm.datatypes.Vector(pm.xform(node, query=True, t=True))
-            for node in node_list]
+    """
+    Returns the average world position of `node_list`, which may mix
+    transforms with mesh vertices or vertex ranges (e.g. the members of a
+    vertex set).  Positions are in world space, as expected by pm.move and
+    the other callers; this matches the object-space result of earlier
+    versions for meshes at the origin.  Each mesh's points are fetched in
+    one call and its centroid is cached by mesh and vertex indices along
+    with a hash of the points and world matrix, so edited or moved meshes
+    are recomputed; see clearCentroidCache.
 
-    return sum(locs)/len(locs)
+    Returns
+    -------
+    pm.datatypes.Vector
+
+    """
+
+    sel_list = om.MSelectionList()
+    for node in node_list:
+        sel_list.add(str(node))
+
+    total, count = np.zeros(3), 0
+    for i in range(sel_list.length()):
+        dag_path, component = sel_list.getComponent(i)
+        if component.isNull():
+            total += cmds.xform(dag_path.fullPathName(), query=True,
+                                worldSpace=True, translation=True)
+            count += 1
+            continue
+
+        if not dag_path.hasFn(om.MFn.kMesh):
+            points = np.reshape(cmds.xform(sel_list.getSelectionStrings(i), query=True,
+                                           worldSpace=True, translation=True), (-1, 3))
+            total += points.sum(axis=0)
+            count += len(points)
+            continue
+
+        indices = np.sort(np.array(
+            om.MFnSingleIndexedComponent(component).getElements(), dtype=np.int64))
+        points = np.array(om.MFnMesh(dag_path).getPoints(om.MSpace.kObject),
+                          dtype=float)[:, :3]
+        world_mat = np.reshape(np.array(dag_path.inclusiveMatrix(), dtype=float), (4, 4))
+        key = (dag_path.fullPathName(), hashlib.md5(indices.tobytes()).hexdigest())
+        geometry = hashlib.md5(points.tobytes() + world_mat.tobytes()).hexdigest()
+        if _CENTROID_CACHE.get(key, (None,))[0] != geometry:
+            centroid = matrix.transformPoints(points[indices].mean(axis=0), world_mat)
+            _CENTROID_CACHE[key] = (geometry, centroid, len(indices))
+        _, centroid, num_points = _CENTROID_CACHE[key]
+        total += centroid * num_points
+        count += num_points
+
+    return pm.datatypes.Vector(*(total / count))
+
+
+def clearCentroidCache():
+    """Forgets the vertex centroids cached by getAverageLoc."""
+
+    _CENTROID_CACHE.clear()
 
 
 def lockAndHideAttrs(node_list, attr_list=('scaleX', 'scaleY', 'scaleZ')):
@@ -50,6 +120,8 @@ def getPoleVector(start, mid, end):
     The pole vector is (parallel to) the vector orthogonal to the vector
     between `start` and `end` that passes through `mid`.
     (Note that `start` and `end` are interchangeable.)
+    Wrapper over matrix.poleVectors; use matrix.chainVectors for many
+    chains or frames at once.
 
     Parameters
     ----------
@@ -66,28 +138,23 @@ def getPoleVector(start, mid, end):
 
     """
 
-    locs = [xform.getTranslation(space='world')
-            for xform in [start, mid, end]]
-    vec_basen = (locs[2] - locs[0]).normal()
-    vec_mid = (locs[1] - locs[0])
-    pole_vec = (vec_mid - vec_mid.dot(vec_basen)*vec_basen)
+    locs = getWorldMatrices([start, mid, end])[:, 3, :3]
+    locs *= om.MDistance.internalToUI(1.0)
 
-    return pole_vec
+    return pm.dt.Vector(*matrix.poleVectors(*locs))
 
 
 def orientJoint(joint, target, up_vector=(0, 1, 0), world_up=(0, 1, 0)):
-    parented = False
-
-    if target.getParent() == joint:
-        parented = True
-        target.setParent(None)
-
-    pm.delete(pm.aimConstraint(target, joint,
-                               upVector=up_vector, worldUpVector=world_up))
-    pm.makeIdentity(joint, apply=True)
+    """
+    Orients `joint` so its x axis aims at `target` and its `up_vector` axis
+    is as close as possible to `world_up`, as jointOrient with zero
+    rotation.  Children keep their world transforms.
+    """
 
-    if parented:
-        target.setParent(joint)
+    joint, target = str(joint), str(target)
+    locs = matrix.translationPart(getWorldMatrices([joint, target]))
+    world_rot = matrix.aimMatrices(locs[1] - locs[0], world_up, up_axis=up_vector)
+    setJointOrients([joint], world_rot[np.newaxis])
 
 
 def createControlCurve(name=None, ctrl_type='FK', size=1.0, color=(1.0, 1.0, 0.15)):
@@ -133,13 +200,14 @@ def createNodeChain(input_xforms, node_func=partial(pm.createNode, 'transform'),
         name_list = [prefix + node.nodeName() for node in input_xforms]
 
     node_list = list()
-    for node, node_name in zip(input_xforms, name_list):
+    for node_name in name_list:
         new_node = node_func(name=node_name)
-        pm.delete(pm.parentConstraint(node, new_node))
         if node_list:
             new_node.setParent(node_list[-1])
         node_list.append(new_node)
 
+    snapTransforms(node_list, input_xforms)
+
     return node_list
 
 
@@ -161,19 +229,594 @@ def alignToWorldVector(xform, aim_x=(1, 0, 0), aim_y=(0, 1, 0), freeze=False):
 
     """
 
-    xform = pm.ls(xform)[0]
+    aimTransforms([xform], [aim_x], [aim_y])
+
+    if freeze:
+        pm.makeIdentity(xform, apply=True)
+
+
+def getFrameRange(start=None, end=None):
+    """
+    Returns a list of whole frames from `start` to `end`, inclusive.
+    Defaults to the playback range.
+    """
+
+    if start is None:
+        start = cmds.playbackOptions(query=True, minTime=True)
+    if end is None:
+        end = cmds.playbackOptions(query=True, maxTime=True)
 
-    xf_node = pm.createNode('transform')
-    pm.move(xf_node, xform.getTranslation(ws=True))
+    return [float(frame) for frame in range(int(round(start)), int(round(end)) + 1)]
 
-    aim_node = pm.createNode('transform')
-    pm.move(aim_node, xform.getTranslation(space='world') + aim_x)
 
-    pm.delete(pm.aimConstraint(aim_node, xf_node,
-                               worldUpVector=aim_y), aim_node)
+def getMObject(node):
+    sel_list = om.MSelectionList()
+    sel_list.add(node)
 
-    xform.setRotation(xf_node.getRotation(ws=True), ws=True)
-    pm.delete(xf_node)
+    return sel_list.getDependNode(0)
 
-    if freeze:
-        pm.makeIdentity(xform, apply=True)
+
+def sampleMatrices(nodes, attr='worldMatrix', frames=None):
+    """
+    Reads a matrix attribute of many nodes over many frames in one sweep,
+    evaluating each plug in a time context instead of changing the current
+    time.
+
+    Parameters
+    ----------
+    nodes : list
+        Node names.
+    attr : str, optional
+        Matrix attribute, e.g. 'worldMatrix', 'parentMatrix' or
+        'parentInverseMatrix'.  Array attributes use element 0.
+    frames : list, optional
+        Frames to sample.  Samples the current time if not given.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (len(nodes), len(frames), 4, 4), or (len(nodes), 4, 4) if
+        `frames` is not given.
+
+    """
+
+    plugs = list()
+    for node in nodes:
+        plug = om.MFnDependencyNode(getMObject(node)).findPlug(attr, False)
+        plugs.append(plug.elementByLogicalIndex(0) if plug.isArray else plug)
+
+    contexts = [None]
+    if frames is not None:
+        contexts = [om.MDGContext(om.MTime(frame, om.MTime.uiUnit()))
+                    for frame in frames]
+
+    mats = np.empty((len(plugs), len(contexts), 4, 4))
+    for fi, context in enumerate(contexts):
+        for ni, plug in enumerate(plugs):
+            data = plug.asMObject(context) if context else plug.asMObject()
+            mats[ni, fi] = np.reshape(
+                tuple(om.MFnMatrixData(data).matrix()), (4, 4))
+
+    if frames is None:
+        return mats[:, 0]
+
+    return mats
+
+
+def getRotateInfo(node):
+    """
+    Returns the rotate order index, jointOrient rotation matrix (or None)
+    and rotateAxis rotation matrix of `node`, for matrix.localRotation.
+    """
+
+    rotate_order = cmds.getAttr(node + '.rotateOrder')
+    rotate_axis = eulerToMatrix(cmds.getAttr(node + '.rotateAxis')[0])
+    joint_orient = None
+    if cmds.objectType(node, isAType='joint'):
+        joint_orient = eulerToMatrix(cmds.getAttr(node + '.jointOrient')[0])
+
+    return rotate_order, joint_orient, rotate_axis
+
+
+def matrixToChannels(node, local_mats, translate=True, rotate=True):
+    """
+    Converts local matrices of `node` to translate and rotate channel values,
+    accounting for its rotate order, jointOrient, rotateAxis and rotate
+    pivot.  Rotations are filtered along the frame axis.
+
+    Parameters
+    ----------
+    node : str
+    local_mats : np.ndarray
+        Shape (frames, 4, 4).
+    translate, rotate : bool, optional
+        Channels to return.
+
+    Returns
+    -------
+    dict
+        Maps 'node.attr' to (frames,) arrays in UI units, for setKeys.
+
+    """
+
+    rotate_order, joint_orient, rotate_axis = getRotateInfo(node)
+    rots = matrix.rotationPart(local_mats)
+    plug_values = dict()
+
+    if rotate:
+        local_rots = matrix.localRotation(rots, np.identity(3),
+                                          joint_orient, rotate_axis)
+        eulers = matrix.filterEuler(matrix.matrixToEuler(local_rots, rotate_order))
+        plug_values.update({node+'.rotate'+axis: eulers[:, i]
+                            for i, axis in enumerate('XYZ')})
+
+    if translate:
+        locs = matrix.translationPart(local_mats)
+        if not cmds.objectType(node, isAType='joint'):
+            pivot = np.array(cmds.getAttr(node + '.rotatePivot')[0])
+            pivot_offset = np.array(cmds.getAttr(node + '.rotatePivotTranslate')[0])
+            locs = locs + matrix.transformVectors(pivot, rots) - pivot - pivot_offset
+        locs *= om.MDistance.internalToUI(1.0)
+        plug_values.update({node+'.translate'+axis: locs[:, i]
+                            for i, axis in enumerate('XYZ')})
+
+    return plug_values
+
+
+def getWorldMatrices(nodes, pivot=False):
+    """
+    Returns the world matrices of `nodes` at the current time, shape
+    (len(nodes), 4, 4).  With `pivot`, translations are the world rotate
+    pivots, which is what constraints match.
+    """
+
+    nodes = [str(node) for node in nodes]
+    mats = sampleMatrices(nodes)
+    if pivot:
+        for i, node in enumerate(nodes):
+            if not cmds.objectType(node, isAType='joint'):
+                mats[i, 3, :3] = cmds.xform(node, query=True, worldSpace=True,
+                                            rotatePivot=True)
+        mats[:, 3, :3] *= om.MDistance.uiToInternal(1.0)
+
+    return mats
+
+
+def worldToChannels(nodes, world_mats, frames=None, translate=True, rotate=True):
+    """
+    Converts world matrices of `nodes` to translate and rotate channel
+    values.  Nodes are solved parent-first: a node under another node in
+    the list gets its parent matrix moved by that ancestor's change, so a
+    whole hierarchy can be solved at once.  Channels that are locked, not
+    keyable or driven by a connection other than an animation curve are
+    left out.
+
+    Parameters
+    ----------
+    nodes : list
+    world_mats : np.ndarray
+        Target world matrices, shape (len(nodes), frames, 4, 4).
+    frames : list, optional
+        Frames of `world_mats`.  Defaults to the current time.
+    translate, rotate : bool, optional
+        Channels to return.
+
+    Returns
+    -------
+    dict
+        Maps 'node.attr' to (frames,) arrays in UI units, for setKeys.
+
+    """
+
+    nodes = [str(node) for node in nodes]
+    sample = partial(sampleMatrices, frames=frames or [cmds.currentTime(query=True)])
+    node_mats = sample(nodes)
+    parent_mats = sample(nodes, 'parentMatrix')
+
+    long_names = [cmds.ls(node, long=True)[0] for node in nodes]
+    order = sorted(range(len(nodes)), key=lambda i: long_names[i].count('|'))
+    plug_values = dict()
+
+    for i in order:
+        ancestors = [j for j in order
+                     if long_names[i].startswith(long_names[j] + '|')]
+        parent_mat = parent_mats[i]
+        if ancestors:
+            j = ancestors[-1]
+            parent_mat = np.matmul(np.matmul(parent_mat, np.linalg.inv(node_mats[j])),
+                                   world_mats[j])
+        plug_values.update(matrixToChannels(
+            nodes[i], np.matmul(world_mats[i], np.linalg.inv(parent_mat)),
+            translate=translate and _channelsFree(nodes[i], 'translate'),
+            rotate=rotate and _channelsFree(nodes[i], 'rotate')))
+
+    return plug_values
+
+
+def setWorldMatrices(nodes, world_mats, translate=True, rotate=True):
+    """
+    Moves `nodes` to (len(nodes), 4, 4) world matrices at the current time
+    with one bulk write.  See worldToChannels.
+    """
+
+    plug_values = worldToChannels(nodes, np.asarray(world_mats)[:, np.newaxis],
+                                  translate=translate, rotate=rotate)
+
+    return setAttrs({plug: values[0] for plug, values in plug_values.items()})
+
+
+def snapTransforms(targets, sources, translate=True, rotate=True):
+    """
+    Snaps each of `targets` to the world rotate pivot and rotation of the
+    matching node in `sources`, like a parentConstraint that is deleted
+    right away, without creating any nodes.
+    """
+
+    return setWorldMatrices(targets, getWorldMatrices(sources, pivot=True),
+                            translate=translate, rotate=rotate)
+
+
+def aimTransforms(nodes, aim_vectors, up_vectors=((0, 1, 0),), aim_axis=(1, 0, 0), up_axis=(0, 1, 0)):
+    """
+    Rotates each of `nodes` so `aim_axis` points along its world aim vector
+    and `up_axis` is as close as possible to its world up vector.  A single
+    up vector applies to every node.
+    """
+
+    world_rots = matrix.aimMatrices(np.asarray(aim_vectors, dtype=float), up_vectors,
+                                    aim_axis, up_axis)
+    world_mats = getWorldMatrices(nodes)
+    world_mats[:, :3, :3] = world_rots
+
+    return setWorldMatrices(nodes, world_mats, translate=False)
+
+
+def setJointOrients(joints, world_rots):
+    """
+    Sets the jointOrient of each of `joints` so it has world rotation
+    `world_rots` (shape (len(joints), 3, 3)) with zero rotate, as aiming
+    and then freezing would.  Children that are not in `joints` keep their
+    world transforms, joints through their jointOrient.
+    """
+
+    joints = [str(joint) for joint in joints]
+    long_names = [cmds.ls(joint, long=True)[0] for joint in joints]
+    order = sorted(range(len(joints)), key=lambda i: long_names[i].count('|'))
+    joint_rots = matrix.rotationPart(sampleMatrices(joints))
+    parent_rots = matrix.rotationPart(sampleMatrices(joints, 'parentMatrix'))
+
+    plug_values = dict()
+    for i in order:
+        ancestors = [j for j in order
+                     if long_names[i].startswith(long_names[j] + '|')]
+        parent_rot = parent_rots[i]
+        if ancestors:
+            # Nodes in between keep their rotation relative to the ancestor
+            j = ancestors[-1]
+            parent_rot = np.matmul(np.matmul(parent_rot, joint_rots[j].T), world_rots[j])
+        plug_values.update(_jointOrientValues(joints[i], world_rots[i], parent_rot))
+        plug_values.update({'{}.rotate{}'.format(joints[i], axis): 0.0 for axis in 'XYZ'})
+
+    children = [child for joint in long_names
+                for child in cmds.listRelatives(joint, children=True, type='transform',
+                                                fullPath=True) or list()
+                if child not in long_names]
+    child_mats = getWorldMatrices(children) if children else np.zeros((0, 4, 4))
+    child_joints = [cmds.objectType(child, isAType='joint') for child in children]
+
+    for child, child_mat, is_joint in zip(children, child_mats, child_joints):
+        if is_joint:
+            parent_rot = world_rots[long_names.index(child.rsplit('|', 1)[0])]
+            rotate_order = cmds.getAttr(child + '.rotateOrder')
+            plug_values.update(_jointOrientValues(
+                child, matrix.rotationPart(child_mat), parent_rot,
+                eulerToMatrix(cmds.getAttr(child + '.rotate')[0], rotate_order)))
+
+    written = setAttrs(plug_values)
+    for is_joint in True, False:
+        nodes = [child for child, flag in zip(children, child_joints) if flag == is_joint]
+        mats = [mat for mat, flag in zip(child_mats, child_joints) if flag == is_joint]
+        if nodes:
+            written += setWorldMatrices(nodes, mats, rotate=not is_joint)
+
+    return written
+
+
+def orientJoints(joints, up_vector=(0, 1, 0), world_up=(0, 1, 0), aim_axis=(1, 0, 0)):
+    """
+    Orients many joints in one pass.  Each joint aims `aim_axis` at its
+    first child, with its `up_vector` axis as close as possible to
+    `world_up`; joints without children get a zero jointOrient.  Joints are
+    solved parent-first in memory and written as translate, jointOrient and
+    zero rotate with one bulk write, without reparenting: every joint, and
+    every child transform outside `joints`, keeps its world position.
+
+    Parameters
+    ----------
+    joints : list
+    up_vector : tuple, optional
+        Local up axis.
+    world_up : tuple, optional
+        World up vector.
+    aim_axis : tuple, optional
+        Local aim axis.
+
+    Returns
+    -------
+    list
+        Plugs written.
+
+    """
+
+    joints = [str(joint) for joint in joints]
+    long_names = [cmds.ls(joint, long=True)[0] for joint in joints]
+    index = {name: i for i, name in enumerate(long_names)}
+    order = sorted(range(len(joints)), key=lambda i: long_names[i].count('|'))
+
+    locs = matrix.translationPart(sampleMatrices(joints))
+    parent_mats = sampleMatrices(joints, 'parentMatrix')
+    children = {name: cmds.listRelatives(name, children=True, type='transform',
+                                         fullPath=True) or list()
+                for name in long_names}
+    others = [child for name in long_names for child in children[name]
+              if child not in index]
+    other_mats = getWorldMatrices(others) if others else np.zeros((0, 4, 4))
+    other_locs = dict(zip(others, matrix.translationPart(other_mats)))
+
+    world_rots = np.empty((len(joints), 3, 3))
+    plug_values = dict()
+    for i in order:
+        parent = long_names[i].rsplit('|', 1)[0]
+        parent_mat = parent_mats[i]
+        if parent in index:
+            p = index[parent]
+            parent_mat = matrix.composeMatrix(locs[p], world_rots[p])
+        parent_rot = matrix.rotationPart(parent_mat)
+
+        aim = None
+        if children[long_names[i]]:
+            child = children[long_names[i]][0]
+            child_loc = locs[index[child]] if child in index else other_locs[child]
+            aim = child_loc - locs[i]
+        if aim is not None and np.linalg.norm(aim) > 1e-6:
+            world_rots[i] = matrix.aimMatrices(aim, world_up, aim_axis, up_vector)
+            plug_values.update(_jointOrientValues(joints[i], world_rots[i], parent_rot))
+        else:
+            rotate_axis = eulerToMatrix(cmds.getAttr(joints[i] + '.rotateAxis')[0])
+            world_rots[i] = np.matmul(rotate_axis, parent_rot)
+            plug_values.update({'{}.jointOrient{}'.format(joints[i], axis): 0.0
+                                for axis in 'XYZ'})
+
+        local_loc = matrix.transformPoints(locs[i], np.linalg.inv(parent_mat))
+        local_loc *= om.MDistance.internalToUI(1.0)
+        for axis, value in zip('XYZ', local_loc):
+            plug_values['{}.translate{}'.format(joints[i], axis)] = value
+            plug_values['{}.rotate{}'.format(joints[i], axis)] = 0.0
+
+    written = setAttrs(plug_values)
+    if others:
+        written += setWorldMatrices(others, other_mats)
+
+    return written
+
+
+def orientJointHierarchy(root, up_vector=(0, 1, 0), world_up=(0, 1, 0), aim_axis=(1, 0, 0)):
+    """Orients `root` and every joint below it with orientJoints."""
+
+    root = str(root)
+    joints = [root] + (cmds.listRelatives(root, allDescendents=True, type='joint',
+                                          fullPath=True) or list())
+
+    return orientJoints(joints, up_vector, world_up, aim_axis)
+
+
+def _jointOrientValues(joint, world_rot, parent_rot, local_rot=None):
+    # jointOrient giving `joint` world rotation `world_rot` under
+    # `parent_rot`, with rotateAxis kept and rotate equal to `local_rot`
+    rotate_axis = eulerToMatrix(cmds.getAttr(joint + '.rotateAxis')[0])
+    orient = np.matmul(rotate_axis.T, matrix.localRotation(world_rot, parent_rot))
+    if local_rot is not None:
+        orient = np.matmul(local_rot.T, orient)
+
+    return {'{}.jointOrient{}'.format(joint, axis): value
+            for axis, value in zip('XYZ', matrix.matrixToEuler(orient))}
+
+
+def setKeys(plug_values, frames):
+    """
+    Keys many plugs over many frames with one bulk write per plug.
+    Existing keys inside the frame range are replaced; missing and locked
+    plugs, and plugs driven by a connection other than an animation curve
+    (e.g. a constraint), are skipped.
+
+    Parameters
+    ----------
+    plug_values : dict
+        Maps 'node.attr' to a sequence of values in UI units, one per frame.
+    frames : list
+        Frames to key, in increasing order.
+
+    """
+
+    time_range = (frames[0], frames[-1])
+
+    for plug, values in plug_values.items():
+        mplug = _getPlug(plug)
+        if mplug is None or mplug.isLocked or _isDriven(mplug):
+            continue
+
+        cmds.cutKey(plug, time=time_range, clear=True)
+        curve = cmds.listConnections(plug, source=True, destination=False,
+                                     type='animCurve')
+
+        if not curve:
+            # Fresh curve: write every key with a single setAttr on keyTimeValue
+            attr_type = cmds.getAttr(plug, type=True)
+            node, attr_name = plug.split('.', 1)
+            curve = cmds.createNode(ANIM_CURVE_TYPES.get(attr_type, 'animCurveTU'),
+                                    name='{}_{}'.format(node.split('|')[-1],
+                                                        attr_name.replace('.', '_')))
+            cmds.connectAttr(curve + '.output', plug, force=True)
+            cmds.setAttr('{}.ktv[0:{}]'.format(curve, len(frames) - 1),
+                         *[float(item) for key in zip(frames, values) for item in key])
+        else:
+            # Keys outside the range remain: merge through MFnAnimCurve
+            _addCurveKeys(curve[0], frames, values)
+
+
+def getAttrs(nodes):
+    """
+    Returns the values of the keyable, unlocked scalar attributes of
+    `nodes`, as an OrderedDict of 'node.attr' to value in UI units.  Plugs
+    are read through the API, without a command per plug.
+    """
+
+    plug_values = OrderedDict()
+    for node in nodes:
+        obj = getMObject(node)
+        fn_node = om.MFnDependencyNode(obj)
+        for i in range(fn_node.attributeCount()):
+            plug = om.MPlug(obj, fn_node.attribute(i))
+            if plug.isArray or plug.isCompound or plug.isElement or \
+                    plug.isLocked or not plug.isKeyable:
+                continue
+            # Children of multi compounds have no plug of their own
+            if plug.isChild and plug.parent().isElement:
+                continue
+            value = _getPlugValue(plug)
+            if value is not None:
+                plug_values['{}.{}'.format(node, plug.partialName(
+                    useLongNames=True))] = value
+
+    return plug_values
+
+
+def setAttrs(plug_values, tolerance=1e-6):
+    """
+    Sets many plugs, skipping missing or locked plugs, plugs driven by a
+    connection other than an animation curve and plugs already within
+    `tolerance` of their new value, and writing a compound (translate,
+    rotate, scale...) whose children all change with a single setAttr.
+
+    Parameters
+    ----------
+    plug_values : dict
+        Maps 'node.attr' to a value in UI units.
+    tolerance : float, optional
+        Pass None to write every unlocked plug.
+
+    Returns
+    -------
+    list
+        Plugs written.
+
+    """
+
+    changed = dict()
+    # parent plug name: [child plug names by index], for children of compounds
+    children = OrderedDict()
+    sel_list = om.MSelectionList()
+    for plug_name, value in plug_values.items():
+        sel_list.clear()
+        try:
+            sel_list.add(plug_name)
+            plug = sel_list.getPlug(0)
+        except (RuntimeError, TypeError):
+            continue
+        if plug.isLocked or _isDriven(plug):
+            continue
+        if tolerance is not None:
+            current = _getPlugValue(plug)
+            if current is not None and abs(current - float(value)) <= tolerance:
+                continue
+        changed[plug_name] = value
+        if plug.isChild:
+            parent = plug.parent()
+            siblings = [parent.child(i) for i in range(parent.numChildren())]
+            children.setdefault(parent.name(), [None] * len(siblings))[
+                siblings.index(plug)] = plug_name
+
+    done = set()
+    for parent_name, child_plugs in children.items():
+        if None not in child_plugs:
+            cmds.setAttr(parent_name, *[float(changed[item]) for item in child_plugs])
+            done.update(child_plugs)
+
+    for plug in sorted(changed):
+        if plug not in done:
+            cmds.setAttr(plug, changed[plug])
+            done.add(plug)
+
+    return sorted(done)
+
+
+def _channelsFree(node, attr_name):
+    # True if the X/Y/Z channels of `attr_name` are keyable, unlocked and
+    # not driven
+    for axis in 'XYZ':
+        plug = _getPlug('{}.{}{}'.format(node, attr_name, axis))
+        if plug is None or plug.isLocked or not plug.isKeyable or _isDriven(plug):
+            return False
+
+    return True
+
+
+def _getPlug(plug_name):
+    # MPlug of 'node.attr', or None if it does not exist
+    sel_list = om.MSelectionList()
+    try:
+        sel_list.add(plug_name)
+        return sel_list.getPlug(0)
+    except (RuntimeError, TypeError):
+        return None
+
+
+def _isDriven(plug):
+    # True if a connection other than an animation curve drives `plug`
+    if not plug.isDestination:
+        return False
+
+    return not plug.source().node().hasFn(om.MFn.kAnimCurve)
+
+
+def _getPlugValue(plug):
+    # Returns a scalar plug's value in UI units, or None for non-scalar plugs
+    attr = plug.attribute()
+    if attr.hasFn(om.MFn.kUnitAttribute):
+        unit_type = om.MFnUnitAttribute(attr).unitType()
+        if unit_type == om.MFnUnitAttribute.kAngle:
+            return plug.asMAngle().asUnits(om.MAngle.uiUnit())
+        if unit_type == om.MFnUnitAttribute.kDistance:
+            return plug.asMDistance().asUnits(om.MDistance.uiUnit())
+        if unit_type == om.MFnUnitAttribute.kTime:
+            return plug.asMTime().asUnits(om.MTime.uiUnit())
+        return plug.asDouble()
+    if attr.hasFn(om.MFn.kEnumAttribute):
+        return float(plug.asShort())
+    if attr.hasFn(om.MFn.kNumericAttribute):
+        numeric_type = om.MFnNumericAttribute(attr).numericType()
+        if numeric_type == om.MFnNumericData.kBoolean:
+            return float(plug.asBool())
+        if numeric_type in (om.MFnNumericData.kFloat, om.MFnNumericData.kDouble):
+            return plug.asDouble()
+        if numeric_type in (om.MFnNumericData.kShort, om.MFnNumericData.kInt,
+                            om.MFnNumericData.kLong, om.MFnNumericData.kByte,
+                            om.MFnNumericData.kChar):
+            return float(plug.asInt())
+
+
+def _addCurveKeys(curve, frames, values):
+    curve_fn = oma.MFnAnimCurve(getMObject(curve))
+
+    values = np.asarray(values, dtype=float)
+    if curve_fn.animCurveType == oma.MFnAnimCurve.kAnimCurveTA:
+        values = np.array([om.MAngle.uiToInternal(value) for value in values])
+    elif curve_fn.animCurveType == oma.MFnAnimCurve.kAnimCurveTL:
+        values = np.array([om.MDistance.uiToInternal(value) for value in values])
+
+    times = om.MTimeArray()
+    for frame in frames:
+        times.append(om.MTime(frame, om.MTime.uiUnit()))
+
+    curve_fn.addKeys(times, om.MDoubleArray(values.tolist()),
+                     keepExistingKeys=True)